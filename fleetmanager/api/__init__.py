@@ -1,8 +1,11 @@
+from contextlib import asynccontextmanager
+
 from fastapi import BackgroundTasks, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html
 from fastapi.openapi.utils import get_openapi
 
+from fleetmanager.api.dependencies import limit_threadpool
 from fleetmanager.api.configuration.routes import router as configuration_routes
 from fleetmanager.api.fleet_simulation.routes import router as fleet_simulation_routes
 from fleetmanager.api.goal_simulation.routes import router as goal_simulation_routes
@@ -10,8 +13,16 @@ from fleetmanager.api.location.routes import router as location_routes
 from fleetmanager.api.simulation_setup.routes import router as simulation_setup_routes
 from fleetmanager.api.statistics.routes import router as statistics_routes
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    limit_threadpool()
+    yield
+
+
 app = FastAPI(
     title="FleetOptimiser",
+    lifespan=lifespan,
     version="latest",
     docs_url=None,
     redoc_url=None,
@@ -49,7 +49,7 @@ router = APIRouter(
 
 
 @router.get("/vehicles", response_model=VehiclesList)
-async def get_all_vehicles(session: Session = Depends(get_session)):
+def get_all_vehicles(session: Session = Depends(get_session)):
     """
     Get all the vehicles in the database for the configuration view. Returns all vehicle attributes.
     """
@@ -62,7 +62,7 @@ async def get_all_vehicles(session: Session = Depends(get_session)):
 
 
 @router.get("/dropdown-data", response_model=ConfigurationTypes)
-async def dropdown_data(session: Session = Depends(get_session)):
+def dropdown_data(session: Session = Depends(get_session)):
     """
     Get the key value pairs for populating the dropdowns in the configuration. Will serve type (vehicle type),
     fuel, leasing type and locations.
@@ -86,7 +86,7 @@ async def dropdown_data(session: Session = Depends(get_session)):
 
 
 @router.get("/vehicle/{vehicle_id}", response_model=Vehicle)
-async def get_vehicle(vehicle_id: int, session: Session = Depends(get_session)):
+def get_vehicle(vehicle_id: int, session: Session = Depends(get_session)):
     response = get_single_vehicle(session, vehicle_id)
     if response is None:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Vehicle does not exist")
@@ -94,7 +94,7 @@ async def get_vehicle(vehicle_id: int, session: Session = Depends(get_session)):
 
 
 @router.patch("/vehicle")
-async def update_vehicle(
+def update_vehicle(
     vehicle_object: Vehicle, session: Session = Depends(get_session)
 ):
     """
@@ -125,7 +125,7 @@ async def update_vehicle(
 
 
 @router.post("/vehicle")
-async def create_vehicle(
+def create_vehicle(
     vehicle_object: VehicleInput, session: Session = Depends(get_session)
 ):
     """
@@ -152,7 +152,7 @@ async def create_vehicle(
 
 
 @router.delete("/vehicle/{vehicle_id}")
-async def delete_vehicle(vehicle_id: int, session: Session = Depends(get_session)):
+def delete_vehicle(vehicle_id: int, session: Session = Depends(get_session)):
     """
     Delete a vehicle and it's associated roundtrips from the database.
     Deleting a vehicle will include its id in the simulation settings banned cars list, referenced
@@ -165,7 +165,7 @@ async def delete_vehicle(vehicle_id: int, session: Session = Depends(get_session
 
 
 @router.post("/vehicles/metadata")
-async def vehicles_validate_metadata(
+def vehicles_validate_metadata(
     validationonly: bool = False,
     file: UploadFile = File(...),
     session: Session = Depends(get_session),
@@ -178,7 +178,7 @@ async def vehicles_validate_metadata(
         )
 
     # process payload
-    contents = await file.read()
+    contents = file.file.read()
     try:
         validation, vehicles = validate_vehicle_metadata(session, contents)
     except MetadataColumnError as e:
@@ -218,7 +218,7 @@ async def vehicles_validate_metadata(
 
 # get the bike configuration
 @router.get("/simulation-configurations", response_model=SimulationConfiguration)
-async def get_all_configurations(session: Session = Depends(get_session)):
+def get_all_configurations(session: Session = Depends(get_session)):
     """
     Get all the configuration settings exposed in the UI, which the user can change.
     """
@@ -229,7 +229,7 @@ async def get_all_configurations(session: Session = Depends(get_session)):
 
 
 @router.patch("/update-configurations")
-async def update_configurations(
+def update_configurations(
     settings: SimulationConfiguration, session: Session = Depends(get_session)
 ):
     """
@@ -245,7 +245,7 @@ async def update_configurations(
 
 
 @router.patch("/move-vehicle")
-async def update_vehicle_roundtrips(
+def update_vehicle_roundtrips(
     vehicle_id: int,
     from_date: datetime | date,
     to_location: int | None = None,
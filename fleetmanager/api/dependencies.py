@@ -1,7 +1,10 @@
 from typing import Any, Generator
-from fleetmanager.data_access.db_engine import engine_creator
+from anyio import to_thread
+from fleetmanager.data_access.db_engine import engine_creator, max_overflow, pool_size
+from fleetmanager.export import export_format
+import pandas as pd
 from pydantic import BaseModel
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyCookie
 import os
 from sqlalchemy.orm import sessionmaker, Session
@@ -9,6 +12,18 @@ from sqlalchemy.orm import sessionmaker, Session
 engine = engine_creator()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# the routes and their dependencies are synchronous and run in this thread pool, off the event loop.
+# It defaults to the size of the connection pool, such that a handler never waits for a connection
+threadpool_size = int(os.getenv("API_THREADPOOL_SIZE", pool_size + max_overflow))
+
+
+def limit_threadpool(size: int = threadpool_size) -> None:
+    """
+    Bounds the number of routes running concurrently in the thread pool of the worker. Must be called from the
+    event loop.
+    """
+    to_thread.current_default_thread_limiter().total_tokens = size
+
 
 def get_session() -> Generator[Session, Any, None]:
     db = SessionLocal()
@@ -18,3 +33,18 @@ def get_session() -> Generator[Session, Any, None]:
         db.flush()
         db.expunge_all()
         db.close()
+
+
+def get_export_format(file_format: export_format = "xlsx") -> export_format:
+    """
+    Validates that the requested download format can be written. Parquet requires pyarrow or fastparquet.
+    """
+    if file_format == "parquet":
+        try:
+            pd.io.parquet.get_engine("auto")
+        except ImportError:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                "Export to parquet is not supported on this server",
+            )
+    return file_format
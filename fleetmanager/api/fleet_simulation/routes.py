@@ -1,6 +1,7 @@
 import json
+from datetime import timedelta
 from celery.result import AsyncResult
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from fastapi.responses import StreamingResponse
 import os
 from sqlalchemy.orm import Session
@@ -14,7 +15,18 @@ from fleetmanager.configuration import (
     load_simulation_settings,
     validate_settings,
 )
-from fleetmanager.fleet_simulation import fleet_simulator, simulation_results_to_excel, load_fleet_simulation_history
+from fleetmanager.export import export_format, export_headers, frame_to_file, iter_file
+from fleetmanager.fleet_simulation import (
+    SimulationCache,
+    cached_simulation,
+    fleet_simulator,
+    simulation_cache_key,
+    simulation_results_to_excel,
+    simulation_driving_book,
+    simulation_location,
+    load_fleet_simulation_history,
+)
+from fleetmanager.model.timing import openmetrics, openmetrics_content_type
 from fleetmanager.tasks import run_fleet_simulation, app
 
 from ..configuration.schemas import (
@@ -24,7 +36,7 @@ from ..configuration.schemas import (
     Shift,
     SimulationSettings,
 )
-from ..dependencies import get_session
+from ..dependencies import get_export_format, get_session
 from .schemas import (
     FleetSimulationOptions,
     FleetSimulationOut,
@@ -36,15 +48,24 @@ router = APIRouter(
     prefix="/fleet-simulation",
 )
 
+# identical requests reuse the task of the first request while its result is kept by the backend
+result_expires = app.conf.result_expires
+simulation_cache = SimulationCache(
+    max_age=result_expires.total_seconds()
+    if isinstance(result_expires, timedelta)
+    else result_expires
+)
+
 
 @router.post("/simulation", response_model=FleetSimulationOut)
-async def simulate_start(
+def simulate_start(
     simulation_in: FleetSimulationOptions,
     session: Session = Depends(get_session),
 ):
     """
     Simulate with a new constructed fleet  on data from a specific location, vehicles and dates. Results will be
-    compared to the actual driving scenario. Returns an id that should be used to retrieve the results.
+    compared to the actual driving scenario. Returns an id that should be used to retrieve the results. Identical
+    requests on unchanged trips and vehicles return the id of the earlier simulation.
     """
     # todo add validation for expected error such as mismatch location and current vehicles and
     #  if no trips in the selected period
@@ -103,38 +124,60 @@ async def simulate_start(
             )
         ]
 
+    cache_key = simulation_cache_key(session, simulation_in)
+    r = cached_simulation(simulation_cache, cache_key)
+    if r is not None:
+        return FleetSimulationOut(id=r.id, status=r.status, result=None)
+
     r = run_fleet_simulation.delay(simulation_in)
+    simulation_cache.put(cache_key, r.id)
     return FleetSimulationOut(id=r.id, status=r.status, result=None)
 
 
 @router.get("/simulation/{simulation_id}", response_model=FleetSimulationOut)
-async def get_simulation(
+def get_simulation(
     simulation_id: str,
     sec_fetch_dest: str = Header(None),
     session: Session = Depends(get_session),
     download: bool = False,
+    file_format: export_format = Depends(get_export_format),
 ):
     """
     Returns the results of the simulation. If accept is specified to
     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     in the header response will be xlsx format, otherwise result is return as "application/json".
+    With file_format csv or parquet only the driving book of the simulation is downloaded.
     """
     r = AsyncResult(simulation_id)
     if r.successful():
         result = r.get()
         if (sec_fetch_dest == "document" or download) and "driving_book" in result:
-            stream, location = simulation_results_to_excel(result, session)
-            headers = {
-                "Content-Disposition": f'attachment; filename="simulation_results_{location}.xlsx"',
-                "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            }
-            return StreamingResponse(stream, headers=headers)
+            if file_format == "xlsx":
+                stream, location = simulation_results_to_excel(result, session)
+            else:
+                stream = frame_to_file(simulation_driving_book(result), file_format)
+                location = simulation_location(result, session)
+            headers = export_headers(f"simulation_results_{location}", file_format)
+            return StreamingResponse(iter_file(stream), headers=headers)
     else:
         result = None
     return FleetSimulationOut(id=r.id, status=r.status, result=result)
 
 
+@router.get("/simulation/{simulation_id}/timings")
+def get_simulation_timings(simulation_id: str):
+    """
+    The timings of the stages of the simulation in the OpenMetrics text format, available while the simulation
+    reports progress and when it's done
+    """
+    info = AsyncResult(simulation_id).info
+    timings = info.get("timings") if isinstance(info, dict) else None
+    if not timings:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "No timings of the simulation")
+    return Response(openmetrics(timings, simulation=simulation_id), media_type=openmetrics_content_type)
+
+
 @router.get("/simulation-history", response_model=list[FleetSimulationHistory])
-async def get_fleet_simulation_history(session: Session = Depends(get_session)):
+def get_fleet_simulation_history(session: Session = Depends(get_session)):
     r = redis.Redis(host="redis", port=6379)
     return load_fleet_simulation_history(session, r)
@@ -75,6 +75,9 @@ class FleetSimulationResult(BaseModel):
         description="The options/settings used in the simulation"
     )
     results: dict | None = Field(description="Detailed results of the simulation")
+    timings: dict | None = Field(
+        description="Wall time, cpu time, rows and peak memory of each stage of the simulation"
+    )
 
 
 class FleetSimulationOut(BaseModel):
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+import redis.asyncio as redisAsync
+from celery import states
+
+from fleetmanager.data_access.serialization import decode, task_meta_prefix
+from fleetmanager.tasks import app as celery_app
+
+from .schemas import GoalSimulationOut
+
+logger = logging.getLogger(__name__)
+
+# seconds without updates before the last update is sent again, keeps idle connections open through proxies
+HEARTBEAT_INTERVAL = 30
+
+
+def task_channel(simulation_id: str) -> str:
+    return f"{task_meta_prefix}{simulation_id}"
+
+
+def to_update(simulation_id: str, meta: dict) -> str:
+    """
+    Converts the task meta published by the celery result backend to the json sent to the websocket clients
+    """
+    status = meta.get("status")
+    result = meta.get("result")
+    if status == "PROGRESS" and isinstance(result, dict):
+        progress, result = result, None
+    elif status == states.SUCCESS:
+        progress = {"progress": 1, "sim_start": None, "task_message": None}
+    else:
+        progress, result = None, None
+    return GoalSimulationOut(
+        id=simulation_id, status=status, progress=progress, result=result
+    ).json()
+
+
+class ProgressBroker:
+    """
+    Single subscriber per process to the progress of the goal simulations. The channels of the simulations that are
+    watched are subscribed on one redis connection, each update is decoded once and fanned out to the queues of
+    the websockets watching the simulation. The listener blocks on the socket and stops when no simulation is
+    watched.
+    """
+
+    def __init__(self, url: str | None = None):
+        self.url = url
+        self.redis = None
+        self.pubsub = None
+        self.listener = None
+        self.queues: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    async def _listen(self):
+        try:
+            async for message in self.pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                channel = message["channel"].decode()
+                queues = self.queues.get(channel)
+                if not queues:
+                    continue
+                try:
+                    meta = decode(message["data"])
+                    update = (
+                        to_update(channel.removeprefix(task_channel("")), meta),
+                        meta.get("status") in states.READY_STATES,
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not decode update on {channel}: {e!r}")
+                    continue
+                for queue in queues:
+                    queue.put_nowait(update)
+        except Exception as e:
+            logger.error(f"Progress listener stopped: {e!r}")
+
+    def ensure_listener(self):
+        """
+        Starts the listener if it's not running, i.e. the first simulation is watched or the listener failed
+        """
+        if self.queues and (self.listener is None or self.listener.done()):
+            self.listener = asyncio.create_task(self._listen())
+
+    @asynccontextmanager
+    async def subscribe(self, simulation_id: str):
+        """
+        Subscribes to the updates of the simulation. Yields a queue of (json update, whether the task is done).
+        """
+        channel = task_channel(simulation_id)
+        queue = asyncio.Queue()
+        if self.pubsub is None:
+            self.redis = redisAsync.Redis.from_url(
+                self.url or celery_app.conf.result_backend
+            )
+            self.pubsub = self.redis.pubsub()
+        if channel not in self.queues:
+            await self.pubsub.subscribe(channel)
+        self.queues[channel].add(queue)
+        self.ensure_listener()
+        try:
+            yield queue
+        finally:
+            self.queues[channel].discard(queue)
+            if not self.queues[channel]:
+                del self.queues[channel]
+                await self.pubsub.unsubscribe(channel)
+
+
+broker = ProgressBroker()
@@ -1,12 +1,14 @@
-import pickle
+import asyncio
 import redis
 
-import redis.asyncio as redisAsync
+from celery import states
 from celery.result import AsyncResult
 from datetime import datetime
-from fastapi import APIRouter, Depends, WebSocket, Header
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Header, HTTPException, Response, status
 import os
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketState
 from starlette.responses import StreamingResponse
 from websockets.exceptions import ConnectionClosedError
 
@@ -18,6 +20,7 @@ from fleetmanager.configuration import (
     validate_settings,
 )
 from fleetmanager.goal_simulation.util import load_goal_simulation_history
+from fleetmanager.model.timing import openmetrics, openmetrics_content_type
 from fleetmanager.tasks import run_goal_simulation
 
 from ..configuration.schemas import (
@@ -27,9 +30,11 @@ from ..configuration.schemas import (
     Shift,
     SimulationSettings,
 )
-from ..dependencies import get_session
+from ..dependencies import get_export_format, get_session
+from .broker import HEARTBEAT_INTERVAL, broker, to_update
 from .schemas import GoalSimulationOptions, GoalSimulationOut, GoalSimulationHistory
-from fleetmanager.fleet_simulation import simulation_results_to_excel
+from fleetmanager.export import export_format, export_headers, frame_to_file, iter_file
+from fleetmanager.fleet_simulation import simulation_driving_book, simulation_results_to_excel
 
 router = APIRouter(
     prefix="/goal-simulation",
@@ -37,7 +42,7 @@ router = APIRouter(
 
 
 @router.post("/simulation", response_model=GoalSimulationOut)
-async def goal_simulate(
+def goal_simulate(
     simulation_in: GoalSimulationOptions, session: Session = Depends(get_session)
 ):
     """
@@ -116,7 +121,7 @@ async def goal_simulate(
 
 
 @router.delete("/simulation/{simulation_id}")
-async def delete_or_stop_simulation(simulation_id: str):
+def delete_or_stop_simulation(simulation_id: str):
     # revoking is not supported https://github.com/celery/celery/issues/4019
     r = AsyncResult(simulation_id)
     if r.info is None:
@@ -126,13 +131,17 @@ async def delete_or_stop_simulation(simulation_id: str):
 
 
 @router.get("/simulation/{simulation_id}", response_model=GoalSimulationOut)
-async def get_goal_simulation(
+def get_goal_simulation(
         simulation_id: str,
         solution_index: int = None,
         sec_fetch_dest: str = Header(None),
         download: bool = False,
+        file_format: export_format = Depends(get_export_format),
 ):
-    """Get progress of simulation result"""
+    """
+    Get progress of simulation result. When downloading a solution with file_format csv or parquet only the driving
+    book of the solution is downloaded.
+    """
     r = AsyncResult(simulation_id)
     if r.successful():
         result = r.get()
@@ -140,12 +149,14 @@ async def get_goal_simulation(
             sim_settings = result.get("simulation_options")
             solution_results = result.get("solutions", [])[solution_index].results
             solution_results["simulation_options"] = sim_settings
-            stream, _ = simulation_results_to_excel(solution_results)
-            headers = {
-                "Content-Disposition": f'attachment; filename="automatic_simulation_results_solution{solution_index}_{simulation_id}.xlsx"',
-                "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            }
-            return StreamingResponse(stream, headers=headers)
+            if file_format == "xlsx":
+                stream, _ = simulation_results_to_excel(solution_results)
+            else:
+                stream = frame_to_file(simulation_driving_book(solution_results), file_format)
+            headers = export_headers(
+                f"automatic_simulation_results_solution{solution_index}_{simulation_id}", file_format
+            )
+            return StreamingResponse(iter_file(stream), headers=headers)
         progress = {"progress": 1, "sim_start": None, "task_message": None}
     elif r.info is not None:
         result = None
@@ -156,51 +167,53 @@ async def get_goal_simulation(
     return GoalSimulationOut(id=r.id, status=r.status, progress=progress, result=result)
 
 
+@router.get("/simulation/{simulation_id}/timings")
+def get_simulation_timings(simulation_id: str):
+    """
+    The timings of the stages of the simulation in the OpenMetrics text format, available while the simulation
+    reports progress and when it's done
+    """
+    info = AsyncResult(simulation_id).info
+    timings = info.get("timings") if isinstance(info, dict) else None
+    if not timings:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "No timings of the simulation")
+    return Response(openmetrics(timings, simulation=simulation_id), media_type=openmetrics_content_type)
+
+
 @router.get("/simulation-history", response_model=list[GoalSimulationHistory])
-async def get_goal_simulation_history(session: Session = Depends(get_session)):
+def get_goal_simulation_history(session: Session = Depends(get_session)):
     r = redis.Redis(host="redis", port=6379)
     return load_goal_simulation_history(session, r)
 
 
 @router.websocket("/simulation/{simulation_id}/ws")
 async def get_goal_simulation_ws(websocket: WebSocket, simulation_id: str):
-    task = AsyncResult(simulation_id)
+    """
+    Streams the progress of the simulation. Updates are fanned out from the single progress subscriber of the
+    worker, the last update is repeated as heartbeat when the simulation has been quiet for a while.
+    """
     try:
         await websocket.accept()
-        if task.successful():
-            await websocket.send_text(
-                GoalSimulationOut(
-                    id=task.id, progress=1, status=task.status, result=task.get()
-                ).json()
+        async with broker.subscribe(simulation_id) as updates:
+            # the task may have progressed before we subscribed
+            task = AsyncResult(simulation_id)
+            meta = await run_in_threadpool(
+                lambda: {"status": task.status, "result": task.result}
             )
-        else:
-            connection = task.backend.result_consumer._pubsub.connection
-            async with redisAsync.Redis(
-                host=connection.host, port=connection.port, db=connection.db
-            ) as redis_client, redis_client.pubsub() as pubsub:
-                await pubsub.subscribe("celery-task-meta-{}".format(simulation_id))
-                while True:
-                    if (message := await pubsub.get_message()) and isinstance(
-                        message["data"], bytes
-                    ):
-                        r = pickle.loads(message["data"])["result"]
-                        if "progress" in r:
-                            progress = r["progress"]
-                            result = None
-                        else:
-                            progress = 1.0
-                            result = r
-                        await websocket.send_text(
-                            GoalSimulationOut(
-                                id=task.id,
-                                progress=progress,
-                                status=task.status,
-                                result=result,
-                            ).json()
-                        )
-                        if task.successful():
-                            break
-    except ConnectionClosedError:
+            update = to_update(simulation_id, meta)
+            done = meta["status"] in states.READY_STATES
+            while True:
+                await websocket.send_text(update)
+                if done:
+                    break
+                try:
+                    update, done = await asyncio.wait_for(
+                        updates.get(), timeout=HEARTBEAT_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    broker.ensure_listener()
+    except (ConnectionClosedError, WebSocketDisconnect):
         pass
     finally:
-        await websocket.close()
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            await websocket.close()
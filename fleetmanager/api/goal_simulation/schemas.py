@@ -121,6 +121,9 @@ class GoalSimulationResult(BaseModel):
         description="The options/settings used in the simulation"
     )
     message: str | None
+    timings: dict | None = Field(
+        description="Wall time, cpu time, rows and peak memory of each stage of the simulation"
+    )
 
 
 class GoalSimulationOut(BaseModel):
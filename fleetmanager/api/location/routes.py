@@ -35,7 +35,7 @@ router = APIRouter(
 
 
 @router.get("/precision", response_model=List[ExtendedLocationInformation])
-async def location_precision(
+def location_precision(
     session: Session = Depends(get_session),
     start_date: date | datetime = None,
     end_date: date | datetime = None,
@@ -63,7 +63,7 @@ async def location_precision(
 
 
 @router.get("/location", response_model=list[AllowedStart])
-async def get_location_info(
+def get_location_info(
     session: Session = Depends(get_session),
     locations: Optional[List[int]] = Query(None)
 ):
@@ -79,7 +79,7 @@ async def get_location_info(
 
 
 @router.post("/location", response_model=AllowedStart)
-async def create_new_location(
+def create_new_location(
     new_location: AllowedStart,
     session: Session = Depends(get_session),
 ):
@@ -92,7 +92,7 @@ async def create_new_location(
 
 
 @router.patch("/location", response_model=AllowedStart)
-async def update_location(
+def update_location(
     known_location: AllowedStart,
     session: Session = Depends(get_session),
 ):
@@ -107,7 +107,7 @@ async def update_location(
 
 
 @router.patch("/location/name", response_model=AllowedStart)
-async def update_location_name(
+def update_location_name(
     location_name_patch: LocationName,
     session: Session = Depends(get_session)
 ):
@@ -120,7 +120,7 @@ async def update_location_name(
 
 
 @router.post("/precision-test", response_model=PrecisionTestOut)
-async def location_precision_test(
+def location_precision_test(
     precision_test_config: PrecisionTestIn,
 ):
     """
@@ -146,7 +146,7 @@ async def location_precision_test(
 
 
 @router.get("/precision-test/{precision_test_id}")
-async def get_location_precision_test(
+def get_location_precision_test(
     precision_test_id: str
 ):
     """
@@ -166,7 +166,7 @@ async def get_location_precision_test(
 
 
 @router.delete("/precision-test/{precision_test_id}")
-async def delete_location_precision_test(
+def delete_location_precision_test(
     precision_test_id: str
 ):
     r = AsyncResult(precision_test_id)
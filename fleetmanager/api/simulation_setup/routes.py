@@ -25,7 +25,7 @@ router = APIRouter(
 
 
 @router.get("/locations-vehicles", response_model=LocationsVehicleList)
-async def locations_vehicles(
+def locations_vehicles(
     start_date: date,
     end_date: date,
     locations: Optional[List[int]] = Query(None),
@@ -45,7 +45,7 @@ async def locations_vehicles(
 
 
 @router.get("/locations", response_model=Locations)
-async def api_locations(session: Session = Depends(get_session)) -> Locations:
+def api_locations(session: Session = Depends(get_session)) -> Locations:
     """
     Get a list of all the locations.
     Used initially on the setup page.
@@ -54,7 +54,7 @@ async def api_locations(session: Session = Depends(get_session)) -> Locations:
 
 
 @router.get("/forvaltninger")
-async def api_forvaltninger(session: Session = Depends(get_session)):
+def api_forvaltninger(session: Session = Depends(get_session)):
     """
     Get an object of forvaltninger to locations.
     Used initially on the setup page.
@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from fleetmanager.statistics import (
     carbon_neutral_share,
     driving_data_to_excel,
+    driving_data_to_frame,
     emission_series,
     get_summed_statistics,
     total_driven,
@@ -18,10 +19,12 @@ from fleetmanager.statistics import (
     group_by_vehicle_location,
     to_plot_data,
     grouped_driving_data_to_excel,
+    grouped_driving_data_to_frame,
     get_availability
 )
+from fleetmanager.export import export_format, export_headers, frame_to_file, iter_file
 
-from ..dependencies import get_session
+from ..dependencies import get_export_format, get_session
 from .schemas import (
     DrivingDataResult,
     GroupedDrivingDataResult,
@@ -39,7 +42,7 @@ router = APIRouter(
 
 #  / statistics
 @router.get("/sum", response_model=StatisticOverview)
-async def summed_statistics(
+def summed_statistics(
         session: Session = Depends(get_session),
         start_date: date = None,
         end_date: date = None,
@@ -55,7 +58,7 @@ async def summed_statistics(
 
 #  / carbon - neutral - share
 @router.get("/overview", response_model=TimeSeriesData)
-async def get_overview_series(
+def get_overview_series(
     request: OverviewInput = Depends(),
     locations: Optional[List[int]] = Query(None),
     forvaltninger: Optional[List[str]] = Query(None),
@@ -92,7 +95,7 @@ async def get_overview_series(
 
 # #  / driving - data
 @router.get("/grouped-driving-data", response_model=GroupedDrivingDataResult)
-async def get_grouped_driving_data(
+def get_grouped_driving_data(
     start_date: date,
     end_date: date,
     locations: Optional[List[int]] = Query(None),
@@ -105,7 +108,8 @@ async def get_grouped_driving_data(
     as_segments: Optional[bool] = False,
     selected_shifts: Optional[List[int]] = Query(None),
     download: Optional[bool] = False,
-    threshold: Optional[int] = 40
+    threshold: Optional[int] = 40,
+    file_format: export_format = Depends(get_export_format),
 ):
     """
     Get driving data on the below filters. Will "shiftify" the roundtrips, meaning that the roundtrips will be returned
@@ -175,17 +179,16 @@ async def get_grouped_driving_data(
         "location_grouped": location_grouped,
     }
     if download:
-        stream = grouped_driving_data_to_excel(
-            response,
-            threshold,
-        )
+        if file_format == "xlsx":
+            stream = grouped_driving_data_to_excel(
+                response,
+                threshold,
+            )
+        else:
+            stream = frame_to_file(grouped_driving_data_to_frame(response), file_format)
         current_date = date.today().strftime("%Y-%m-%d")
-        filename = f"Køretøjs aktivitet {current_date}.xlsx"
-        headers = {
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        }
-        return StreamingResponse(stream, headers=headers)
+        headers = export_headers(f"Køretøjs aktivitet {current_date}", file_format)
+        return StreamingResponse(iter_file(stream), headers=headers)
 
     driving_data = None
     query_data = None
@@ -193,7 +196,7 @@ async def get_grouped_driving_data(
 
 
 @router.get("/driving-data", response_model=DrivingDataResult)
-async def get_driving_data(
+def get_driving_data(
     start_date: date,
     end_date: date,
     locations: Optional[List[int]] = Query(None),
@@ -208,6 +211,7 @@ async def get_driving_data(
     threshold: Optional[int] = None,
     as_segments: Optional[bool] = False,
     with_timedelta: Optional[bool] = False,
+    file_format: export_format = Depends(get_export_format),
 ):
     """
     Get driving data on the below filters. Will "shiftify" the roundtrips, meaning that the roundtrips will be returned
@@ -233,27 +237,24 @@ async def get_driving_data(
         shifts = None
 
     if download:
-        stream = driving_data_to_excel(
-            get_daily_driving_data(
-                session,
-                start_date,
-                end_date,
-                locations,
-                vehicles,
-                shifts,
-                departments,
-                forvaltninger,
-                as_segments=as_segments,
-            ),
-            threshold,
+        download_data = get_daily_driving_data(
+            session,
+            start_date,
+            end_date,
+            locations,
+            vehicles,
+            shifts,
+            departments,
+            forvaltninger,
+            as_segments=as_segments,
         )
+        if file_format == "xlsx":
+            stream = driving_data_to_excel(download_data, threshold)
+        else:
+            stream = frame_to_file(driving_data_to_frame(download_data), file_format)
         current_date = date.today().strftime("%Y-%m-%d")
-        filename = f"Køretøjs aktivitet {current_date}.xlsx"
-        headers = {
-            "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        }
-        return StreamingResponse(stream, headers=headers)
+        headers = export_headers(f"Køretøjs aktivitet {current_date}", file_format)
+        return StreamingResponse(iter_file(stream), headers=headers)
 
     query_data = get_daily_driving_data(
         session,
@@ -284,7 +285,7 @@ async def get_driving_data(
 
 
 @router.get("/availability")
-async def get_vehicle_availability(
+def get_vehicle_availability(
         start_date: date,
         end_date: date,
         locations: Optional[List[int]] = Query(None),
@@ -5,7 +5,7 @@ from typing import Dict, List, TypedDict, Union
 
 import pandas as pd
 from pydantic import ValidationError
-from sqlalchemy import func, select, cast, Numeric
+from sqlalchemy import func, select, cast, Numeric, update
 from sqlalchemy.orm import Session
 from typing_extensions import NotRequired
 
@@ -18,6 +18,7 @@ from fleetmanager.api.configuration.schemas import (
 )
 from fleetmanager.api.configuration.schemas import SimulationSettings as SimIn
 from fleetmanager.api.configuration.schemas import Vehicle, VehicleInput
+from fleetmanager.data_access import bump_data_generation
 from fleetmanager.data_access.dbschema import (
     AllowedStarts,
     Cars,
@@ -180,6 +181,7 @@ def update_single_vehicle(session: Session, vehicle: Vehicle, ignore_none_values
 
         setattr(db_vehicle, key, value)
 
+    bump_data_generation(session)
     session.commit()
     return "ok"
 
@@ -223,6 +225,7 @@ def delete_single_vehicle(session: Session, vehicle_id: int):
         synchronize_session="fetch"
     )
 
+    bump_data_generation(session)
     session.commit()
 
 
@@ -308,6 +311,7 @@ def create_single_vehicle(session: Session, vehicle: VehicleInput):
             vehicle_entry[f"{key}_obj"] = session.get(key_to_model[key], value)
         vehicle_entry[key] = value
     session.add(Cars(**vehicle_entry))
+    bump_data_generation(session)
     session.commit()
     return new_id
 
@@ -343,6 +347,7 @@ def move_vehicle(
             synchronize_session="fetch"
         )
 
+        bump_data_generation(session)
         session.commit()
     else:
         car = session.get(Cars, int(vehicle_id))
@@ -352,6 +357,7 @@ def move_vehicle(
             RoundTrips.car_id == vehicle_id, RoundTrips.end_time > from_date
         ).update({"start_location_id": to_location})
 
+        bump_data_generation(session)
         session.commit()
 
 
@@ -621,6 +627,9 @@ def save_simulation_settings(session: Session, settings: Dict):
             # not allowing null values in simulation settings
             continue
         setattr(v, "value", str(new_value))
+        if v.name == "name_fields":
+            # the names of the memoized vehicles are built from the name fields
+            bump_data_generation(session)
         session.commit()
 
 
@@ -768,42 +777,43 @@ def validate_vehicle_metadata(session: Session, xlsx_bytes: bytes):
         raise MetadataColumnError
 
     # get valid ids from database
-    valid_ids = [i[0] for i in session.query(Cars.id).all()]
+    valid_ids = set(session.scalars(select(Cars.id)))
+
+    # the lookups are checked column-wise, a row reports the first check it fails
+    checks = [
+        ("Lokation", locations, "Fejl i: Lokation: Lokation eksisterer ikke"),
+        ("Drivmiddel", fuel_types, "Fejl i: Drivmiddel"),
+        ("Type", vehicle_types, "Fejl i: Type"),
+        ("Leasing type", leasing_types, "Fejl i: Leasingtype"),
+    ]
+    lookup_errors = pd.Series(None, index=metadata.index, dtype=object)
+    for column, valid_values, message in checks:
+        failed = (
+            lookup_errors.isna()
+            & metadata[column].notna()
+            & ~metadata[column].isin(list(valid_values))
+        )
+        lookup_errors[failed] = message
+    lookup_errors[lookup_errors.isna() & ~metadata["id"].isin(valid_ids)] = "Ignoreres: Id ikke i database"
 
     # check rows
     validation = {}
     vehicles = {}
-    for i, row in metadata.iterrows():
+    for i, lookup_error, row in zip(metadata.index, lookup_errors, metadata.to_dict("records")):
         excel_row = i + 2
 
-        if (row["Lokation"] not in locations) and (row["Lokation"] != None):
-            validation[excel_row] = "Fejl i: Lokation: Lokation eksisterer ikke"
-            continue
-
-        if (row["Drivmiddel"] not in fuel_types) and (row["Drivmiddel"] != None):
-            validation[excel_row] = "Fejl i: Drivmiddel"
-            continue
-
-        if (row["Type"] not in vehicle_types) and (row["Type"] != None):
-            validation[excel_row] = "Fejl i: Type"
-            continue
-
-        if (row["Leasing type"] not in leasing_types) and (row["Leasing type"] != None):
-            validation[excel_row] = "Fejl i: Leasingtype"
-            continue
-
-        if row.get("id") not in valid_ids:
-            validation[excel_row] = "Ignoreres: Id ikke i database"
+        if pd.notna(lookup_error):
+            validation[excel_row] = lookup_error
             continue
 
         try:
             v = Vehicle(
-                id=row.id,
-                plate=row.Nummerplade,
-                make=row.Mærke,
-                model=row.Model,
-                type=vehicle_types.get(row.Type),
-                fuel=fuel_types.get(row.Drivmiddel),
+                id=row["id"],
+                plate=row["Nummerplade"],
+                make=row["Mærke"],
+                model=row["Model"],
+                type=vehicle_types.get(row["Type"]),
+                fuel=fuel_types.get(row["Drivmiddel"]),
                 wltp_fossil=row["Wltp (Fossil)"],
                 wltp_el=row["Wltp (El)"],
                 capacity_decrease=row["Procentvis WLTP"],
@@ -840,6 +850,27 @@ def validate_vehicle_metadata(session: Session, xlsx_bytes: bytes):
     return validation, vehicles
 
 
+car_columns = set(Cars.__table__.columns.keys())
+
+
+def vehicle_update_values(vehicle: Vehicle) -> dict:
+    """
+    The column values the vehicle updates, the not-None values as in update_single_vehicle with ignore_none_values
+    """
+    values = {}
+    for key, value in vehicle:
+        if value is None or key not in car_columns:
+            continue
+        if key in ["leasing_type", "fuel", "type", "location"]:
+            if pd.isna(value.id):
+                continue
+            value = value.id
+        elif key in ["department", "forvaltning"] and value == "":
+            value = None
+        values[key] = value
+    return values
+
+
 def update_vehicle_metadata(
     session: Session, validation: dict[int, str], vehicles: dict[int, Vehicle]
 ):
@@ -850,15 +881,16 @@ def update_vehicle_metadata(
     if not valid:
         raise MetadataRowInvalidError
 
-    # update all not-None values
-    count = 0
-
-    for key, value in validation.items():
-        if value != "ok":
-            continue
-
-        vehicle = vehicles[key]
-        res = update_single_vehicle(session, vehicle, ignore_none_values=True)
-        count = count + 1
+    # update all not-None values, in one bulk update by id
+    rows = [
+        vehicle_update_values(vehicles[key])
+        for key, value in validation.items()
+        if value == "ok"
+    ]
+    if rows:
+        session.execute(update(Cars), rows)
+        bump_data_generation(session)
+    session.commit()
+    count = len(rows)
 
     return count
@@ -3,6 +3,7 @@ from .dbschema import (
     AllowedStarts,
     AllowedStartAdditions,
     Cars,
+    DataGenerations,
     FuelTypes,
     LeasingTypes,
     RoundTrips,
@@ -12,3 +13,4 @@ from .dbschema import (
     get_default_fuel_types,
     RoundTripSegments
 )
+from .watermark import bump_data_generation, data_watermark
@@ -1,23 +1,40 @@
 import os
+import threading
 from importlib.resources import files
 
 import sqlalchemy
-from sqlalchemy import create_engine, select, inspect, text, Engine
+from sqlalchemy import create_engine, select, inspect, text, Engine, Index, MetaData, Table
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex, DropIndex
 from sqlalchemy.pool import StaticPool
 
 from .dbschema import (
     Base,
+    DataGenerations,
     FuelTypes,
     LeasingTypes,
     SimulationSettings,
     VehicleTypes,
+    get_default_data_generations,
     get_default_fuel_types,
     get_default_leasing_types,
     get_default_simulation_settings,
     get_default_vehicle_types,
 )
 
+# connection pool of the engine, the pool is created per process, i.e. per api or celery worker
+pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 10))
+pool_timeout = int(os.getenv("DB_POOL_TIMEOUT", 30))
+pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true")
+
+sqlite_dsn = "sqlite:///file:fleetdb?mode=memory&cache=shared&uri=true"
+
+# engines of the process keyed by dsn, such that all modules share the same connection pool
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
 
 def engine_creator(
     db_name=None,
@@ -28,7 +45,8 @@ def engine_creator(
 ) -> sqlalchemy.engine.Engine:
     """
     Generic db engine creator. Loads env variables, e.g. in .env otherwise could be passed with click.
-    Ensures that tables according to dbschema is created before returning
+    The engine is shared within the process, it's created and the schema is bootstrapped on the first call with
+    the given connection, following calls return the same engine.
 
     Parameters
     ----------
@@ -57,18 +75,42 @@ def engine_creator(
         if db_server == "mssql+pyodbc":
             # add the driver query to the string
             dsn += "?driver=ODBC+Driver+17+for+SQL+Server"
-        db_engine = create_engine(
-            dsn,
-            pool_recycle=1800,
-            # encoding="latin-1",
-        )
     else:
-        db_engine = create_engine(
-            "sqlite:///file:fleetdb?mode=memory&cache=shared&uri=true",
+        dsn = sqlite_dsn
+
+    with _engines_lock:
+        if dsn not in _engines:
+            db_engine = _create_engine(dsn)
+            bootstrap_database(db_engine, load_dummy_data=dsn == sqlite_dsn)
+            _engines[dsn] = db_engine
+        return _engines[dsn]
+
+
+def _create_engine(dsn: str) -> Engine:
+    if dsn == sqlite_dsn:
+        return create_engine(
+            dsn,
             connect_args={"check_same_thread": False},
             poolclass=StaticPool,
             # encoding="latin-1",
         )
+    return create_engine(
+        dsn,
+        pool_recycle=1800,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        # encoding="latin-1",
+    )
+
+
+def bootstrap_database(db_engine: Engine, load_dummy_data: bool = False) -> None:
+    """
+    Creates the missing tables and defaults. With load_dummy_data an empty database is filled with the dummy data,
+    used for the in memory sqlite database.
+    """
+    if load_dummy_data:
         insp = inspect(db_engine)
         if "cars" not in insp.get_table_names():
             Base.metadata.create_all(db_engine)
@@ -87,57 +129,139 @@ def engine_creator(
 
     Base.metadata.create_all(db_engine)
     create_defaults(db_engine)
-    return db_engine
+
+
+def dispose_engines() -> None:
+    """
+    Drops the connections inherited from the parent process after a fork, without closing them for the parent
+    """
+    for db_engine in _engines.values():
+        db_engine.dispose(close=False)
 
 
 def create_defaults(engine_: Engine) -> None:
     """
-    Function to load in the defaults defined in dbschema
+    Function to load in the defaults defined in dbschema. The existing ids are selected once per table and the
+    missing defaults are inserted in bulk.
     """
     Session = sessionmaker(bind=engine_)
     with Session.begin() as sess:
-        for vehicle_type in get_default_vehicle_types():
-            if (
-                len(
-                    sess.execute(
-                        select(VehicleTypes).where(VehicleTypes.id == vehicle_type.id)
-                    ).all()
-                )
-                == 0
-            ):
-                sess.add(vehicle_type)
-
-        for leasing_type in get_default_leasing_types():
-            if (
-                len(
-                    sess.execute(
-                        select(LeasingTypes).where(LeasingTypes.id == leasing_type.id)
-                    ).all()
-                )
-                == 0
-            ):
-                sess.add(leasing_type)
-
-        for fuel_type in get_default_fuel_types():
-            if (
-                len(
-                    sess.execute(
-                        select(FuelTypes).where(FuelTypes.id == fuel_type.id)
-                    ).all()
-                )
-                == 0
-            ):
-                sess.add(fuel_type)
-
-        for setting in get_default_simulation_settings():
-            if (
-                len(
-                    sess.execute(
-                        select(SimulationSettings).where(
-                            SimulationSettings.id == setting.id
-                        )
-                    ).all()
-                )
-                == 0
-            ):
-                sess.add(setting)
+        for table, defaults in (
+            (VehicleTypes, get_default_vehicle_types()),
+            (LeasingTypes, get_default_leasing_types()),
+            (FuelTypes, get_default_fuel_types()),
+            (SimulationSettings, get_default_simulation_settings()),
+            (DataGenerations, get_default_data_generations()),
+        ):
+            existing = set(sess.scalars(select(table.id)).all())
+            sess.add_all(
+                [default for default in defaults if default.id not in existing]
+            )
+
+
+def missing_indexes(engine_: Engine) -> list[Index]:
+    """
+    The indexes declared in the schema that do not exist in the database. create_all only creates the indexes of new
+    tables, hence the indexes added to existing tables are created with create_missing_indexes.
+    """
+    insp = inspect(engine_)
+    table_names = set(insp.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        existing = {index["name"] for index in insp.get_indexes(table.name)}
+        missing += sorted(
+            (index for index in table.indexes if index.name not in existing),
+            key=lambda index: index.name,
+        )
+    return missing
+
+
+# the single column indexes of the earlier schemas by the composite index that covers them
+redundant_index_names = {
+    "ix_roundtrips_car_id": "ix_roundtrips_car_id_start_time_end_time",
+    "ix_trips_car_id": "ix_trips_car_id_start_time",
+}
+
+
+def redundant_indexes(engine_: Engine) -> list[Index]:
+    """
+    The indexes of an existing database that are covered by a composite index of the schema, which exists as well
+    """
+    insp = inspect(engine_)
+    table_names = set(insp.get_table_names())
+    redundant = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in table_names:
+            continue
+        existing = {index["name"] for index in insp.get_indexes(table.name)}
+        if not any(redundant_index_names.get(name) in existing for name in existing):
+            continue
+        reflected = Table(table.name, MetaData(), autoload_with=engine_)
+        redundant += sorted(
+            (
+                index
+                for index in reflected.indexes
+                if redundant_index_names.get(index.name) in existing
+            ),
+            key=lambda index: index.name,
+        )
+    return redundant
+
+
+def create_missing_indexes(engine_: Engine) -> list[str]:
+    """
+    Creates the missing indexes of the schema without locking the tables where the database supports it, i.e. online
+    on mssql editions that support it and in place on mysql. Sqlite does not build indexes online. The indexes
+    covered by the composite indexes are dropped afterwards, such that the writes do not maintain both.
+
+    Returns
+    -------
+    The names of the created indexes
+    """
+    online_options = {
+        "mssql": " WITH (ONLINE = ON)",
+        "mysql": " ALGORITHM=INPLACE LOCK=NONE",
+    }
+    created = []
+    for index in missing_indexes(engine_):
+        statement = str(CreateIndex(index).compile(dialect=engine_.dialect))
+        online = online_options.get(engine_.dialect.name, "")
+        try:
+            with engine_.begin() as connection:
+                connection.execute(text(statement + online))
+        except DBAPIError:
+            if not online:
+                raise
+            # the edition does not support building the index online
+            with engine_.begin() as connection:
+                connection.execute(text(statement))
+        created.append(index.name)
+    for index in redundant_indexes(engine_):
+        with engine_.begin() as connection:
+            connection.execute(DropIndex(index))
+    return created
+
+
+def explain(engine_: Engine, statement) -> list[str]:
+    """
+    The query plan of the statement as lines of text. The statement is rendered with its parameters inlined.
+    """
+    sql = str(
+        statement.compile(dialect=engine_.dialect, compile_kwargs={"literal_binds": True})
+    )
+    with engine_.connect() as connection:
+        if engine_.dialect.name == "sqlite":
+            return [row.detail for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        if engine_.dialect.name == "mssql":
+            connection.exec_driver_sql("SET SHOWPLAN_TEXT ON")
+            try:
+                result = connection.exec_driver_sql(sql)
+                # the first result set is the statement, the second the plan
+                result.cursor.nextset()
+                return [row[0] for row in result.cursor.fetchall()]
+            finally:
+                connection.exec_driver_sql("SET SHOWPLAN_TEXT OFF")
+        result = connection.execute(text(f"EXPLAIN {sql}"))
+        return [" ".join(str(value) for value in row) for row in result]
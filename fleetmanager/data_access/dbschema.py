@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import (
     relationship,
     Mapped,
@@ -18,7 +18,8 @@ class Base(MappedAsDataclass, DeclarativeBase):
 class Trips(Base):
     __tablename__ = "trips"
     id: Mapped[int | None] = mapped_column(primary_key=True)
-    car_id: Mapped[int] = mapped_column(ForeignKey("cars.id"), index=True)
+    # the vehicle is looked up by ix_trips_car_id_start_time
+    car_id: Mapped[int] = mapped_column(ForeignKey("cars.id"))
     distance: Mapped[Optional[float]]
     start_time: Mapped[Optional[datetime]] = mapped_column(index=True)
     end_time: Mapped[Optional[datetime]] = mapped_column(index=True)
@@ -30,6 +31,11 @@ class Trips(Base):
     department: Mapped[Optional[str]] = mapped_column(String(128))
     start_location: Mapped[int] = mapped_column(ForeignKey("allowed_starts.id"))
 
+    __table_args__ = (
+        # the extractors load the trips of a vehicle from a date
+        Index("ix_trips_car_id_start_time", "car_id", "start_time"),
+    )
+
 
 class RoundTrips(Base):
     __tablename__ = "roundtrips"
@@ -47,11 +53,31 @@ class RoundTrips(Base):
         ForeignKey("allowed_starts.id")
     )
     trip_segments: Mapped[List["RoundTripSegments"]] = relationship()
-    car_id: Mapped[int] = mapped_column(ForeignKey("cars.id"), index=True)
+    # the vehicle is looked up by ix_roundtrips_car_id_start_time_end_time
+    car_id: Mapped[int] = mapped_column(ForeignKey("cars.id"))
     car: Mapped["Cars"] = relationship(
         "Cars", back_populates="round_trips", default=None
     )
 
+    # the roundtrips are filtered on the vehicle or the location in a period. The vehicle index covers the columns
+    # of the statistics on mssql and postgres, the other databases look up the rows
+    __table_args__ = (
+        Index(
+            "ix_roundtrips_car_id_start_time_end_time",
+            "car_id",
+            "start_time",
+            "end_time",
+            mssql_include=["distance", "start_location_id", "driver_name"],
+            postgresql_include=["distance", "start_location_id", "driver_name"],
+        ),
+        Index(
+            "ix_roundtrips_start_location_id_start_time_end_time",
+            "start_location_id",
+            "start_time",
+            "end_time",
+        ),
+    )
+
 
 class RoundTripSegments(Base):
     __tablename__ = "roundtripsegments"
@@ -61,6 +87,16 @@ class RoundTripSegments(Base):
     end_time: Mapped[Optional[datetime]]
     round_trip_id = mapped_column(ForeignKey("roundtrips.id"), index=True)
 
+    __table_args__ = (
+        Index(
+            "ix_roundtripsegments_round_trip_id_start_time",
+            "round_trip_id",
+            "start_time",
+            mssql_include=["end_time", "distance"],
+            postgresql_include=["end_time", "distance"],
+        ),
+    )
+
 
 class AllowedStarts(Base):
     __tablename__ = "allowed_starts"
@@ -173,6 +209,17 @@ class SimulationSettings(Base):
     type: Mapped[str] = mapped_column(String(128))
 
 
+class DataGenerations(Base):
+    __tablename__ = "data_generations"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(128))
+    generation: Mapped[int] = mapped_column(Integer, default=0)
+
+
+def get_default_data_generations():
+    return [DataGenerations(id=1, name="vehicles", generation=0)]
+
+
 def get_default_leasing_types():
     return [
         LeasingTypes(id=1, name="operationel"),
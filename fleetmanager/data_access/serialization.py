@@ -0,0 +1,173 @@
+"""
+Compact serialization of the celery task arguments and results, registered as a kombu serializer.
+
+The results of the simulations are mostly lists of records, like the driving book with a record per trip, which
+pickle stores with the keys repeated per record. The codec stores lists of records with the same keys as columns,
+encodes the document as json and compresses it with zlib. Values json does not know, like datetimes and the pydantic
+models of the options and solutions, are tagged with their type.
+
+A payload starts with a magic and the version of the codec. Payloads without the magic are legacy pickled results,
+which are unpickled, such that the results stored before the codec was introduced can still be read.
+"""
+import json
+import logging
+import pickle
+import zlib
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterator
+from uuid import UUID
+
+import numpy as np
+import pandas as pd
+from kombu import serialization
+from pydantic import BaseModel
+
+from fleetmanager.model.engines import import_path
+
+logger = logging.getLogger(__name__)
+
+codec_name = "fleetmanager"
+content_type = "application/x-fleetmanager"
+codec_version = 1
+magic = b"FMC"
+
+# the keys of the task results in the redis result backend, the backend also stores the groups and chord counters
+task_meta_prefix = "celery-task-meta-"
+
+# lists of at least this many records with the same keys are stored as columns
+min_records = 2
+
+
+def tagged(type_name: str, value) -> dict:
+    return {"__type__": type_name, "__value__": value}
+
+
+def columnar(value):
+    """
+    Converts the lists of records in the value to tagged columns, recursively
+    """
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            return tagged("dict", [[columnar(key), columnar(item)] for key, item in value.items()])
+        return {key: columnar(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) >= min_records and isinstance(value[0], dict):
+            columns = list(value[0])
+            # records without keys have no columns to restore their number from
+            if columns and all(isinstance(column, str) for column in columns) and all(
+                isinstance(item, dict) and list(item) == columns for item in value
+            ):
+                return tagged(
+                    "records", {column: columnar([item[column] for item in value]) for column in columns}
+                )
+        return [columnar(item) for item in value]
+    return value
+
+
+def default(value):
+    """
+    Encodes the values json does not know
+    """
+    if value is pd.NaT:
+        return tagged("timestamp", None)
+    if isinstance(value, BaseModel):
+        model = type(value)
+        return tagged(
+            "model",
+            {"model": f"{model.__module__}:{model.__qualname__}", "fields": columnar(value.dict())},
+        )
+    if isinstance(value, pd.Timestamp):
+        return tagged("timestamp", value.isoformat())
+    if isinstance(value, datetime):
+        return tagged("datetime", value.isoformat())
+    if isinstance(value, date):
+        return tagged("date", value.isoformat())
+    if isinstance(value, time):
+        return tagged("time", value.isoformat())
+    if isinstance(value, timedelta):
+        return tagged("timedelta", value.total_seconds())
+    if isinstance(value, Decimal):
+        return tagged("decimal", str(value))
+    if isinstance(value, UUID):
+        return tagged("uuid", str(value))
+    if isinstance(value, (set, frozenset)):
+        return tagged("set", columnar(list(value)))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return columnar(value.tolist())
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable by the {codec_name} codec")
+
+
+def model_from_fields(value: dict) -> BaseModel:
+    model = import_path(value["model"])
+    if not (
+        isinstance(model, type) and issubclass(model, BaseModel) and model.__module__.startswith("fleetmanager.")
+    ):
+        raise ValueError(f"{value['model']} is not a model of the fleetmanager")
+    return model.parse_obj(value["fields"])
+
+
+decoders = {
+    "records": lambda columns: [dict(zip(columns, row)) for row in zip(*columns.values())],
+    "dict": lambda items: {tuple(key) if isinstance(key, list) else key: item for key, item in items},
+    "model": model_from_fields,
+    "timestamp": lambda value: pd.NaT if value is None else pd.Timestamp(value),
+    "datetime": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": time.fromisoformat,
+    "timedelta": lambda value: timedelta(seconds=value),
+    "decimal": Decimal,
+    "uuid": UUID,
+    "set": set,
+}
+
+
+def object_hook(value: dict):
+    if len(value) == 2 and "__type__" in value and "__value__" in value:
+        return decoders[value["__type__"]](value["__value__"])
+    return value
+
+
+def encode(value) -> bytes:
+    document = json.dumps(columnar(value), default=default, ensure_ascii=False, separators=(",", ":"))
+    return magic + bytes([codec_version]) + zlib.compress(document.encode())
+
+
+def decode(payload: bytes):
+    """
+    Decodes a payload of the codec, or a legacy pickled payload
+    """
+    payload = bytes(payload)
+    if not payload.startswith(magic):
+        return pickle.loads(payload)
+    version = payload[len(magic)]
+    if version > codec_version:
+        raise ValueError(f"Payload of version {version} of the {codec_name} codec, this is version {codec_version}")
+    return json.loads(zlib.decompress(payload[len(magic) + 1 :]), object_hook=object_hook)
+
+
+def stored_task_results(redis) -> Iterator[dict]:
+    """
+    The task results stored in the redis result backend. Only the task result keys are read, the keys of the groups
+    and the chord counters hold other values. Results that cannot be read are skipped.
+    """
+    for key in redis.scan_iter(match=f"{task_meta_prefix}*"):
+        try:
+            payload = redis.get(key)
+            meta = None if payload is None else decode(payload)
+        except Exception as e:
+            logger.warning(f"Could not read the task result {key!r}: {e!r}")
+            continue
+        if isinstance(meta, dict):
+            yield meta
+
+
+def register_codec() -> None:
+    """
+    Registers the codec with kombu, such that celery can use it as task_serializer and result_serializer
+    """
+    serialization.register(
+        codec_name, encode, decode, content_type=content_type, content_encoding="binary"
+    )
@@ -0,0 +1,41 @@
+"""
+Watermark of the data behind the memoized vehicle lists and the cached simulations.
+
+Committed roundtrips raise the last roundtrip id. Removed roundtrips and edited vehicles or locations do not show in
+the roundtrip ids, hence the functions that edit them bump the generation counter in the same transaction. The
+extractors bump it when they clean the roundtrips at the end of a run, which covers the vehicles and locations they
+synchronised. Reading the watermark costs one aggregate over the primary key of the roundtrips.
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .dbschema import DataGenerations, RoundTrips
+
+# the counter of the vehicles, locations and removed roundtrips in data_generations
+vehicle_generation_id = 1
+
+
+def bump_data_generation(session: Session) -> None:
+    """
+    Starts a new generation of the data, the caller commits
+    """
+    session.execute(
+        update(DataGenerations)
+        .where(DataGenerations.id == vehicle_generation_id)
+        .values(generation=DataGenerations.generation + 1)
+    )
+
+
+def data_watermark(session: Session) -> tuple[int | None, int | None]:
+    """
+    The last roundtrip id and the generation counter, the pair changes whenever the data behind the results changes
+    """
+    generation = (
+        select(DataGenerations.generation)
+        .where(DataGenerations.id == vehicle_generation_id)
+        .scalar_subquery()
+    )
+    last_roundtrip, generation = session.execute(
+        select(func.max(RoundTrips.id), generation)
+    ).one()
+    return last_roundtrip, generation
@@ -1,15 +1,23 @@
 import json
 
 import click
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
+from sqlalchemy import func, select
 from sqlalchemy.orm import sessionmaker
 
-from fleetmanager.data_access.db_engine import engine_creator
+from fleetmanager.data_access.db_engine import (
+    create_missing_indexes,
+    engine_creator,
+    explain,
+    missing_indexes,
+    redundant_indexes,
+)
 from fleetmanager.data_access.dbschema import (
     AllowedStarts,
     Cars,
     RoundTrips,
+    RoundTripSegments,
     SimulationSettings,
     Trips,
     VehicleTypes,
@@ -222,5 +230,73 @@ def set_items(ctx, path, schema):
             print(f"Added {len(items)} items to the DB")
 
 
+def index_key_queries(session) -> dict:
+    """
+    The hot roundtrip and trip queries, i.e. the period of a vehicle or a location as filtered by the statistics,
+    the simulations and the extractors. The queries use an existing vehicle and location such that the plans reflect
+    the data.
+    """
+    car_id = session.scalar(select(func.min(RoundTrips.car_id))) or 1
+    location_id = session.scalar(select(func.min(RoundTrips.start_location_id))) or 1
+    end_date = session.scalar(select(func.max(RoundTrips.end_time))) or datetime.now()
+    start_date = end_date - timedelta(days=30)
+    location_roundtrips = select(RoundTrips.id).where(
+        RoundTrips.start_location_id == location_id,
+        RoundTrips.start_time >= start_date,
+        RoundTrips.end_time <= end_date,
+    )
+    return {
+        "vehicle roundtrips": select(
+            RoundTrips.start_time, RoundTrips.end_time, RoundTrips.distance, RoundTrips.driver_name
+        ).where(
+            RoundTrips.car_id == car_id,
+            RoundTrips.start_time >= start_date,
+            RoundTrips.end_time <= end_date,
+        ),
+        "location roundtrips": location_roundtrips,
+        "location segments": select(
+            RoundTripSegments.round_trip_id,
+            RoundTripSegments.start_time,
+            RoundTripSegments.end_time,
+            RoundTripSegments.distance,
+        ).where(RoundTripSegments.round_trip_id.in_(location_roundtrips)),
+        "vehicle trips": select(Trips.id, Trips.start_time, Trips.end_time).where(
+            Trips.car_id == car_id, Trips.start_time >= start_date
+        ),
+    }
+
+
+@cli.command()
+@click.pass_context
+@click.option("--dry-run", is_flag=True, default=False, help="only report the missing and redundant indexes and the query plans")
+def create_indexes(ctx, dry_run):
+    """
+    Creates the indexes of the schema that are missing in an existing database, online where the database supports
+    it, and drops the indexes they cover. The query plans of the key roundtrip queries are printed before and after.
+    """
+    engine = ctx.obj["engine"]
+    queries = index_key_queries(ctx.obj["Session"])
+
+    def print_plans(title):
+        print(f"*** query plans {title}")
+        for name, query in queries.items():
+            print(name)
+            for line in explain(engine, query):
+                print(f"    {line}")
+
+    missing = missing_indexes(engine)
+    redundant = redundant_indexes(engine)
+    print(f"Missing indexes: {', '.join(index.name for index in missing) or 'none'}")
+    print(f"Redundant indexes: {', '.join(index.name for index in redundant) or 'none'}")
+    print_plans("before")
+    if dry_run or not (missing or redundant):
+        return
+    for name in create_missing_indexes(engine):
+        print(f"Created index {name}")
+    for index in redundant:
+        print(f"Dropped index {index.name}")
+    print_plans("after")
+
+
 if __name__ == "__main__":
     cli()
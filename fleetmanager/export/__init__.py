@@ -0,0 +1,10 @@
+from .util import (
+    constant_memory_workbook,
+    export_format,
+    export_headers,
+    frame_to_file,
+    header_format,
+    iter_file,
+    spooled_file,
+    write_frame,
+)
@@ -0,0 +1,146 @@
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Iterator, Literal
+
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.workbook import Workbook
+from xlsxwriter.worksheet import Worksheet
+
+# exports stay in memory until they exceed this size, after which they are rolled over to disk
+SPOOL_MAX_SIZE = int(os.getenv("EXPORT_SPOOL_MAX_SIZE", 16 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+export_format = Literal["xlsx", "csv", "parquet"]
+
+media_types = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def spooled_file() -> SpooledTemporaryFile:
+    """
+    Temporary binary file used as target for exports. Small exports never touch the disk, large exports are
+    rolled over to a temporary file, so the export does not live in the memory of the api worker.
+    """
+    return SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode="w+b")
+
+
+def constant_memory_workbook(output) -> Workbook:
+    """
+    Creates a xlsxwriter workbook in constant_memory mode, meaning that each row is flushed to a temporary file as
+    soon as a new row is written. Rows must be written in increasing order and add_table() is not supported.
+
+    Parameters
+    ----------
+    output  :   file like object the workbook will be saved to on close
+
+    Returns
+    -------
+    xlsxwriter.Workbook
+    """
+    return xlsxwriter.Workbook(
+        output,
+        {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+            "remove_timezone": True,
+        },
+    )
+
+
+def header_format(workbook: Workbook):
+    """
+    Header format resembling the "Table Style Medium 2" header, which is not available in constant_memory mode
+    """
+    return workbook.add_format(
+        {"bold": True, "font_color": "#FFFFFF", "bg_color": "#4F81BD", "border": 1}
+    )
+
+
+def write_frame(
+    worksheet: Worksheet,
+    frame: pd.DataFrame,
+    start_row: int = 0,
+    start_col: int = 0,
+    column_format=None,
+    autofit: bool = True,
+) -> int:
+    """
+    Writes the frame row by row to the worksheet such that it's compatible with constant_memory mode.
+    Missing values are left as blank cells like pandas.DataFrame.to_excel does.
+
+    Parameters
+    ----------
+    worksheet       :   the worksheet to write to
+    frame           :   the data to write, the columns are used as header
+    start_row       :   the row of the header
+    start_col       :   the column of the first column in the frame
+    column_format   :   format of the header cells
+    autofit         :   whether to set the column widths to the longest value in the column
+
+    Returns
+    -------
+    the next row in the worksheet that has not been written to
+    """
+    if autofit:
+        for col_idx, col in enumerate(frame):
+            values = frame[col].astype(str).map(len)
+            column_length = max(
+                0 if len(values) == 0 else values.max(), len(str(col))
+            )
+            worksheet.set_column(
+                start_col + col_idx, start_col + col_idx, column_length
+            )
+
+    worksheet.write_row(start_row, start_col, list(map(str, frame.columns)), column_format)
+    row = start_row + 1
+    for values in frame.itertuples(index=False, name=None):
+        worksheet.write_row(
+            row, start_col, [None if pd.isna(value) else value for value in values]
+        )
+        row += 1
+    return row
+
+
+def frame_to_file(frame: pd.DataFrame, file_format: export_format) -> SpooledTemporaryFile:
+    """
+    Writes a flat frame to a spooled file as csv or parquet, suitable for exports that are too large for excel.
+    Parquet export requires pyarrow or fastparquet to be installed.
+
+    Returns
+    -------
+    spooled file positioned at the start
+    """
+    output = spooled_file()
+    if file_format == "csv":
+        frame.to_csv(output, mode="wb", index=False, encoding="utf-8", chunksize=10000)
+    elif file_format == "parquet":
+        frame.to_parquet(output, index=False)
+    else:
+        raise ValueError(f"Unsupported export format {file_format}")
+    output.seek(0)
+    return output
+
+
+def iter_file(file, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yields the content of the file in chunks to be used with StreamingResponse. The file is closed when exhausted.
+    """
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+def export_headers(filename: str, file_format: export_format = "xlsx") -> dict:
+    """
+    Headers for downloading the export as attachment. The extension is added to the filename.
+    """
+    return {
+        "Content-Disposition": f'attachment; filename="{filename}.{file_format}"',
+        "Content-Type": media_types[file_format],
+    }
@@ -11,6 +11,7 @@ from sqlalchemy.orm import sessionmaker
 from tenacity import RetryError
 
 from fleetmanager.data_access import AllowedStarts, Cars, RoundTrips
+from fleetmanager.extractors import maintenance
 from fleetmanager.extractors.clevertrack.api_util import (
     DuplicatePlateCleverTrack,
     TripIdPatchError,
@@ -307,7 +308,15 @@ def patch_roundtrips(ctx):
                     "Retries failed due to a different exception:", original_exception
                 )
 
-# todo create clean-roundtrips for clevertrack
+
+@cli.command()
+@click.pass_context
+def clean_roundtrips(ctx):
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
+
 
 def write_tripid_file(patched_ids: dict, path: str, new_ids: list, car_id: int):
     """
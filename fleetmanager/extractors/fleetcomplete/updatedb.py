@@ -4,14 +4,13 @@ import datetime
 import json
 import logging
 import os
-import time
 import urllib.parse
 from dataclasses import dataclass
+from functools import partial
 
 import click
 import pandas as pd
 import requests
-from dateutil.relativedelta import relativedelta
 from pydantic import ValidationError
 from sqlalchemy import create_engine, func, or_, select, text, bindparam
 from sqlalchemy.orm import Session, sessionmaker
@@ -24,11 +23,12 @@ from fleetmanager.data_access import (
     Cars,
     FuelTypes,
     RoundTrips,
-    SimulationSettings,
     Trips,
     VehicleTypes,
 )
-from fleetmanager.data_access.dbschema import RoundTripSegments
+from fleetmanager.extractors import maintenance
+from fleetmanager.extractors.http import fetch_all, request_async
+from fleetmanager.extractors.http import run_request as http_request
 from fleetmanager.extractors.util import get_allowed_starts_with_additions
 from fleetmanager.model.roundtripaggregator import aggregator, process_car_roundtrips
 from fleetmanager.model.roundtripaggregator import aggregating_score as score
@@ -134,7 +134,7 @@ def set_vehicles(ctx, description_fields=None):
     starts = pd.read_sql(Query(AllowedStarts).statement, engine)
     fuel_settings = pd.read_sql(Query(FuelTypes).statement, engine)
     vehicle_settings = pd.read_sql(Query(VehicleTypes).statement, engine)
-    vehicles_response = requests.get(url + "Api/Vehicles/get", params=params)
+    vehicles_response = run_request(url + "Api/Vehicles/get", params=params)
     cars = json.loads(vehicles_response.content)["response"]
     # get currently saved cars to update if changes and save new ones
     current_cars = pd.read_sql(Query(Cars).statement, engine)
@@ -432,64 +432,10 @@ def set_roundtrips(ctx):
 @cli.command()
 @click.pass_context
 def clean_roundtrips(ctx):
-    engine = ctx.obj["engine"]
-    Session = ctx.obj["Session"]
-
-    rt = pd.read_sql(
-        Query([RoundTrips.id, RoundTrips.start_time, RoundTrips.car_id]).statement,
-        engine,
-    )
-    keep = rt.drop_duplicates(["start_time", "car_id"]).id.values
-    remove = [int(a) for a in rt[~rt.id.isin(keep)].id.values]
-    if len(remove) != 0:
-        assert len(rt) > len(remove), "Did not clean"
-        print(f"Removing {len(remove)} duplicates", flush=True)
-        with Session() as sess:
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_(remove)
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.id.in_(remove)).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
-
-    with Session() as sess:
-        keep_data = (
-            sess.query(SimulationSettings)
-            .filter(SimulationSettings.name == "keep_data")
-            .first()
-        )
-        if keep_data:
-            delete_time = (
-                datetime.datetime.now()
-                - relativedelta(months=int(keep_data.value))
-                - datetime.timedelta(days=1)
-            )
-            assert delete_time < datetime.datetime.now() - relativedelta(
-                months=6
-            ), "Not allowing to delete less than 6 months old data"
-            rtr = (
-                sess.query(RoundTrips.id)
-                .filter(RoundTrips.start_time < delete_time)
-                .all()
-            )
-            print(
-                f"********************* would like to delete, {len(rtr)} roundtrips",
-                flush=True,
-            )
-            chunk_size = 2000
-            for i in range(0, len(rtr), chunk_size):
-                current_rtr = rtr[i:i + chunk_size]
-                sess.query(RoundTripSegments).filter(
-                    RoundTripSegments.round_trip_id.in_([r.id for r in current_rtr])
-                ).delete(synchronize_session="fetch")
-                sess.commit()
-
-            sess.query(RoundTrips).filter(RoundTrips.start_time < delete_time).delete(
-                synchronize_session="fetch"
-            )
-
-            sess.commit()
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
 
 
 @dataclass
@@ -523,14 +469,26 @@ def get_trips(
         from_date = min_time
 
     trips = []
-    for k, (start_date, end_date) in enumerate(
-        quantize_months(from_date, current_time)
-    ):
-        params["objectId"] = car_id
-        params["begTimestamp"] = start_date
-        params["endTimestamp"] = end_date
-
-        response_ = run_request(url + "Api/Vehicles/getTrips", params=params)
+    month_pairs = quantize_months(from_date, current_time)
+    # the months are independent, so they are pulled concurrently
+    responses = fetch_all(
+        [
+            partial(
+                request_async,
+                method="GET",
+                uri=url + "Api/Vehicles/getTrips",
+                provider="fleetcomplete",
+                params={
+                    **params,
+                    "objectId": car_id,
+                    "begTimestamp": start_date,
+                    "endTimestamp": end_date,
+                },
+            )
+            for start_date, end_date in month_pairs
+        ]
+    )
+    for (start_date, end_date), response_ in zip(month_pairs, responses):
         response = json.loads(response_.content)["response"]
         print(
             f"pulled {0 if response is None else len(response)} for car id {car_id} in period {start_date} to {end_date}"
@@ -590,15 +548,9 @@ def quantize_months(start_date, end_date, days=28):
 
 def run_request(uri, params):
     """
-    Wrapper to retry request if it fails
+    Wrapper to rate limit and retry request if it fails
     """
-    while True:
-        response = requests.get(uri, params=params)
-        if response.status_code != 429:
-            break
-        print("Too many requests retrying...")
-        time.sleep(3)  # Handle too many requests
-    return response
+    return http_request(uri, params=params, provider="fleetcomplete")
 
 
 def to_list(env_string):
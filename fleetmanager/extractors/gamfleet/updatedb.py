@@ -2,7 +2,7 @@
 import json
 import os
 from dataclasses import dataclass
-from datetime import datetime, timedelta, date, time as dttime
+from datetime import datetime, date, time as dttime
 from dateutil.relativedelta import relativedelta
 import logging
 
@@ -17,12 +17,11 @@ from fleetmanager.data_access import (
     AllowedStarts,
     Cars,
     RoundTrips,
-    RoundTripSegments,
     FuelTypes,
     VehicleTypes,
     LeasingTypes,
-    SimulationSettings
 )
+from fleetmanager.extractors import maintenance
 from fleetmanager.extractors.mileagebook.updatedb import CarModel
 from fleetmanager.extractors.skyhost.updatedb import summer_times, winter_times
 
@@ -429,66 +428,10 @@ def set_roundtrips(ctx):
 @cli.command()
 @click.pass_context
 def clean_roundtrips(ctx):
-    engine = ctx.obj["engine"]
-    Session = ctx.obj["Session"]
-
-    rt = pd.read_sql(
-        Query([RoundTrips.id, RoundTrips.start_time, RoundTrips.car_id]).statement,
-        engine,
-    )
-    keep = rt.drop_duplicates(["start_time", "car_id"]).id.values
-    remove = [int(a) for a in rt[~rt.id.isin(keep)].id.values]
-    if len(remove) != 0:
-        assert len(rt) > len(remove), "Did not clean"
-        print(f"Removing {len(remove)} duplicates", flush=True)
-        with Session() as sess:
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_(remove)
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.id.in_(remove)).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
-
-    with Session() as sess:
-        keep_data = (
-            sess.query(SimulationSettings)
-            .filter(SimulationSettings.name == "keep_data")
-            .first()
-        )
-        if keep_data:
-            delete_time = (
-                datetime.now()
-                - relativedelta(months=int(keep_data.value))
-                - timedelta(days=1)
-            )
-            assert delete_time < datetime.now() - relativedelta(
-                months=6
-            ), "Not allowing to delete less than 6 months old data"
-            print(delete_time)
-
-            rtr = (
-                sess.query(RoundTrips.id)
-                .filter(RoundTrips.start_time < delete_time)
-                .all()
-            )
-            rtrs = (
-                sess.query(RoundTripSegments.id)
-                .filter(RoundTripSegments.round_trip_id.in_([r.id for r in rtr]))
-                .all()
-            )
-            print(
-                f"********************* would like to delete {len(rtrs)} roundtripsegments and {len(rtr)} roundtrips",
-                flush=True,
-            )
-
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_([r.id for r in rtr])
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.start_time < delete_time).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
 
 
 def location_precision_test(
@@ -1,9 +1,12 @@
 import requests
-from time import sleep
+from functools import partial
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from fleetmanager.extractors.http import fetch_all, request_async
+from fleetmanager.extractors.http import run_request as http_request
+
 
 def load_dmr_request(plate: str):
     url = f"https://www.tjekbil.dk/api/v3/dmr/regnr/{plate}"
@@ -61,15 +64,9 @@ def get_splate_info_from_api(plate: str) -> dict:
 
 def run_request(uri, params, headers=None):
     """
-    Wrapper to retry request if it fails
+    Wrapper to rate limit and retry request if it fails
     """
-    while True:
-        response = requests.get(uri, params=params, headers=headers)
-        if response.status_code != 429:
-            break
-        print("Too many requests retrying...")
-        sleep(3)  # Handle too many requests
-    return response
+    return http_request(uri, params=params, headers=headers, provider="gamfleet")
 
 
 def date_iter(start_date, end_date, week_period=24):
@@ -101,13 +98,28 @@ def date_iter(start_date, end_date, week_period=24):
 def get_logs(vehicle_id: int | str, from_date: datetime, to_date: datetime, url: str, params: dict, weeks: int = 2):
     trips = []
 
-    for start, end in date_iter(from_date, to_date, week_period=weeks):
-        print(f"     Pulling        {start}    -      {end}")
-        params["StartDateYYYYMMDDHHMMSS"] = start.strftime("%Y%m%d%H%M%S")
-        params["EndDateYYYYMMDDHHMMSS"] = end.strftime("%Y%m%d%H%M%S")
-        params["VehicleId"] = vehicle_id
-        response = run_request(uri=url, params=params)
-
+    periods = list(date_iter(from_date, to_date, week_period=weeks))
+    # the periods are independent, so they are pulled concurrently
+    responses = fetch_all(
+        [
+            partial(
+                request_async,
+                method="GET",
+                uri=url,
+                provider="gamfleet",
+                params={
+                    **params,
+                    "StartDateYYYYMMDDHHMMSS": start.strftime("%Y%m%d%H%M%S"),
+                    "EndDateYYYYMMDDHHMMSS": end.strftime("%Y%m%d%H%M%S"),
+                    "VehicleId": vehicle_id,
+                },
+            )
+            for start, end in periods
+        ]
+    )
+
+    for (start, end), response in zip(periods, responses):
+        print(f"     Pulled        {start}    -      {end}")
         if response.status_code != 200:
             print(f"Trip request returned code {response.status_code}")
             trips = []
@@ -0,0 +1,317 @@
+"""
+Shared http layer for the extractors.
+
+All requests to the providers go through a pooled httpx client per provider, such that connections and TLS
+handshakes are reused. Each provider has a rate limiter made of one or more token buckets, configured from the
+documented limits of the provider or overridden with the environment variable <PROVIDER>_RATE_LIMIT, e.g.
+SKYHOST_SOAP_RATE_LIMIT="100/1,1000/60" for 100 points per second and 1000 points per minute.
+Requests that are rate limited (429) or fail on the server side are retried with exponential backoff, honouring
+the Retry-After header when it is sent.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# limits as (capacity, period in seconds)
+provider_limits = {
+    # documented limits of the Skyhost SOAP service, costs of the calls are found in SoapAgent.functions
+    "skyhost_soap": [(100, 1), (1000, 60)],
+    "skyhost": [(10, 1)],
+    "fleetcomplete": [(10, 1)],
+    "mileagebook": [(10, 1)],
+    "gamfleet": [(10, 1)],
+    "default": [(10, 1)],
+}
+
+retry_status_codes = {429, 500, 502, 503, 504}
+max_retries = int(os.getenv("HTTP_MAX_RETRIES", 8))
+max_backoff = 60
+timeout = httpx.Timeout(float(os.getenv("HTTP_TIMEOUT", 120)), connect=10)
+pool_limits = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to capacity tokens, which are refilled continuously over the period.
+    Calls reserve their cost up front, the bucket can go negative, in which case the caller has to wait until
+    the bucket has been refilled. This way reservations are served in the order they were made.
+    """
+
+    def __init__(self, capacity: float, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost: float = 1) -> float:
+        """
+        Reserve cost tokens from the bucket
+
+        Returns
+        -------
+        seconds to wait before the reserved call is allowed
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= cost
+            return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Combines a number of token buckets, a call is allowed when all buckets allow it.
+    """
+
+    def __init__(self, limits: list[tuple[float, float]]):
+        self.buckets = [TokenBucket(capacity, period) for capacity, period in limits]
+
+    def reserve(self, cost: float = 1) -> float:
+        return max([bucket.reserve(cost) for bucket in self.buckets], default=0)
+
+    def acquire(self, cost: float = 1) -> float:
+        """
+        Blocks until the call is allowed, returns the seconds waited
+        """
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, cost: float = 1) -> float:
+        """
+        Awaits until the call is allowed, returns the seconds waited
+        """
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def parse_limits(limits: str) -> list[tuple[float, float]]:
+    """
+    Parse limits in the format "capacity/period,capacity/period", e.g. "100/1,1000/60"
+    """
+    parsed = []
+    for limit in limits.split(","):
+        capacity, period = limit.strip().split("/")
+        parsed.append((float(capacity), float(period)))
+    return parsed
+
+
+_limiters: dict[tuple[str, str | None], RateLimiter] = {}
+_clients: dict[tuple[int, str], httpx.Client] = {}
+_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, key: str | None = None) -> RateLimiter:
+    """
+    The rate limiter shared by all requests to the provider in this process. If the limits of the provider apply
+    per account, the key identifies the account.
+    """
+    with _lock:
+        if (provider, key) not in _limiters:
+            env_limits = os.getenv(f"{provider.upper()}_RATE_LIMIT")
+            limits = (
+                parse_limits(env_limits)
+                if env_limits
+                else provider_limits.get(provider, provider_limits["default"])
+            )
+            _limiters[(provider, key)] = RateLimiter(limits)
+        return _limiters[(provider, key)]
+
+
+def get_client(provider: str) -> httpx.Client:
+    """
+    The pooled client of the provider. Clients are created per process, so connections are not shared across
+    forked workers.
+    """
+    key = (os.getpid(), provider)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = httpx.Client(
+                timeout=timeout, limits=pool_limits, follow_redirects=True
+            )
+        return _clients[key]
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """
+    Seconds to wait according to the Retry-After header, which is either seconds or a http date
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff(attempt: int, response: httpx.Response | None = None) -> float:
+    """
+    Exponential backoff with jitter, the Retry-After header of the response takes precedence
+    """
+    if response is not None and (wait := retry_after(response)) is not None:
+        return wait
+    return min(max_backoff, 2**attempt) * (0.5 + random.random() / 2)
+
+
+def request(
+    method: str,
+    uri: str,
+    provider: str = "default",
+    cost: float = 1,
+    key: str | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Sends a rate limited request with the pooled client of the provider. Retries on rate limiting, server errors
+    and connection errors. The last response is returned when the retries are exhausted.
+
+    Parameters
+    ----------
+    method      :   http method
+    uri         :   url of the request
+    provider    :   name of the provider, decides the client and the rate limiter used
+    cost        :   the number of tokens the call costs
+    key         :   the account of the rate limiter, if the limits of the provider apply per account
+    kwargs      :   passed on to httpx.Client.request, e.g. params, headers, data, json
+
+    Returns
+    -------
+    httpx.Response
+    """
+    client = get_client(provider)
+    limiter = get_rate_limiter(provider, key)
+    attempt = 0
+    while True:
+        limiter.acquire(cost)
+        try:
+            response = client.request(method, uri, **kwargs)
+        except httpx.TransportError as e:
+            if attempt >= max_retries:
+                raise e
+            wait = backoff(attempt)
+            logger.warning(f"{provider} request failed with {e!r}, retrying in {wait:.1f} sec")
+        else:
+            if response.status_code not in retry_status_codes or attempt >= max_retries:
+                return response
+            wait = backoff(attempt, response)
+            logger.warning(
+                f"{provider} request returned {response.status_code}, retrying in {wait:.1f} sec"
+            )
+        attempt += 1
+        time.sleep(wait)
+
+
+def run_request(uri, params=None, headers=None, provider: str = "default") -> httpx.Response:
+    """
+    Rate limited GET request with retries
+    """
+    return request("GET", uri, provider=provider, params=params, headers=headers)
+
+
+async def request_async(
+    client: httpx.AsyncClient,
+    method: str,
+    uri: str,
+    provider: str = "default",
+    cost: float = 1,
+    key: str | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Async version of request, sharing the rate limiter of the provider with the synchronous requests
+    """
+    limiter = get_rate_limiter(provider, key)
+    attempt = 0
+    while True:
+        await limiter.acquire_async(cost)
+        try:
+            response = await client.request(method, uri, **kwargs)
+        except httpx.TransportError as e:
+            if attempt >= max_retries:
+                raise e
+            wait = backoff(attempt)
+            logger.warning(f"{provider} request failed with {e!r}, retrying in {wait:.1f} sec")
+        else:
+            if response.status_code not in retry_status_codes or attempt >= max_retries:
+                return response
+            wait = backoff(attempt, response)
+            logger.warning(
+                f"{provider} request returned {response.status_code}, retrying in {wait:.1f} sec"
+            )
+        attempt += 1
+        await asyncio.sleep(wait)
+
+
+async def fetch_pages(
+    client: httpx.AsyncClient,
+    uri: str,
+    provider: str = "default",
+    next_page: Callable[[httpx.Response], dict | None] = lambda response: None,
+    **kwargs,
+) -> list[httpx.Response]:
+    """
+    Follows the pagination of a request. next_page returns the keyword arguments for the next request,
+    e.g. {"uri": next_link, "params": None}, or None when the last page is reached. Pagination stops on the first
+    response that is not successful, which is returned as the last page.
+    """
+    pages = []
+    while True:
+        response = await request_async(client, "GET", uri, provider=provider, **kwargs)
+        pages.append(response)
+        if response.status_code != 200 or (next_kwargs := next_page(response)) is None:
+            return pages
+        uri = next_kwargs.pop("uri", uri)
+        kwargs.update(next_kwargs)
+
+
+def fetch_all(
+    requests: list[Callable[[httpx.AsyncClient], Awaitable]],
+    concurrency: int = 4,
+):
+    """
+    Runs the requests concurrently on a pooled async client, while respecting the rate limits of the providers.
+    Each request is a function taking the client, e.g.
+        lambda client: request_async(client, "GET", url, provider="gamfleet", params=params)
+        lambda client: fetch_pages(client, url, provider="skyhost", next_page=...)
+
+    Returns
+    -------
+    the results of the requests in the order they were given
+    """
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with httpx.AsyncClient(
+            timeout=timeout, limits=pool_limits, follow_redirects=True
+        ) as client:
+            async def bounded(fetch):
+                async with semaphore:
+                    return await fetch(client)
+
+            return await asyncio.gather(*(bounded(fetch) for fetch in requests))
+
+    return asyncio.run(run())
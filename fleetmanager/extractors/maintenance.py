@@ -0,0 +1,137 @@
+"""
+Shared maintenance of the roundtrips for the extractors.
+
+Duplicated roundtrips, i.e. roundtrips of a vehicle with the same start time, are found with a window over the
+vehicle and start time in the database, such that the table is not read into memory. The first roundtrip by id is
+kept. Roundtrips older than the keep_data retention are purged in bounded batches. The segments of the removed
+roundtrips are removed with them. Every delete binds at most batch_size ids, below the parameter limit of mssql.
+The cleaning closes a run of the extractors, hence it starts a new data generation for the vehicles, locations and
+roundtrips the run has synchronised.
+"""
+import os
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from fleetmanager.data_access import (
+    RoundTrips,
+    RoundTripSegments,
+    SimulationSettings,
+    bump_data_generation,
+)
+
+batch_size = int(os.getenv("CLEAN_BATCH_SIZE", 1000))
+
+
+def delete_roundtrips(session: Session, roundtrip_ids: list[int]) -> None:
+    """
+    Deletes the roundtrips and their segments, the caller commits
+    """
+    session.query(RoundTripSegments).filter(
+        RoundTripSegments.round_trip_id.in_(roundtrip_ids)
+    ).delete(synchronize_session=False)
+    session.query(RoundTrips).filter(RoundTrips.id.in_(roundtrip_ids)).delete(
+        synchronize_session=False
+    )
+
+
+def duplicate_roundtrips(session: Session) -> list[int]:
+    """
+    Ids of the roundtrips that duplicate an earlier roundtrip of the vehicle with the same start time
+    """
+    ranked = select(
+        RoundTrips.id,
+        func.row_number()
+        .over(
+            partition_by=(RoundTrips.car_id, RoundTrips.start_time),
+            order_by=RoundTrips.id,
+        )
+        .label("duplicate_number"),
+    ).subquery()
+    return session.scalars(
+        select(ranked.c.id).where(ranked.c.duplicate_number > 1).order_by(ranked.c.id)
+    ).all()
+
+
+def remove_duplicate_roundtrips(session_maker: sessionmaker, size: int = None) -> int:
+    """
+    Removes the duplicated roundtrips in batches, returns the number of removed roundtrips
+    """
+    size = size or batch_size
+    with session_maker() as session:
+        duplicates = duplicate_roundtrips(session)
+        if duplicates:
+            print(f"Removing {len(duplicates)} duplicates", flush=True)
+        for start in range(0, len(duplicates), size):
+            delete_roundtrips(session, duplicates[start : start + size])
+            session.commit()
+            print(
+                f"Removed {min(start + size, len(duplicates))} of {len(duplicates)} duplicates",
+                flush=True,
+            )
+    return len(duplicates)
+
+
+def retention_cutoff(session: Session) -> datetime | None:
+    """
+    The start time before which roundtrips are purged according to the keep_data setting in months, None if the
+    setting is not set
+    """
+    keep_data = (
+        session.query(SimulationSettings)
+        .filter(SimulationSettings.name == "keep_data")
+        .first()
+    )
+    if keep_data is None:
+        return None
+    delete_time = (
+        datetime.now() - relativedelta(months=int(keep_data.value)) - timedelta(days=1)
+    )
+    assert delete_time < datetime.now() - relativedelta(
+        months=6
+    ), "Not allowing to delete less than 6 months old data"
+    return delete_time
+
+
+def purge_roundtrips(session_maker: sessionmaker, before: datetime, size: int = None) -> int:
+    """
+    Purges the roundtrips starting before the given time and their segments in batches, every batch is committed.
+    Returns the number of purged roundtrips
+    """
+    size = size or batch_size
+    purged = 0
+    with session_maker() as session:
+        total = session.scalar(
+            select(func.count(RoundTrips.id)).where(RoundTrips.start_time < before)
+        )
+        print(f"Purging {total} roundtrips starting before {before}", flush=True)
+        while True:
+            roundtrip_ids = session.scalars(
+                select(RoundTrips.id)
+                .where(RoundTrips.start_time < before)
+                .order_by(RoundTrips.id)
+                .limit(size)
+            ).all()
+            if not roundtrip_ids:
+                break
+            delete_roundtrips(session, roundtrip_ids)
+            session.commit()
+            purged += len(roundtrip_ids)
+            print(f"Purged {purged} of {total} roundtrips", flush=True)
+    return purged
+
+
+def clean_roundtrips(session_maker: sessionmaker, size: int = None) -> None:
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the retention, then starts a new data generation
+    """
+    remove_duplicate_roundtrips(session_maker, size)
+    with session_maker() as session:
+        delete_time = retention_cutoff(session)
+    if delete_time is not None:
+        purge_roundtrips(session_maker, delete_time, size)
+    with session_maker() as session:
+        bump_data_generation(session)
+        session.commit()
@@ -3,14 +3,12 @@ import logging
 import os
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
-from dateutil.relativedelta import relativedelta
 from time import sleep
 from urllib.parse import parse_qs, urlparse
 
 import click
 import pandas as pd
 import regex as re
-import requests
 from sqlalchemy import and_, create_engine, func, or_
 from sqlalchemy.orm import Query, Session, sessionmaker
 
@@ -22,14 +20,14 @@ from fleetmanager.data_access import (
     LeasingTypes,
     RoundTrips,
     VehicleTypes,
-    SimulationSettings,
-    RoundTripSegments,
 )
+from fleetmanager.extractors import maintenance
 from fleetmanager.extractors.skyhost.updatedb import (
     sanitise_for_overlaps,
     summer_times,
     winter_times,
 )
+from fleetmanager.extractors.http import run_request as http_request
 from fleetmanager.extractors.util import get_latlon_address, get_allowed_starts_with_additions
 from fleetmanager.model.roundtripaggregator import aggregating_score as score
 from fleetmanager.model.roundtripaggregator import (
@@ -445,62 +443,10 @@ def set_roundtrips(ctx):
 @cli.command()
 @click.pass_context
 def clean_roundtrips(ctx):
-    engine = ctx.obj["engine"]
-    sess = ctx.obj["Session"]()
-
-    rt = pd.read_sql(
-        Query([RoundTrips.id, RoundTrips.start_time, RoundTrips.car_id]).statement,
-        engine,
-    )
-    keep = rt.drop_duplicates(["start_time", "car_id"]).id.values
-    remove = [int(a) for a in rt[~rt.id.isin(keep)].id.values]
-    if len(remove) != 0:
-        assert len(rt) > len(remove), "Did not clean"
-        print(f"Removing {len(remove)} duplicates", flush=True)
-        with Session() as sess:
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_(remove)
-            ).delete(synchronize_session=False)
-            sess.query(RoundTrips).filter(RoundTrips.id.in_(remove)).delete(
-                synchronize_session=False
-            )
-            sess.commit()
-
-    keep_data = (
-        sess.query(SimulationSettings)
-        .filter(SimulationSettings.name == "keep_data")
-        .first()
-    )
-    if keep_data:
-        delete_time = (
-            datetime.now()
-            - relativedelta(months=int(keep_data.value))
-            - timedelta(days=1)
-        )
-        assert delete_time < datetime.now() - relativedelta(
-            months=6
-        ), "Not allowing to delete less than 6 months old data"
-        rtr = (
-            sess.query(RoundTrips.id).filter(RoundTrips.start_time < delete_time).all()
-        )
-        rtrs = (
-            sess.query(RoundTripSegments.id)
-            .filter(RoundTripSegments.round_trip_id.in_([r.id for r in rtr]))
-            .all()
-        )
-        print(
-            f"********************* would like to delete, {len(rtrs)} roundtripsegments and {len(rtr)} roundtrips",
-            flush=True,
-        )
-
-        sess.query(RoundTripSegments).filter(
-            RoundTripSegments.round_trip_id.in_([r.id for r in rtr])
-        ).delete(synchronize_session="fetch")
-
-        sess.query(RoundTrips).filter(RoundTrips.start_time < delete_time).delete(
-            synchronize_session="fetch"
-        )
-        sess.commit()
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
 
 
 def get_logs(car_id: int, last_date: datetime, url: str, headers: dict):
@@ -606,15 +552,9 @@ def calc_km_aar(vehicle):
 
 def run_request(uri, params, headers):
     """
-    Wrapper to retry request if it fails
+    Wrapper to rate limit and retry request if it fails
     """
-    while True:
-        response = requests.get(uri, params=params, headers=headers)
-        if response.status_code != 429:
-            break
-        print("Too many requests retrying...")
-        sleep(3)  # Handle too many requests
-    return response
+    return http_request(uri, params=params, headers=headers, provider="mileagebook")
 
 
 def location_precision_test(
@@ -20,10 +20,9 @@ from fleetmanager.data_access import (
     FuelTypes,
     LeasingTypes,
     RoundTrips,
-    RoundTripSegments,
-    SimulationSettings,
     VehicleTypes,
 )
+from fleetmanager.extractors import maintenance
 from fleetmanager.extractors.puma.pumaschema import Data, Materiels
 from fleetmanager.extractors.skyhost.updatedb import (
     fix_time,
@@ -425,65 +424,10 @@ def set_starts(ctx):
 @cli.command()
 @click.pass_context
 def clean_roundtrips(ctx):
-    engine = ctx.obj["engine"]
-    Session = ctx.obj["Session"]
-
-    rt = pd.read_sql(
-        Query([RoundTrips.id, RoundTrips.start_time, RoundTrips.car_id]).statement,
-        engine,
-    )
-    keep = rt.drop_duplicates(["start_time", "car_id"]).id.values
-    remove = [int(a) for a in rt[~rt.id.isin(keep)].id.values]
-    if len(remove) != 0:
-        assert len(rt) > len(remove), "Did not clean"
-        print(f"Removing {len(remove)} duplicates", flush=True)
-        with Session() as sess:
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_(remove)
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.id.in_(remove)).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
-
-    with Session() as sess:
-        keep_data = (
-            sess.query(SimulationSettings)
-            .filter(SimulationSettings.name == "keep_data")
-            .first()
-        )
-        if keep_data:
-            delete_time = (
-                datetime.now()
-                - relativedelta(months=int(keep_data.value))
-                - timedelta(days=1)
-            )
-            assert delete_time < datetime.now() - relativedelta(
-                months=6
-            ), "Not allowing to delete less than 6 months old data"
-            rtr = (
-                sess.query(RoundTrips.id)
-                .filter(RoundTrips.start_time < delete_time)
-                .all()
-            )
-            rtrs = (
-                sess.query(RoundTripSegments.id)
-                .filter(RoundTripSegments.round_trip_id.in_([r.id for r in rtr]))
-                .all()
-            )
-            print(
-                f"********************* would like to delete, {len(rtrs)} roundtripsegments and {len(rtr)} roundtrips",
-                flush=True,
-            )
-
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_([r.id for r in rtr])
-            ).delete(synchronize_session="fetch")
-
-            sess.query(RoundTrips).filter(RoundTrips.start_time < delete_time).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
 
 
 def date_iter(start_date, end_date, week_period=24):
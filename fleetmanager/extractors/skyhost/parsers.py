@@ -1,26 +1,61 @@
+from io import BytesIO
+
 import lxml.etree as ET
 import pandas as pd
 
+model_namespace = "{http://schemas.datacontract.org/2004/07/PublicSoapApi.DTO.Model}"
+
 
 class GenericParser:
+    """
+    Streaming parser of the SOAP responses. The elements matching self.tag are flattened to records, nested
+    elements are prefixed with the name of their parent, e.g. StartPos_Timestamp. Elements are cleared as soon as
+    they are parsed, so the whole document tree is never held in memory.
+    """
+
+    tag = None
+
     def __init__(self):
         self.block = []
         self.frame = None
 
-    def parse(self, xml_chunk):
-        for element in ET.fromstring(xml_chunk).findall(self.find):
+    def iter_records(self, source):
+        """
+        Yields the records of the response one by one
+
+        Parameters
+        ----------
+        source  :   the xml response as str, bytes or a binary file like object
+
+        Returns
+        -------
+        generator of dicts with the text of the elements
+        """
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        name_of_tag = self.tag.split("}")[-1]
+        for _, element in ET.iterparse(source, events=("end",), tag=self.tag):
             element_dict = {}
             for child in element.iter():
                 if child.tag and child.text:
                     parent_name = child.getparent().tag.split("}")[-1]
                     attrib_name = child.tag.split("}")[-1]
-                    if parent_name == self.find.split("}")[-1]:
+                    if parent_name == name_of_tag:
                         name = attrib_name
                     else:
                         name = f"{parent_name}_{attrib_name}"
                     element_dict[name] = child.text
+            # free the parsed element and the already parsed siblings
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
             if element_dict:
-                self.block.append(element_dict)
+                yield element_dict
+
+    def parse(self, xml_chunk):
+        self.block.extend(self.iter_records(xml_chunk))
         self.frame = pd.DataFrame(self.block)
 
     def __str__(self):
@@ -28,18 +63,12 @@ class GenericParser:
 
 
 class Trackers(GenericParser):
-    def __init__(self):
-        self.find = ".//{http://schemas.datacontract.org/2004/07/PublicSoapApi.DTO.Model}DTTracker"
-        super().__init__()
+    tag = f"{model_namespace}DTTracker"
 
 
 class DrivingBook(GenericParser):
-    def __init__(self):
-        self.find = ".//{http://schemas.datacontract.org/2004/07/PublicSoapApi.DTO.Model}DTMileageLog"
-        super().__init__()
+    tag = f"{model_namespace}DTMileageLog"
 
 
 class MileageLogPositions(GenericParser):
-    def __init__(self):
-        self.find = ".//{http://schemas.datacontract.org/2004/07/PublicSoapApi.DTO.Model}DTGpsPosition"
-        super().__init__()
+    tag = f"{model_namespace}DTGpsPosition"
@@ -1,28 +1,72 @@
+from functools import lru_cache
 from importlib.resources import files
-import time
+from string import Template
 from uuid import uuid4
+from xml.sax.saxutils import escape
 
-import lxml.etree as et
-import requests
 import xmltodict
 
+from fleetmanager.extractors.http import request
+
+# the entries of the templates that are filled out per request, the placeholders are substituted by render_template
+template_fields = {
+    "createSequence.xml": {
+        ("s:Header", "a:MessageID"): "$message_id",
+        ("s:Body", "CreateSequence", "Offer", "Identifier"): "$sequence_offer",
+    },
+    "loginWithApiKey.xml": {
+        ("s:Header", "r:Sequence", "r:Identifier"): "$sequence_id",
+        ("s:Header", "a:MessageID"): "$message_id",
+        ("s:Body", "LoginWithApiKey", "apiKey"): "$api_key",
+    },
+    "getAllUsers.xml": {
+        ("s:Header", "r:SequenceAcknowledgement", "r:Identifier"): "$sequence_offer",
+        ("s:Header", "r:Sequence", "r:Identifier"): "$sequence_id",
+        ("s:Header", "r:Sequence", "r:MessageNumber"): "$message_no",
+        ("s:Header", "a:MessageID"): "$message_id",
+        ("s:Header", "a:Action", "#text"): "http://tempuri.org/IBasic/$func",
+        ("s:Body",): "$body",
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def compile_template(name: str) -> Template:
+    """
+    Reads and compiles the xml template once, such that a request is rendered by a string substitution
+    """
+    template = xmltodict.parse(
+        files("fleetmanager").joinpath("extractors/skyhost/xml_templates", name).read_text()
+    )
+    for path, placeholder in template_fields[name].items():
+        entry = template["s:Envelope"]
+        for key in path[:-1]:
+            entry = entry[key]
+        entry[path[-1]] = placeholder
+    return Template(xmltodict.unparse(template))
+
+
+def render_template(name: str, body: str = "", **values) -> str:
+    """
+    Renders the request from the compiled template, the values are escaped while the body is inserted as is
+    """
+    return compile_template(name).substitute(
+        body=body, **{key: escape(str(value)) for key, value in values.items()}
+    )
+
 
 class SoapAgent:
     """
     Class to handle the API request to the SOAP service run by SkyHost
 
     Needs the api_jwt in the init, otherwise it handles the scoring system implemented in the service.
-    Each request has a score "self.functions". We're allowed to maximum use 1000 / minute, however the score for a specific call is not released once
-    a minute has passed. Hence the self.total_used variable to account the usage such that we are not timed out. If 1000 is reached
-    we have to sleep for 300 secs.
+    Each request has a score "self.functions". We're allowed to maximum use 100 / second and 1000 / minute, which is
+    enforced by the token buckets of the rate limiter. However the score for a specific call is not released once
+    a minute has passed. Hence the self.total_used variable to account the usage of the sequence, such that a new
+    sequence is created before 1000 is reached and we are not timed out.
     """
 
-    def __init__(self, api_key=""):
-        self.time = time.time()
-        self.point_pr_sec = []
-        self.score_sec = 0
-        self.point_pr_minut = []
-        self.score_minut = 0
+    def __init__(self, api_key="", base_service="https://www.skyhost.dk/soap/basic.svc"):
         self.minut_cap = 1000
         self.second_cap = 100
         self.total_used = 0
@@ -30,12 +74,12 @@ class SoapAgent:
         self.message_id = None
         self.sequence_offer = None
         self.base_service_wsdl = "https://www.skyhost.dk/soap/basic.svc?WSDL"
-        self.base_service = "https://www.skyhost.dk/soap/basic.svc"
-        self.base_xml_template_path = files("fleetmanager").joinpath("extractors/skyhost/xml_templates")
+        self.base_service = base_service
         self.header = {"content-type": "application/soap+xml; charset=utf-8"}
         self.sequence_id = None
         self.last_response = None
         self.message_no = None
+        self.provider = "skyhost_soap"
         # limits 100 point / sekund, 1000 point / minut
         self.functions = {
             "Trackers_GetDrivers": 20,  # {'TrackerID': x}
@@ -71,22 +115,13 @@ class SoapAgent:
         -------
         None
         """
-        self.add_call("create_sequence")  # punish sequence creation
-        self.sequence_template = et.parse("{}/{}".format(self.base_xml_template_path, "createSequence.xml"))
-        self.sequence_template = xmltodict.parse(
-            self.xml_to_string(self.sequence_template)
-        )
-        self.sequence_template["s:Envelope"]["s:Header"][
-            "a:MessageID"
-        ] = self.message_id
-        self.sequence_template["s:Envelope"]["s:Body"]["CreateSequence"]["Offer"][
-            "Identifier"
-        ] = self.sequence_offer
-
-        body = xmltodict.unparse(self.sequence_template)
-        self.last_response = requests.post(
-            self.base_service, data=body, headers=self.header
+        points = self.add_call("create_sequence")  # punish sequence creation
+        body = render_template(
+            "createSequence.xml",
+            message_id=self.message_id,
+            sequence_offer=self.sequence_offer,
         )
+        self.last_response = self.post(body, points)
         self.last_response.raise_for_status()
         response = xmltodict.parse(self.last_response.text)
         self.sequence_id = response["s:Envelope"]["s:Body"]["CreateSequenceResponse"][
@@ -102,20 +137,14 @@ class SoapAgent:
         None
         """
         self.message_no = 1
-        self.add_call("login")  # punish login
-        self.login_template = et.parse("{}/{}".format(self.base_xml_template_path, "loginWithApiKey.xml"))
-        self.login_template = xmltodict.parse(self.xml_to_string(self.login_template))
-        self.login_template["s:Envelope"]["s:Header"]["r:Sequence"][
-            "r:Identifier"
-        ] = self.sequence_id
-        self.login_template["s:Envelope"]["s:Header"]["a:MessageID"] = self.message_id
-        self.login_template["s:Envelope"]["s:Body"]["LoginWithApiKey"][
-            "apiKey"
-        ] = self.api_key
-        body = xmltodict.unparse(self.login_template)
-        self.last_response = requests.post(
-            self.base_service, data=body, headers=self.header
+        points = self.add_call("login")  # punish login
+        body = render_template(
+            "loginWithApiKey.xml",
+            sequence_id=self.sequence_id,
+            message_id=self.message_id,
+            api_key=self.api_key,
         )
+        self.last_response = self.post(body, points)
         self.last_response.raise_for_status()
         self.message_no += 1
 
@@ -134,100 +163,62 @@ class SoapAgent:
         """
         if self.last_response is None or self.last_response.status_code != 200:
             self._connect()
-        self.action_template = et.parse("{}/{}".format(self.base_xml_template_path, "getAllUsers.xml"))
-        self.action_template = xmltodict.parse(self.xml_to_string(self.action_template))
-        self.action_template["s:Envelope"]["s:Header"]["r:SequenceAcknowledgement"][
-            "r:Identifier"
-        ] = self.sequence_offer
-        self.action_template["s:Envelope"]["s:Header"]["r:Sequence"][
-            "r:Identifier"
-        ] = self.sequence_id
-        self.action_template["s:Envelope"]["s:Header"]["r:Sequence"][
-            "r:MessageNumber"
-        ] = str(self.message_no)
-        self.action_template["s:Envelope"]["s:Header"]["a:MessageID"] = self.message_id
-        self.action_template["s:Envelope"]["s:Header"]["a:Action"]["#text"] = (
-            "http://tempuri.org/IBasic/" + func
-        )
-        self.action_template["s:Envelope"]["s:Body"][func] = self.action_template[
-            "s:Envelope"
-        ]["s:Body"].pop("Account_GetAllUsers")
-        if params:
-            for param_name, value in params.items():
-                self.action_template["s:Envelope"]["s:Body"][func][param_name] = value
-
-        self.add_call(func)
-        request_body = xmltodict.unparse(self.action_template)
-        self.last_response = requests.post(
-            self.base_service, data=request_body, headers=self.header
+        points = self.add_call(func)
+        action = {func: {"@xmlns": "http://tempuri.org/", **(params or {})}}
+        request_body = render_template(
+            "getAllUsers.xml",
+            body=xmltodict.unparse(action, full_document=False),
+            sequence_offer=self.sequence_offer,
+            sequence_id=self.sequence_id,
+            message_no=self.message_no,
+            message_id=self.message_id,
+            func=func,
         )
+        self.last_response = self.post(request_body, points)
         self.message_no += 1
         return self.last_response
 
-    def xml_to_string(self, req):
-        return et.tostring(req, encoding="unicode")
-
-    def add_call(self, func):
+    def post(self, body, points):
         """
-        Method to add call to the record such that we can track the progress
-        If the service was to release points when 60 sec has passed since call we'd do a while loop here, but since
-        that's not the case we simply wait 300 secs to ensure that we're not logged out during run.
-        We initiate a new connection when 1000 total_used has been reached.
+        Posts the request to the service through the shared http layer, which reserves the points of the call from
+        the rate limiter of the api key and retries on rate limiting and server errors
         Parameters
         ----------
-        func    :   function called to attribute the associated score
+        body    :   the rendered xml request
+        points  :   the score of the call
 
         Returns
         -------
-        None    :   when call is allowed
+        the response of the service
         """
-        self.prune_calls()
-        if func in self.functions:
-            self.point_pr_minut.append([self.functions[func], time.time()])
-            self.point_pr_sec.append([self.functions[func], time.time()])
-            self.total_used += self.functions[func]
-        else:
-            self.point_pr_minut.append([100, time.time()])
-            self.point_pr_sec.append([100, time.time()])
-            self.total_used += 100
-        ready_min, ready_sec = self.prune_calls()
-        if ready_min is False:
-            print("Sleeping 60 sec")
-            time.sleep(60)
-            # if self.total_used >= self.minut_cap:
-            #     print('Sleeping 240 sec')
-            #     time.sleep(240)
-            self._connect()  # the API doesn't release points as they proclaim
-            # no more than 10 calls including create and login is feasible
-            ready_min, ready_sec = self.prune_calls()
-        if ready_sec is False:
-            time.sleep(1)
+        return request(
+            "POST",
+            self.base_service,
+            provider=self.provider,
+            cost=points,
+            key=self.api_key,
+            content=body,
+            headers=self.header,
+        )
 
-    def prune_calls(self):
+    def add_call(self, func):
         """
-        Method for cleaning the list of calls in the record. Useful when the service will actually release points
-        dynamically.
+        Method to add call to the record such that we can track the progress
+        The points of the call are reserved from the rate limiter when the call is posted. Since the service does not
+        release points as they proclaim, we initiate a new connection before the sequence has used 1000 points.
+        Parameters
+        ----------
+        func    :   function called to attribute the associated score
 
         Returns
         -------
-        call_ready (bool) or (score_minut okay (bool), score_sec okay (bool))
+        the points of the call
         """
-        self.point_pr_minut = [
-            [items[0], items[1]]
-            for items in self.point_pr_minut
-            if time.time() - items[1] < 60
-        ]
-        self.point_pr_sec = [
-            [items[0], items[1]]
-            for items in self.point_pr_sec
-            if time.time() - items[1] < 1
-        ]
-        self.score_minut = sum([items[0] for items in self.point_pr_minut])
-        self.score_sec = sum([items[0] for items in self.point_pr_sec])
-        call_ready = all(
-            [self.score_minut < self.minut_cap, self.score_sec < self.second_cap]
-        )
-        return (
-            self.score_minut < self.minut_cap,
-            self.score_sec < self.second_cap,
-        )  # call_ready
+        points = self.functions.get(func, 100)
+        if (
+            func not in ("create_sequence", "login")
+            and self.total_used + points > self.minut_cap
+        ):
+            self._connect()  # the API doesn't release points as they proclaim
+        self.total_used += points
+        return points
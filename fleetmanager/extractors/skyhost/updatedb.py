@@ -3,7 +3,7 @@ import json
 import logging
 import os
 import re
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from time import sleep
 from typing import TypedDict
 
@@ -12,7 +12,6 @@ import click
 import numpy as np
 import pandas as pd
 import pytz
-from dateutil.relativedelta import relativedelta
 from sqlalchemy import create_engine, func, or_, text, and_
 from sqlalchemy.orm import Session, sessionmaker, selectinload
 from sqlalchemy.orm.query import Query
@@ -23,10 +22,9 @@ from fleetmanager.data_access import (
     AllowedStarts,
     Cars,
     RoundTrips,
-    SimulationSettings,
     Trips
 )
-from fleetmanager.data_access.dbschema import RoundTripSegments
+from fleetmanager.extractors import maintenance
 from fleetmanager.extractors.fleetcomplete.updatedb import is_car_valid
 from fleetmanager.extractors.gamfleet.util import get_splate_info_from_api
 from fleetmanager.extractors.util import get_allowed_starts_with_additions
@@ -90,66 +88,10 @@ def cli(
 @cli.command()
 @click.pass_context
 def clean_roundtrips(ctx):
-    engine = ctx.obj["engine"]
-    Session = ctx.obj["Session"]
-
-    rt = pd.read_sql(
-        Query([RoundTrips.id, RoundTrips.start_time, RoundTrips.car_id]).statement,
-        engine,
-    )
-    keep = rt.drop_duplicates(["start_time", "car_id"]).id.values
-    remove = [int(a) for a in rt[~rt.id.isin(keep)].id.values]
-    if len(remove) != 0:
-        assert len(rt) > len(remove), "Did not clean"
-        print(f"Removing {len(remove)} duplicates", flush=True)
-        with Session() as sess:
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_(remove)
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.id.in_(remove)).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
-
-    with Session() as sess:
-        keep_data = (
-            sess.query(SimulationSettings)
-            .filter(SimulationSettings.name == "keep_data")
-            .first()
-        )
-        if keep_data:
-            delete_time = (
-                datetime.now()
-                - relativedelta(months=int(keep_data.value))
-                - timedelta(days=1)
-            )
-            assert delete_time < datetime.now() - relativedelta(
-                months=6
-            ), "Not allowing to delete less than 6 months old data"
-            print(delete_time)
-
-            rtr = (
-                sess.query(RoundTrips.id)
-                .filter(RoundTrips.start_time < delete_time)
-                .all()
-            )
-            rtrs = (
-                sess.query(RoundTripSegments.id)
-                .filter(RoundTripSegments.round_trip_id.in_([r.id for r in rtr]))
-                .all()
-            )
-            print(
-                f"********************* would like to delete {len(rtrs)} roundtripsegments and {len(rtr)} roundtrips",
-                flush=True,
-            )
-
-            sess.query(RoundTripSegments).filter(
-                RoundTripSegments.round_trip_id.in_([r.id for r in rtr])
-            ).delete(synchronize_session="fetch")
-            sess.query(RoundTrips).filter(RoundTrips.start_time < delete_time).delete(
-                synchronize_session="fetch"
-            )
-            sess.commit()
+    """
+    Removes the duplicated roundtrips and purges the roundtrips past the keep_data retention
+    """
+    maintenance.clean_roundtrips(ctx.obj["Session"])
 
 
 @cli.command()
@@ -316,7 +258,7 @@ def set_roundtrips(ctx):
         while (r := agent.execute_action("Trackers_GetAllTrackers")).status_code != 200:
             print("Retrying Trackers_GetAllTrackers")
         trackers = Trackers()
-        trackers.parse(r.text)
+        trackers.parse(r.content)
         if len(trackers.block) == 0:
             continue
         carid2key.update({str(a): key for a in trackers.frame.ID.values})
@@ -535,7 +477,7 @@ def set_trackers(ctx, description_fields=None):
         default_cars = pd.read_sql(Query(Cars).statement, ctx.obj["engine"])
         while (r := agent.execute_action("Trackers_GetAllTrackers")).status_code != 200:
             print("Retrying Trackers_GetAllTrackers")
-        trackers.parse(r.text)
+        trackers.parse(r.content)
         with Session() as sess:
             banned_cars = (
                 sess.query(Cars.id)
@@ -692,7 +634,7 @@ def set_trips(ctx):
         while (r := agent.execute_action("Trackers_GetAllTrackers")).status_code != 200:
             print("Retrying Trackers_GetAllTrackers")
         trackers = Trackers()
-        trackers.parse(r.text)
+        trackers.parse(r.content)
         start_time = {}
         start_pos = {}
         current_time = datetime.now()
@@ -850,7 +792,7 @@ def location_precision_test(
         while (r := agent.execute_action("Trackers_GetAllTrackers")).status_code != 200:
             print("Retrying Trackers_GetAllTrackers")
         trackers = Trackers()
-        trackers.parse(r.text)
+        trackers.parse(r.content)
         if len(trackers.block) == 0 or len(trackers.frame[trackers.frame.ID.isin(carids)]) == 0:
             continue
         carid2key.update({str(a): key for a in trackers.frame[trackers.frame.ID.isin(carids)].ID.values})
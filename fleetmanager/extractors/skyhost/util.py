@@ -1,12 +1,13 @@
-import requests
 import numpy as np
 from sqlalchemy.orm import Query, Session
+from fleetmanager.extractors.http import fetch_all, fetch_pages
+from fleetmanager.extractors.http import run_request as http_request
 from fleetmanager.extractors.skyhost.parsers import DrivingBook, MileageLogPositions
 import ast
 import pandas as pd
 from sqlalchemy import func
 from datetime import datetime, timezone, timedelta, date
-from time import sleep
+from functools import partial
 from typing import Literal, TypedDict
 import pytz
 from fleetmanager.data_access import LeasingTypes, FuelTypes, VehicleTypes, AllowedStarts, Cars
@@ -103,16 +104,27 @@ department_object = TypedDict(
 
 
 def get_trips_v2(from_date: datetime, to_date: datetime, url: str, headers: dict, car_id: int):
-    original_url = url
     trips = []
     tId = 0
-    for start_date, end_date in date_iter(from_date, to_date, week_period=52):
-        params = {
-            "from": start_date.isoformat(),
-            "to": end_date.isoformat()
-        }
-        while True:
-            response = run_request(uri=url, headers=headers, params=params)
+    # the periods are independent and pulled concurrently, while the pages of a period follow the nextPageLink
+    period_pages = fetch_all(
+        [
+            partial(
+                fetch_pages,
+                uri=url,
+                provider="skyhost",
+                next_page=next_page_link,
+                headers=headers,
+                params={
+                    "from": start_date.isoformat(),
+                    "to": end_date.isoformat()
+                },
+            )
+            for start_date, end_date in date_iter(from_date, to_date, week_period=52)
+        ]
+    )
+    for pages in period_pages:
+        for response in pages:
             if response.status_code != 200:
                 raise MileageTripResponseError(f"Did not receive successful response from Skyhost API: {response.status_code}")
 
@@ -131,15 +143,19 @@ def get_trips_v2(from_date: datetime, to_date: datetime, url: str, headers: dict
                     )
                 )
                 tId += 1
-            if next_url := response.json().get("nextPageLink"):
-                url = next_url
-            else:
-                url = original_url
-                break
     print("len trips from gettripsv2", len(trips))
     return trips
 
 
+def next_page_link(response):
+    """
+    Pagination of the Skyhost api, the next page is requested with the same period params
+    """
+    if next_url := response.json().get("nextPageLink"):
+        return {"uri": next_url}
+    return None
+
+
 def fix_time(trip_time):
     if trip_time.tzinfo == timezone.utc:
         return trip_time.astimezone(cph)
@@ -206,7 +222,7 @@ def get_coords(trip_id, agent):
             "Retrying Trackers_GetMilagePositions with MilageLogId: {}".format(trip_id),
         )
     log_pos = MileageLogPositions()
-    log_pos.parse(r.text)
+    log_pos.parse(r.content)
     return log_pos.frame.sort_values(by="Timestamp", ascending=True)
 
 
@@ -230,7 +246,7 @@ def driving_book(tracker_id, start_time, end_time, agent):
             )
         )
     book = DrivingBook()
-    book.parse(r.text)
+    book.parse(r.content)
     print(
         "Found {} trips for tracker with id {}".format(book.frame.shape[0], tracker_id)
     )
@@ -478,12 +494,6 @@ def get_location_id(department: department_object | None, session: Session):
 
 def run_request(uri, params, headers):
     """
-    Wrapper to retry request if it fails
+    Wrapper to rate limit and retry request if it fails
     """
-    while True:
-        response = requests.get(uri, params=params, headers=headers)
-        if response.status_code != 429:
-            break
-        print("Too many requests retrying...")
-        sleep(3)  # Handle too many requests
-    return response
+    return http_request(uri, params=params, headers=headers, provider="skyhost")
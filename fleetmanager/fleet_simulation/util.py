@@ -1,12 +1,17 @@
-import io
+import hashlib
+import json
 import os
-import pickle
+import threading
+import time
+from collections import OrderedDict
 from datetime import date, datetime
 from typing import List, TypedDict, Dict
 
 import numpy as np
 import pandas as pd
 import redis
+from celery import states
+from celery.result import AsyncResult
 from sqlalchemy import select, or_
 from sqlalchemy.orm import Session
 
@@ -14,8 +19,15 @@ from fleetmanager.api.fleet_simulation.schemas import (
     FleetSimulationHistory,
     FleetSimulationOptions,
 )
+from fleetmanager.data_access import data_watermark
 from fleetmanager.data_access.dbschema import AllowedStarts
+from fleetmanager.data_access.serialization import stored_task_results
+from fleetmanager.export import constant_memory_workbook, spooled_file, write_frame
 from fleetmanager.model.model import Model
+from fleetmanager.model.timing import stage
+
+# number of fleet simulation requests whose task is reused for identical requests
+simulation_cache_size = int(os.getenv("FLEET_SIMULATION_CACHE_SIZE", 128))
 
 single_trip = TypedDict(
     "single_trip",
@@ -162,14 +174,22 @@ def fleet_simulator(settings: FleetSimulationOptions):
         3,
     )
 
-    db = prepare_trip_store(m.trips.trips)
+    with stage("result packing") as span:
+        db = prepare_trip_store(
+            m.trips.trips,
+            {
+                fleet_name: m.trips.vehicle_table(fleet_name)
+                for fleet_name in ["current", "simulation"]
+            },
+        )
+        span.rows = len(db)
 
-    unallocated_pr_day = get_unallocated(db)
+        unallocated_pr_day = get_unallocated(db)
 
-    current_ad = allocation_distribution(m.current_hist)
-    simulation_ad = allocation_distribution(m.simulation_hist)
+        current_ad = allocation_distribution(m.current_hist)
+        simulation_ad = allocation_distribution(m.simulation_hist)
 
-    detailed_vehicle_usage = vehicle_usage(m.consequence_calculator.store)
+        detailed_vehicle_usage = vehicle_usage(m.consequence_calculator.store)
 
     return {
         "number_of_trips": len(m.trips.all_trips),
@@ -187,41 +207,120 @@ def fleet_simulator(settings: FleetSimulationOptions):
     }
 
 
-def prepare_trip_store(trips: pd.DataFrame):
+def simulation_cache_key(session: Session, settings: FleetSimulationOptions) -> str:
+    """
+    Content hash of the simulation request and the watermark of its data. The vehicles and locations are sorted,
+    so requests that only differ in their order have the same key.
+    """
+    options = settings.dict()
+    options["current_vehicles"] = sorted(options["current_vehicles"])
+    options["simulation_vehicles"] = sorted(
+        options["simulation_vehicles"] or [],
+        key=lambda vehicle: (vehicle["id"], vehicle["simulation_count"] or 0),
+    )
+    if options["location_ids"] is not None:
+        options["location_ids"] = sorted(options["location_ids"])
+    content = json.dumps(
+        {"options": options, "data": data_watermark(session)},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class SimulationCache:
+    """
+    Least recently used cache of the task ids of the fleet simulations by the key of the request, see
+    simulation_cache_key. Committed roundtrips or changed vehicles give the request a new key, the entries of the
+    stale keys are evicted when the cache is full. Entries older than max_age, the expiry of the task results,
+    are not returned.
+    """
+
+    def __init__(self, size: int = simulation_cache_size, max_age: float | None = None):
+        self.size = size
+        self.max_age = max_age
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            task_id, added = entry
+            if self.max_age is not None and time.monotonic() - added > self.max_age:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return task_id
+
+    def put(self, key: str, task_id: str):
+        if self.size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (task_id, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+def cached_simulation(cache: SimulationCache, key: str) -> AsyncResult | None:
+    """
+    The task of the identical earlier simulation, if it can be reused. Failed and revoked tasks are evicted, as are
+    pending tasks without a record in the result backend. The simulations record their start, hence those were never
+    picked up or lost with their worker.
+    """
+    task_id = cache.get(key)
+    if task_id is None:
+        return None
+    result = AsyncResult(task_id)
+    meta = result.backend.get_task_meta(task_id)
+    lost = meta["status"] == states.PENDING and "task_id" not in meta
+    if lost or meta["status"] in (states.FAILURE, states.REVOKED):
+        cache.discard(key)
+        return None
+    return result
+
+
+def prepare_trip_store(trips: pd.DataFrame, vehicles: dict[str, pd.DataFrame]):
+    """
+    The driving book of the trips with the names, ids and type ids of the current and simulated vehicles
+
+    Parameters
+    ----------
+    trips   :   frame of trips with the current and simulation assignment columns
+    vehicles    :   the vehicle tables of the current and simulation assignment, see Trips.vehicle_table
+
+    Returns
+    -------
+    list of trip records
+    """
     save = trips[
         [
             "start_time",
             "end_time",
             "distance",
-            "current",
-            "simulation",
         ]
     ].copy()
-    save["current_vehicle_name"] = save.current.apply(
-        lambda x: f"{x.make} {x.model} {x.name.split('_')[-1]} {x.__dict__.get('plate', '')}"
-        if x.name != "Unassigned"
-        else "Ikke allokeret"
-    )
-    save["current_vehicle_id"] = save.current.apply(
-        lambda x: x.id if x.name != "Unassigned" else None
-    ).astype(str)
-
-    save["simulation_vehicle_name"] = save.simulation.apply(
-        lambda x: f"{x.make} {x.model} {x.name.split('_')[-1]} {x.__dict__.get('plate', '')}"
-        if x.name != "Unassigned"
-        else "Ikke allokeret"
-    )
-    save["simulation_vehicle_id"] = save.simulation.apply(
-        lambda x: x.id if x.name != "Unassigned" else None
-    ).astype(str)
-    save["simulation_type"] = save.simulation.apply(
-        lambda x: -1 if x.name == "Unassigned" else x.typeid
-    )
-    save["current_type"] = save.current.apply(
-        lambda x: -1 if x.name == "Unassigned" else x.typeid
-    )
-
-    save.drop(["current", "simulation"], axis=1, inplace=True)
+    for fleet_name in ["current", "simulation"]:
+        # the unassigned trips, -1, take the last row
+        table = pd.concat(
+            [
+                vehicles[fleet_name],
+                pd.DataFrame(
+                    [{"vehicle_name": "Ikke allokeret", "vehicle_id": "None", "typeid": -1}]
+                ),
+            ],
+            ignore_index=True,
+        )
+        assignment = trips[fleet_name].to_numpy()
+        save[f"{fleet_name}_vehicle_name"] = table.vehicle_name.to_numpy()[assignment]
+        save[f"{fleet_name}_vehicle_id"] = table.vehicle_id.to_numpy()[assignment]
+        save[f"{fleet_name}_type"] = table.typeid.to_numpy()[assignment]
 
     trip_store = save.to_dict("records")
     return trip_store
@@ -368,11 +467,10 @@ def prepare_settings(settings, shifts=None, bike_settings=None):
     return data
 
 
-def simulation_results_to_excel(results, session: Session = None):
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine="xlsxwriter")
-
-    #################### køreplan sheet #########################
+def simulation_driving_book(results) -> pd.DataFrame:
+    """
+    The driving book of the simulation results with danish column names as used in the exports
+    """
     dbook = pd.DataFrame(results["driving_book"])[
         [
             "start_time",
@@ -393,22 +491,30 @@ def simulation_results_to_excel(results, session: Session = None):
         inplace=True,
         axis=1,
     )
-    dbook.to_excel(writer, sheet_name="Køreplan", index=False)
-    # autofitting columns
-    for col_idx, col in enumerate(dbook):
-        column_length = max(dbook[col].astype(str).map(len).max(), len(col))
-        writer.sheets["Køreplan"].set_column(col_idx, col_idx, column_length)
+    return dbook
+
+
+def simulation_results_to_excel(results, session: Session = None):
+    """
+    Writes the simulation results to an excel workbook. The workbook is written in constant_memory mode to a
+    spooled temporary file, so large driving books are not held in memory.
+    """
+    output = spooled_file()
+    workbook = constant_memory_workbook(output)
+    format_header = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+
+    #################### køreplan sheet #########################
+    dbook = simulation_driving_book(results)
+    write_frame(workbook.add_worksheet("Køreplan"), dbook, column_format=format_header)
 
     #################### Ikke allokeret ture sheet #########################
     unallocated_pr_day = pd.DataFrame(results["results"]["unallocated_pr_day"])
     unallocated_pr_day.rename({"date": "Dato"}, inplace=True)
-    unallocated_pr_day.to_excel(writer, sheet_name="Ikke allokeret ture", index=False)
-    # autofitting columns
-    for col_idx, col in enumerate(unallocated_pr_day):
-        column_length = max(
-            unallocated_pr_day[col].astype(str).map(len).max(), len(col)
-        )
-        writer.sheets["Ikke allokeret ture"].set_column(col_idx, col_idx, column_length)
+    write_frame(
+        workbook.add_worksheet("Ikke allokeret ture"),
+        unallocated_pr_day,
+        column_format=format_header,
+    )
 
     #################### allokering sheets #########################
     allocation_distribution_names = {
@@ -427,13 +533,11 @@ def simulation_results_to_excel(results, session: Session = None):
         for vehicle_type in results["results"][state]:
             rows.append([vehicle_type["name"]] + vehicle_type["y"])
         allocation_hist = pd.DataFrame(rows, columns=columns)
-        allocation_hist.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        for col_idx, col in enumerate(allocation_hist):
-            column_length = max(
-                allocation_hist[col].astype(str).map(len).max(), len(col)
-            )
-            writer.sheets[sheet_name].set_column(col_idx, col_idx, column_length)
+        write_frame(
+            workbook.add_worksheet(sheet_name),
+            allocation_hist,
+            column_format=format_header,
+        )
 
     #################### simuleringsindstillinger sheets #########################
     settings = prepare_settings(
@@ -444,12 +548,11 @@ def simulation_results_to_excel(results, session: Session = None):
             if results["simulation_options"].settings.shift_settings else None
         )
     )
-    settings.to_excel(writer, sheet_name="Simuleringsindstillinger", index=False)
-    for col_idx, col in enumerate(settings):
-        column_length = max(settings[col].astype(str).map(len).max(), len(col))
-        writer.sheets["Simuleringsindstillinger"].set_column(
-            col_idx, col_idx, column_length
-        )
+    write_frame(
+        workbook.add_worksheet("Simuleringsindstillinger"),
+        settings,
+        column_format=format_header,
+    )
 
     #################### køretøjsdetaljer sheets #########################
     vehicle_details_names = {
@@ -458,15 +561,20 @@ def simulation_results_to_excel(results, session: Session = None):
     }
     for state, sheet_name in vehicle_details_names.items():
         usage = pd.DataFrame(results["results"]["vehicle_usage"][state])
-        usage.to_excel(writer, sheet_name=sheet_name, index=False)
-
-        for col_idx, col in enumerate(usage):
-            column_length = max(usage[col].astype(str).map(len).max(), len(col))
-            writer.sheets[sheet_name].set_column(col_idx, col_idx, column_length)
+        write_frame(
+            workbook.add_worksheet(sheet_name), usage, column_format=format_header
+        )
 
-    writer.close()
+    workbook.close()
     output.seek(0)
 
+    return output, simulation_location(results, session)
+
+
+def simulation_location(results, session: Session = None):
+    """
+    The address of the first location the simulation was run on, used for naming the exports
+    """
     location = None
     if session:
         location = (
@@ -481,57 +589,52 @@ def simulation_results_to_excel(results, session: Session = None):
             )
             .first()
         )
-    location = None if location is None else location[0]
-    return output, location
+    return None if location is None else location[0]
 
 
 def load_fleet_simulation_history(
     session: Session, redis: redis.Redis
 ) -> list[FleetSimulationHistory]:
-    all_keys = redis.keys("*")
     previous_simulations: list[FleetSimulationHistory] = []
-    for key in all_keys:
-        task = redis.get(key)
-        if task is not None:
-            unpickled = pickle.loads(task)
-            if (
-                unpickled.get("status") == "SUCCESS"
-                and unpickled.get("name")
-                == "fleetmanager.tasks.celery.run_fleet_simulation"
-                and unpickled.get("queue") == os.getenv("CELERY_QUEUE")
-            ):
-                simulation_options = dict(unpickled.get("result").get("simulation_options"))
-                location_id = simulation_options.get("location_id")
-                location_ids = None if "location_ids" not in simulation_options else simulation_options.get("location_ids")
-                if location_ids:
-                    location_address = None
-                    location_addresses = " & ".join(
-                        map(lambda row: row.address, session.query(
-                            AllowedStarts).filter(
-                                AllowedStarts.id.in_(location_ids)
-                            ).all())
-                        )
-                else:
-                    location_addresses = None
-                    location_address = session.scalar(
-                        select(AllowedStarts.address).filter(
-                            AllowedStarts.id == location_id
-                        )
+    for unpickled in stored_task_results(redis):
+        if (
+            unpickled.get("status") == "SUCCESS"
+            and unpickled.get("name")
+            == "fleetmanager.tasks.celery.run_fleet_simulation"
+            and unpickled.get("queue") == os.getenv("CELERY_QUEUE")
+        ):
+            simulation_options = dict(unpickled.get("result").get("simulation_options"))
+            location_id = simulation_options.get("location_id")
+            location_ids = None if "location_ids" not in simulation_options else simulation_options.get("location_ids")
+            if location_ids:
+                location_address = None
+                location_addresses = " & ".join(
+                    map(lambda row: row.address, session.query(
+                        AllowedStarts).filter(
+                            AllowedStarts.id.in_(location_ids)
+                        ).all())
                     )
-                previous_simulations.append(
-                    FleetSimulationHistory(
-                        id=unpickled.get("task_id"),
-                        start_date=str(
-                            unpickled.get("result").get("simulation_options").start_date
-                        ),
-                        end_date=str(
-                            unpickled.get("result").get("simulation_options").end_date
-                        ),
-                        location=location_address
-                        if location_address
-                        else "Ingen lokation",
-                        locations=location_addresses,
-                        simulation_date=unpickled.get("date_done"),
+            else:
+                location_addresses = None
+                location_address = session.scalar(
+                    select(AllowedStarts.address).filter(
+                        AllowedStarts.id == location_id
                     )
                 )
+            previous_simulations.append(
+                FleetSimulationHistory(
+                    id=unpickled.get("task_id"),
+                    start_date=str(
+                        unpickled.get("result").get("simulation_options").start_date
+                    ),
+                    end_date=str(
+                        unpickled.get("result").get("simulation_options").end_date
+                    ),
+                    location=location_address
+                    if location_address
+                    else "Ingen lokation",
+                    locations=location_addresses,
+                    simulation_date=unpickled.get("date_done"),
+                )
+            )
     return previous_simulations
@@ -1,6 +1,6 @@
 import os
 from datetime import date, datetime
-import pickle
+from typing import TYPE_CHECKING
 
 import pandas as pd
 from sqlalchemy import select
@@ -12,13 +12,17 @@ from fleetmanager.api.goal_simulation.schemas import (
     GoalSimulationHistory,
 )
 from fleetmanager.data_access.dbschema import AllowedStarts
+from fleetmanager.data_access.serialization import stored_task_results
 from fleetmanager.fleet_simulation import prepare_trip_store, vehicle_usage
-from fleetmanager.model.genetic import AutomaticSimulation, prepared_settings_type, shift_type, bike_settings_type
-from fleetmanager.model.tabu import TabuSearch
+from fleetmanager.model.engines import get_engine
+from fleetmanager.model.timing import current_timings, stage
 from fleetmanager.model.vehicle_optimisation import FleetOptimisation
 from sqlalchemy.orm import Session
 import redis
 
+if TYPE_CHECKING:
+    from fleetmanager.model.genetic import prepared_settings_type, shift_type, bike_settings_type
+
 
 def goal_simulator(settings: GoalSimulationOptions, task=None, sim_start=None):
     if task is not None and sim_start is not None:
@@ -102,7 +106,7 @@ def goal_simulator(settings: GoalSimulationOptions, task=None, sim_start=None):
         delete_running_file(f"/fleetmanager/running_tasks/{sim_start}.txt")
         return response
 
-    tb = TabuSearch(
+    tb = get_engine("tabu")(
         vehicle_manager,
         sim_settings["location"],
         [settings.start_date, settings.end_date],
@@ -253,7 +257,7 @@ def automatic_simulator(settings: GoalSimulationOptions, task=None, sim_start=No
         "message": None,
     }
 
-    automatic = AutomaticSimulation(
+    automatic = get_engine("genetic")(
         locations=sim_settings["location"],
         start_date=settings.start_date,
         end_date=settings.end_date,
@@ -280,15 +284,17 @@ def automatic_simulator(settings: GoalSimulationOptions, task=None, sim_start=No
     if not update_progress(task, sim_start, 0.2, response, task_message="Afsøger optimale flådesammensætninger"):
         return response
 
-    for n, x in automatic.run_search():
-        step = (1 + n) / (1 + x) * 60 / 100
-        if not update_progress(task, sim_start, step + 0.2, response, task_message="Tester løsninger"):
-            return response
+    with stage("genetic search"):
+        for n, x in automatic.run_search():
+            step = (1 + n) / (1 + x) * 60 / 100
+            if not update_progress(task, sim_start, step + 0.2, response, task_message="Tester løsninger"):
+                return response
 
-    for n, x in automatic.run_solutions():
-        step = (1 + n) / (1 + x) * 20 / 100
-        if not update_progress(task, sim_start, step + 0.8, response, task_message="Evaluerer resultater"):
-            return response
+    with stage("genetic solutions"):
+        for n, x in automatic.run_solutions():
+            step = (1 + n) / (1 + x) * 20 / 100
+            if not update_progress(task, sim_start, step + 0.8, response, task_message="Evaluerer resultater"):
+                return response
 
     if len(automatic.reports) == 0:
         response["message"] = "No solutions found"
@@ -306,41 +312,46 @@ def automatic_simulator(settings: GoalSimulationOptions, task=None, sim_start=No
 
     current_vehicle_usage = vehicle_usage(current_results["consequence_calculator"].store)
 
-    solutions = []
-    for solution in rank_solutions(automatic.reports, settings.prioritisation)[:5]:
-        solution_results = solution["results"]
-        solution_results["current_vehicle_distribution"] = current_results["results"]["current_vehicle_distribution"]
-        usage_report = {
-            "simulation": solution_results["vehicle_usage"].get("drivingcheck", {}),
-            "current": current_vehicle_usage.get("current")
-        }
-        solution_results["vehicle_usage"] = usage_report
-        db = prepare_auto_trip_store(solution["driving_book"], current_db)
-        results = {
-            "driving_book": prepare_trip_store(db),
-            "results": solution_results
-        }
-        solutions.append(
-            Solution(
-                current_expense=current_expense,
-                current_co2e=current_emission,
-                simulation_expense=solution["omkostning"],
-                simulation_co2e=solution["udledning"],
-                unallocated=solution["uallokeret"],
-                vehicles=[
-                    SolutionVehicle(
-                        id=vehicle["fleet_id"],
-                        count=vehicle["count"],
-                        count_difference=vehicle["count_difference"],
-                        name=vehicle["class_name"],
-                        omkostning_aar=vehicle["omkostning_aar"],
-                        emission=vehicle["stringified_emission"],
-                    )
-                    for vehicle in solution["flåde"]
-                ],
-                results=results
+    with stage("result packing") as span:
+        solutions = []
+        for solution in rank_solutions(automatic.reports, settings.prioritisation)[:5]:
+            solution_results = solution["results"]
+            solution_results["current_vehicle_distribution"] = current_results["results"]["current_vehicle_distribution"]
+            usage_report = {
+                "simulation": solution_results["vehicle_usage"].get("drivingcheck", {}),
+                "current": current_vehicle_usage.get("current")
+            }
+            solution_results["vehicle_usage"] = usage_report
+            db = prepare_auto_trip_store(solution["driving_book"], current_db)
+            results = {
+                "driving_book": prepare_trip_store(
+                    db,
+                    {"current": current_results["vehicles"], "simulation": solution["vehicles"]},
+                ),
+                "results": solution_results
+            }
+            solutions.append(
+                Solution(
+                    current_expense=current_expense,
+                    current_co2e=current_emission,
+                    simulation_expense=solution["omkostning"],
+                    simulation_co2e=solution["udledning"],
+                    unallocated=solution["uallokeret"],
+                    vehicles=[
+                        SolutionVehicle(
+                            id=vehicle["fleet_id"],
+                            count=vehicle["count"],
+                            count_difference=vehicle["count_difference"],
+                            name=vehicle["class_name"],
+                            omkostning_aar=vehicle["omkostning_aar"],
+                            emission=vehicle["stringified_emission"],
+                        )
+                        for vehicle in solution["flåde"]
+                    ],
+                    results=results
+                )
             )
-        )
+        span.rows = sum(len(solution.results["driving_book"]) for solution in solutions)
 
     response["solutions"] = solutions
     delete_running_file(f"/fleetmanager/running_tasks/{sim_start}.txt")
@@ -362,49 +373,45 @@ def delete_running_file(path):
 def load_goal_simulation_history(
     session: Session, redis: redis.Redis
 ) -> list[GoalSimulationHistory]:
-    all_keys = redis.keys("*")
     previous_simulations: list[GoalSimulationHistory] = []
-    for key in all_keys:
-        task = redis.get(key)
-        if task is not None:
-            unpickled = pickle.loads(task)
-            if (
-                unpickled.get("status") == "SUCCESS"
-                and unpickled.get("name")
-                == "fleetmanager.tasks.celery.run_goal_simulation"
-                and unpickled.get("queue") == os.getenv("CELERY_QUEUE")
-            ):
-                simulation_options = dict(unpickled.get("result").get("simulation_options"))
-                location_id = simulation_options.get("location_id")
-                location_ids = None if "location_ids" not in simulation_options else simulation_options.get("location_ids")
-                if location_ids:
-                    location_address = None
-                    location_addresses = " & ".join(
-                        map(lambda row: row.address, session.query(AllowedStarts).filter(AllowedStarts.id.in_(location_ids)).all())
-                    )
-                else:
-                    location_addresses = None
-                    location_address = session.scalar(
-                        select(AllowedStarts.address).filter(
-                            AllowedStarts.id == location_id
-                        )
-                    )
-                previous_simulations.append(
-                    GoalSimulationHistory(
-                        id=unpickled.get("task_id"),
-                        start_date=str(
-                            unpickled.get("result").get("simulation_options").start_date
-                        ),
-                        end_date=str(
-                            unpickled.get("result").get("simulation_options").end_date
-                        ),
-                        location=location_address
-                        if location_address
-                        else "Ingen lokation",
-                        locations=location_addresses,
-                        simulation_date=unpickled.get("date_done"),
+    for unpickled in stored_task_results(redis):
+        if (
+            unpickled.get("status") == "SUCCESS"
+            and unpickled.get("name")
+            == "fleetmanager.tasks.celery.run_goal_simulation"
+            and unpickled.get("queue") == os.getenv("CELERY_QUEUE")
+        ):
+            simulation_options = dict(unpickled.get("result").get("simulation_options"))
+            location_id = simulation_options.get("location_id")
+            location_ids = None if "location_ids" not in simulation_options else simulation_options.get("location_ids")
+            if location_ids:
+                location_address = None
+                location_addresses = " & ".join(
+                    map(lambda row: row.address, session.query(AllowedStarts).filter(AllowedStarts.id.in_(location_ids)).all())
+                )
+            else:
+                location_addresses = None
+                location_address = session.scalar(
+                    select(AllowedStarts.address).filter(
+                        AllowedStarts.id == location_id
                     )
                 )
+            previous_simulations.append(
+                GoalSimulationHistory(
+                    id=unpickled.get("task_id"),
+                    start_date=str(
+                        unpickled.get("result").get("simulation_options").start_date
+                    ),
+                    end_date=str(
+                        unpickled.get("result").get("simulation_options").end_date
+                    ),
+                    location=location_address
+                    if location_address
+                    else "Ingen lokation",
+                    locations=location_addresses,
+                    simulation_date=unpickled.get("date_done"),
+                )
+            )
     return previous_simulations
 
 
@@ -433,7 +440,7 @@ def update_progress(task, sim_start, progress, response, task_message=None):
         if not os.path.exists(f"/fleetmanager/running_tasks/{sim_start}.txt"):
             response["message"] = "Search aborted."
             return False
-        meta = {"progress": progress, "sim_start": sim_start}
+        meta = {"progress": progress, "sim_start": sim_start, "timings": current_timings()}
         if task_message:
             meta["task_message"] = task_message
         task.update_state(
@@ -15,14 +15,9 @@ from fleetmanager.api.location.schemas import (
     PrecisionTestResults,
     PrecisionTestIn
 )
-from fleetmanager.data_access import AllowedStarts, RoundTrips, engine_creator, Cars
+from fleetmanager.data_access import AllowedStarts, RoundTrips, engine_creator, Cars, bump_data_generation
 from fleetmanager.data_access import AllowedStartAdditions as AllowedStartAdditionsDB
-from fleetmanager.extractors.skyhost.updatedb import location_precision_test as precision_test_skyhost
-from fleetmanager.extractors.skyhost.updatedb import location_precision_test_v2 as precision_test_skyhost_v2
-from fleetmanager.extractors.mileagebook.updatedb import location_precision_test as precision_test_mileagebook
-from fleetmanager.extractors.gamfleet.updatedb import location_precision_test as precision_test_gamfleet
-from fleetmanager.extractors.fleetcomplete.updatedb import location_precision_test as precision_test_fleetcomplete
-from fleetmanager.extractors.puma.updatedb import location_precision_test as precision_test_puma
+from fleetmanager.model.engines import import_path
 
 
 logger = logging.getLogger(__name__)
@@ -198,6 +193,7 @@ def add_new_location(session: Session, location_data: AllowedStart) -> AllowedSt
         existing_additions=[]
     )
 
+    bump_data_generation(session)
     session.commit()
 
     session.refresh(new_location)
@@ -249,6 +245,7 @@ def update_location_complete(session: Session, location_id: int, update_data: Al
 
     manage_additions(session, location, update_data.additional_starts or [], location.additions)
 
+    bump_data_generation(session)
     session.commit()
     session.refresh(location)
 
@@ -281,36 +278,47 @@ def update_location_complete(session: Session, location_id: int, update_data: Al
     )
 
 
-def precision_test(
-        extractors: list[str],
-        location: int,
-        test_specific_start: AllowedStart,
-        start_date: date | datetime,
-        task=None,
-        test_name=None
-):
-    test_path = None
-
-    if task is not None and test_name is not None:
-        task.update_state(
-            state="PROGRESS",
-            meta={"progress": 0, "test_name": test_name}
-        )
-        test_path = f"/fleetmanager/running_tasks/{test_name}.txt"
-
-    extractor_to_test_mapper = {
-        "SKYHOST": {"precision_function": precision_test_skyhost, "keys_key": "SKYHOST_KEYS"},
-        "MILEAGEBOOK": {"precision_function": precision_test_mileagebook, "keys_key": "MILEAGEBOOK_KEYS"},
-        "GAMFLEET": {"precision_function": precision_test_gamfleet, "keys_key": "GAMFLEET_KEYS"},
-        "FLEETCOMPLETE": {"precision_function": precision_test_fleetcomplete, "keys_key": "FLEETCOMPLETE_KEYS"},
-        "PUMA": {'precision_function': precision_test_puma, "keys_key": "PUMA_KEYS"},  # keys only for continuity
-        "SKYHOST_V2": {"precision_function": precision_test_skyhost_v2, "keys_key": "SKYHOST_V2_KEYS"}
-    }
-
-    engine = engine_creator()
-    session = sessionmaker(bind=engine)()
-
-    cars = session.query(
+# the precision functions are imported on use, such that the extractor dependencies are not loaded by the api
+precision_test_extractors = {
+    "SKYHOST": {
+        "precision_function": "fleetmanager.extractors.skyhost.updatedb:location_precision_test",
+        "keys_key": "SKYHOST_KEYS",
+    },
+    "MILEAGEBOOK": {
+        "precision_function": "fleetmanager.extractors.mileagebook.updatedb:location_precision_test",
+        "keys_key": "MILEAGEBOOK_KEYS",
+    },
+    "GAMFLEET": {
+        "precision_function": "fleetmanager.extractors.gamfleet.updatedb:location_precision_test",
+        "keys_key": "GAMFLEET_KEYS",
+    },
+    "FLEETCOMPLETE": {
+        "precision_function": "fleetmanager.extractors.fleetcomplete.updatedb:location_precision_test",
+        "keys_key": "FLEETCOMPLETE_KEYS",
+    },
+    "PUMA": {
+        "precision_function": "fleetmanager.extractors.puma.updatedb:location_precision_test",
+        "keys_key": "PUMA_KEYS",  # keys only for continuity
+    },
+    "SKYHOST_V2": {
+        "precision_function": "fleetmanager.extractors.skyhost.updatedb:location_precision_test_v2",
+        "keys_key": "SKYHOST_V2_KEYS",
+    },
+}
+
+
+def precision_test_path(test_name: str | None) -> str | None:
+    """
+    The running task file of the test, the test is cancelled when the file is removed
+    """
+    return None if test_name is None else f"/fleetmanager/running_tasks/{test_name}.txt"
+
+
+def precision_test_cars(session: Session, location: int, car_ids: list[int] | None = None):
+    """
+    The cars of the location that are included in the precision test
+    """
+    query = session.query(
         Cars.id,
         Cars.location,
         Cars.plate,  # puma extraction is dependent on the plate
@@ -327,33 +335,24 @@ def precision_test(
                 Cars.deleted == False, Cars.deleted.is_(None)
             )
         )
-    ).all()
-
-    len_cars = len(cars)
-    results = []
-    response = PrecisionTestResults(
-        test_settings=PrecisionTestIn(
-            location=location,
-            test_specific_start=test_specific_start,
-            start_date=start_date
-        ),
-        id=location,
-        precision=0,
-        roundtrip_km=0,
-        km=0
     )
+    if car_ids is not None:
+        query = query.filter(Cars.id.in_(car_ids))
+    return query.all()
 
+
+def precision_test_functions(extractors: list[str]):
+    """
+    Yields the precision function and the keys of the extractors that are configured in the environment
+    """
     for extractor in extractors:
-        if len_cars == len(results):
-            # no need to look further if all cars are accounted for
-            break
-        precision_function = extractor_to_test_mapper.get(extractor, {}).get("precision_function")
+        precision_function = precision_test_extractors.get(extractor, {}).get("precision_function")
 
         if precision_function is None:
             logger.info(f"Extractor {extractor} does not exist in precision testing")
             continue
 
-        extractor_keys = extractor_to_test_mapper.get(extractor, {}).get("keys_key")
+        extractor_keys = precision_test_extractors.get(extractor, {}).get("keys_key")
         if extractor_keys is None:
             logger.info(f"Could not find keys key in mapping {extractor}")
             continue
@@ -363,7 +362,102 @@ def precision_test(
             logger.info(f"Could not find keys by {extractor_keys} in env")
             continue
 
-        keys = keys.split(",")
+        yield import_path(precision_function), keys.split(",")
+
+
+def precision_test_results(
+        results: list[dict | None],
+        location: int,
+        test_specific_start: AllowedStart,
+        start_date: date | datetime,
+) -> PrecisionTestResults:
+    """
+    Reduces the results of the cars to the kilometer weighted precision of the location, cars without a result
+    are left out
+    """
+    results = [car_result for car_result in results if car_result is not None]
+    response = PrecisionTestResults(
+        test_settings=PrecisionTestIn(
+            location=location,
+            test_specific_start=test_specific_start,
+            start_date=start_date
+        ),
+        id=location,
+        precision=0,
+        roundtrip_km=0,
+        km=0
+    )
+    response.roundtrip_km = sum(map(lambda car_test: car_test["kilometers"] * car_test["precision"], results))
+    response.km = sum(map(lambda car_test: car_test["kilometers"], results))
+    response.precision = 0 if response.km == 0 else response.roundtrip_km / response.km
+    return response
+
+
+def precision_test_car(
+        extractors: list[str],
+        location: int,
+        car_id: int,
+        test_specific_start: AllowedStart,
+        start_date: date | datetime,
+) -> dict | None:
+    """
+    Tests the precision of a single car of the location. The extractors are tried in order and the result of the
+    first extractor that finds the car is returned, None if the car is not found.
+    """
+    engine = engine_creator()
+    session = sessionmaker(bind=engine)()
+    try:
+        cars = precision_test_cars(session, location, car_ids=[car_id])
+        if not cars:
+            return None
+        for precision_function, keys in precision_test_functions(extractors):
+            for car_result in precision_function(
+                session,
+                keys=keys,
+                location=location,
+                cars=cars,
+                test_specific_start=test_specific_start,
+                start_date=start_date
+            ):
+                return car_result
+        return None
+    finally:
+        session.close()
+
+
+def precision_test(
+        extractors: list[str],
+        location: int,
+        test_specific_start: AllowedStart,
+        start_date: date | datetime,
+        task=None,
+        test_name=None
+):
+    """
+    Tests the precision of the location sequentially, extractor by extractor. The celery task fans the test out per
+    car, see precision_test_car and precision_test_results.
+    """
+    test_path = None
+
+    if task is not None and test_name is not None:
+        task.update_state(
+            state="PROGRESS",
+            meta={"progress": 0, "test_name": test_name}
+        )
+        test_path = precision_test_path(test_name)
+
+    engine = engine_creator()
+    session = sessionmaker(bind=engine)()
+
+    cars = precision_test_cars(session, location)
+
+    len_cars = len(cars)
+    results = []
+
+    for precision_function, keys in precision_test_functions(extractors):
+        if len_cars == len(results):
+            # no need to look further if all cars are accounted for
+            break
 
         for k, car_result in enumerate(
                 precision_function(
@@ -378,7 +472,7 @@ def precision_test(
             results.append(car_result)
             if task is not None and test_path:
                 if not os.path.exists(test_path):
-                    return response
+                    return precision_test_results([], location, test_specific_start, start_date)
                 task.update_state(
                     state="PROGRESS",
                     meta={"progress": len(results) / len_cars, "test_name": test_name}
@@ -387,14 +481,12 @@ def precision_test(
     if test_path and os.path.exists(test_path):
         os.remove(test_path)
 
-    response.roundtrip_km = sum(map(lambda car_test: car_test["kilometers"] * car_test["precision"], results))
-    response.km = sum(map(lambda car_test: car_test["kilometers"], results))
-    response.precision = 0 if response.km == 0 else response.roundtrip_km / response.km
-    return response
+    return precision_test_results(results, location, test_specific_start, start_date)
 
 
 def update_location_address(session: Session, location_id: int, address: str):
     session.query(AllowedStarts).filter(AllowedStarts.id == location_id).update({"address": address})
+    bump_data_generation(session)
     session.commit()
     allowed_start = get_allowed_starts(session, locations=[location_id])
     return [] if not allowed_start else allowed_start[0]
@@ -1,2 +1,11 @@
-from .model import Model
-from .tco_calculator import TCOCalculator
+def __getattr__(name):
+    # the model is imported on use, importing a light submodule like the exceptions does not load the simulation
+    if name == "Model":
+        from .model import Model
+
+        return Model
+    if name == "TCOCalculator":
+        from .tco_calculator import TCOCalculator
+
+        return TCOCalculator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,57 @@
+"""
+Registry of the simulation engines. The engines depend on the solver libraries, OR-Tools, DEAP and scikit-learn, which
+are slow to import, so an engine is registered by the import path of its implementation and only imported when it is
+first used. Processes that never simulate, like the api serving statistics and configurations, never load them.
+"""
+import importlib
+import threading
+
+# engine name to "module:attribute" of the implementation
+engines = {
+    "qampo": "fleetmanager.model.qampo.qampo_simulation:optimize_single_day",
+    "tabu": "fleetmanager.model.tabu:TabuSearch",
+    "genetic": "fleetmanager.model.genetic:AutomaticSimulation",
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def import_path(path: str):
+    """
+    Imports the attribute of the module given as "module:attribute"
+    """
+    module, attribute = path.split(":")
+    return getattr(importlib.import_module(module), attribute)
+
+
+def register_engine(name: str, path: str) -> None:
+    """
+    Registers the implementation of an engine as "module:attribute", replacing any earlier registration of the name
+    """
+    with _lock:
+        engines[name] = path
+        _loaded.pop(name, None)
+
+
+def get_engine(name: str):
+    """
+    The implementation of the engine, imported on the first use
+    """
+    engine = _loaded.get(name)
+    if engine is None:
+        if name not in engines:
+            raise KeyError(f"No simulation engine registered as {name}")
+        with _lock:
+            engine = _loaded.get(name)
+            if engine is None:
+                engine = _loaded[name] = import_path(engines[name])
+    return engine
+
+
+def preload_engines() -> None:
+    """
+    Imports every registered engine, used by the celery worker to load the solvers once before the pool is forked
+    """
+    for name in list(engines):
+        get_engine(name)
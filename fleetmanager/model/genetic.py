@@ -1,5 +1,8 @@
+import copy
 import math
+import os
 import random
+from billiard import Pool
 from deap import base, creator, tools
 import numpy as np
 from datetime import date, datetime, time
@@ -10,12 +13,14 @@ from sqlalchemy.engine.row import Row
 from sqlalchemy.orm import sessionmaker
 
 from fleetmanager.data_access import engine_creator, Cars
+from fleetmanager.data_access.db_engine import dispose_engines
 from fleetmanager.fleet_simulation import get_unallocated, allocation_distribution, vehicle_usage
 from fleetmanager.model.tco_calculator import TCOCalculator
+from fleetmanager.model.timing import timed_stage
 from fleetmanager.model.model import Trips, Simulation, ConsequenceCalculator, Model
-from fleetmanager.model.vehicle import Bike, ElectricBike, FleetInventory, VehicleFactory
+from fleetmanager.model.vehicle import Bike, ElectricBike, FleetInventory, FleetPool, VehicleFactory
 from fleetmanager.configuration.util import load_shift_settings, load_bike_configuration_from_db
-from fleetmanager.model.trip_generator import extract_peak_day
+from fleetmanager.model.trip_generator import concurrency_profile, extract_peak_day
 from fleetmanager.simulation_setup import get_emission
 
 
@@ -41,6 +46,13 @@ bike_settings_type = TypedDict(
 )
 
 
+# number of processes running the genetic searches of the bike scenarios in parallel, searches run in process if 1.
+# The searches run inside the celery workers, so more than 1 should only be set when the workers leave cores idle
+search_processes = int(os.getenv("GENETIC_SEARCH_PROCESSES", 1))
+# the genetic search of a scenario is seeded with search_seed plus the number of bikes in the scenario
+search_seed = 42
+
+
 prepared_settings_type = TypedDict(
     "prepared_settings_type", {
         "high": float,
@@ -171,13 +183,22 @@ class TripHandler:
         regular = []
         electrical = []
 
-        for trip in trips.itertuples():
+        # the bikes share the settings, the static acceptance is computed once per type
+        bike_acceptance = create_bike().static_acceptance(trips)
+        ebike_acceptance = create_ebike().static_acceptance(trips)
+
+        for position, trip in enumerate(trips.itertuples()):
             accepted = False
 
             for bike in bike_in_use:
                 if len(bike.trips) and trip.start_time < bike.trips[-1][-1]:
                     continue
-                accepted = bike.accept_trip(trip)
+                acceptance = (
+                    ebike_acceptance
+                    if isinstance(bike, ElectricBike)
+                    else bike_acceptance
+                )
+                accepted = bike.accept_trip(trip, acceptance[position])
                 if accepted:
                     break
             if accepted:
@@ -185,13 +206,13 @@ class TripHandler:
 
             # will a new bike accept it?
             new_bike = create_bike()
-            accepted = new_bike.accept_trip(trip)
+            accepted = new_bike.accept_trip(trip, bike_acceptance[position])
             if accepted:
                 bike_in_use.append(new_bike)
                 regular.append(new_bike)
                 continue
             new_ebike = create_ebike()
-            accepted = new_ebike.accept_trip(trip)
+            accepted = new_ebike.accept_trip(trip, ebike_acceptance[position])
             if accepted:
                 bike_in_use.append(new_ebike)
                 electrical.append(new_ebike)
@@ -269,6 +290,13 @@ class FleetHandler:
         self.attributed_fleet = self.__attribute_cars()
         self.__chop_bad_choices()  # used for measuring fitness, is re-calculated when scenario is activated
 
+    def __getstate__(self):
+        # the handler is sent to the search processes without the database connection
+        state = self.__dict__.copy()
+        for unpicklable in ("engine", "session", "weight_gen"):
+            state.pop(unpicklable, None)
+        return state
+
     def __count_original(self):
         count_dict = {}
         opslag = {str(id_): vehicle_type for vehicle_type in self.original_fleet for id_ in vehicle_type[-1].split(",")}
@@ -673,7 +701,7 @@ def run_solution_search(
     return population, logbook
 
 
-def genetic_handler(fleet_handler):
+def genetic_handler(fleet_handler, seed: int = search_seed):
     """
     runs the genetic algorithm with deap library. Calls search/generation with elitism where best solutions are kept.
 
@@ -681,7 +709,7 @@ def genetic_handler(fleet_handler):
     of the fitness of the generated solutions.
     """
 
-    random.seed(42)
+    random.seed(seed)
 
     num_generations = 200
     crossover_prob = 0.5
@@ -759,6 +787,18 @@ def genetic_handler(fleet_handler):
     return solutions
 
 
+def search_scenario(scenario: Tuple[FleetHandler, int]):
+    """
+    Runs the genetic search of a scenario, i.e. a fleet handler with an activated trim or cook scenario and the seed
+    of the search. Runs in the search processes, hence the solutions are returned as lists with their fitness.
+    """
+    fleet_handler, seed = scenario
+    return [
+        (list(solution), solution.fitness.values[0])
+        for solution in genetic_handler(fleet_handler, seed=seed)
+    ]
+
+
 class DrivingTest:
     """
     Class to help testing the solutions. Contains methods for estimating the required number of vehicles, by testing
@@ -777,6 +817,8 @@ class DrivingTest:
         self.fleet_handler = fleet_handler
         self.trip_handler = trip_handler
         self.fleet_name = "drivingcheck"
+        # the fleets of the counts checked by the drivability search, reset when a count is checked again
+        self.fleets = FleetPool()
         self.default_fleet = None
         self.type_translation = None
         self.fuel_translation = None
@@ -826,6 +868,7 @@ class DrivingTest:
             load_self=False,
             unique_vehicles=vehicles
         )
+        self.fleets = FleetPool()
 
         self.default_fleet = solution
         start_solution = solution
@@ -839,14 +882,35 @@ class DrivingTest:
             if modify_key:
                 vehicle_factory.vmapper[modify_key].km_aar = max_dist * 365
 
+        # a vehicle drives one trip at a time, hence the number of simultaneous trips bounds the vehicles needed
+        lower = self.lower_bound(trips, bikes=solution[0] if car_idx == 1 else 0)
+        numbers_checked = None
+        if lower > 0:
+            lower_solution = list(start_solution)
+            lower_solution[car_idx] = lower
+            if self.__is_drivable(trips, self.search_fleet(lower_solution, vehicle_factory)):
+                return True, self.__full_period_solution(lower, car_idx, vehicle_factory)
+            # search between the bound and the current count
+            numbers_checked = {lower: False}
+            start_solution[car_idx] = max(start_solution[car_idx], lower + 1)
+
         breakpoint_found, count = self.__search(
             start_solution,
             vehicle_factory=vehicle_factory,
             trips=trips,
-            car_idx=car_idx  # search with the specified index
+            car_idx=car_idx,  # search with the specified index
+            numbers_checked=numbers_checked,
         )
         return breakpoint_found, count
 
+    def lower_bound(self, trips: Trips, bikes: int = 0) -> int:
+        """
+        The least number of vehicles that can drive the trips, i.e. the peak number of simultaneous trips including
+        the sub_time of the vehicles. Bikes and the trips that are allowed to be skipped are deducted.
+        """
+        profile = concurrency_profile(trips.trips, sub_time=self.settings.get("sub_time", 5))
+        return max(0, profile.peak - bikes - self.__allowed_skipped(trips))
+
     def fleet_to_dict(self, vehicles: list[Row]):
         self.type_translation = {
             1: "cykel",
@@ -902,6 +966,14 @@ class DrivingTest:
         )
         return fleet
 
+    def search_fleet(self, solution: list[int], vehicle_factory: VehicleFactory, days: int = 1):
+        """
+        The fleet of the solution for the drivability search, the fleets are reused within the search of a factory
+        """
+        return self.fleets.get(
+            (days, *solution), lambda: self.build_fleet(solution, vehicle_factory, days=days)
+        )
+
     def __search(
         self,
         solution: list[int],
@@ -916,7 +988,7 @@ class DrivingTest:
     ):
         iteration += 1
         if numbers_checked is None:
-            fleet = self.build_fleet(solution, vehicle_factory)
+            fleet = self.search_fleet(solution, vehicle_factory)
             numbers_checked = {solution[car_idx]: self.__is_drivable(trips, fleet)}
         if old is None:
             old = solution[car_idx]
@@ -937,7 +1009,7 @@ class DrivingTest:
             middle += 1
         new_solution = self.default_fleet
         new_solution[car_idx] = middle
-        fleet = self.build_fleet(new_solution, vehicle_factory)
+        fleet = self.search_fleet(new_solution, vehicle_factory)
         drivable = self.__is_drivable(trips, fleet)
         numbers_checked[middle] = drivable
 
@@ -954,22 +1026,7 @@ class DrivingTest:
         ]
 
         if terminate:
-            count = checked[terminate[0]]
-            # set the actual number of days
-            min_date = self.trip_handler.trips.all_trips.start_time.min()
-            max_date = self.trip_handler.trips.all_trips.end_time.max()
-            days = math.ceil(
-                (max_date - datetime.combine(min_date.date(), time(0))).total_seconds() / 3600 / 24
-            )
-            while True:
-                new_solution = self.default_fleet
-                new_solution[car_idx] = count
-                fleet = self.build_fleet(new_solution, vehicle_factory, days=days)
-                drivable = self.__is_drivable(self.trip_handler.trips, fleet)
-                if drivable:
-                    break
-                count += 1
-            return True, new_solution
+            return True, self.__full_period_solution(checked[terminate[0]], car_idx, vehicle_factory)
         elif iteration > max_iter:
             return False, new_solution
 
@@ -1000,6 +1057,41 @@ class DrivingTest:
 
         return new_solution
 
+    def __full_period_solution(self, count: int, car_idx: int, vehicle_factory: VehicleFactory):
+        """
+        Increases the count found on the peak day until the whole period is drivable. The count starts from the
+        lower bound of the whole period, since it can exceed the peak day.
+        """
+        # set the actual number of days
+        min_date = self.trip_handler.trips.all_trips.start_time.min()
+        max_date = self.trip_handler.trips.all_trips.end_time.max()
+        days = math.ceil(
+            (max_date - datetime.combine(min_date.date(), time(0))).total_seconds() / 3600 / 24
+        )
+        count = max(
+            count,
+            self.lower_bound(
+                self.trip_handler.trips, bikes=self.default_fleet[0] if car_idx == 1 else 0
+            ),
+        )
+        while True:
+            new_solution = self.default_fleet
+            new_solution[car_idx] = count
+            fleet = self.search_fleet(new_solution, vehicle_factory, days=days)
+            drivable = self.__is_drivable(self.trip_handler.trips, fleet)
+            if drivable:
+                break
+            count += 1
+        return new_solution
+
+    def __allowed_skipped(self, trips: Trips) -> int:
+        slack = self.settings.get("slack", 0)
+        if slack > 0 and len(trips.trips) > 0:
+            return round(
+                (trips.trips.end_time.max() - trips.trips.start_time.min()).total_seconds() / 3600 / 24 / slack
+            )
+        return 0
+
     def __is_drivable(self, trips: Trips, fleet: FleetInventory):
         simulation = Simulation(
             trips,
@@ -1012,12 +1104,7 @@ class DrivingTest:
         )
         simulation.run()
         twv = simulation.trips.trips[simulation.trips.trips[f"{self.fleet_name}_type"] == -1]
-        allowed_skipped = 0
-        slack = self.settings.get("slack", 0)
-        if slack > 0:
-            allowed_skipped = round(
-                (trips.trips.end_time.max() - trips.trips.start_time.min()).total_seconds() / 3600 / 24 / slack
-            )
+        allowed_skipped = self.__allowed_skipped(trips)
         drivable = False if len(twv) > allowed_skipped else True
         if len(twv[twv.distance > self.settings.get("max_undriven", 20)]) > 0:
             return False
@@ -1062,6 +1149,7 @@ class DrivingTest:
             "udledning": udledning,
             "uallokeret": uallokeret,
             "driving_book": driving_book.copy(),
+            "vehicles": simulation.trips.vehicle_table(fleet_name),
             "consequence_calculator": cq
         }
 
@@ -1113,6 +1201,7 @@ class AutomaticSimulation:
         self.qualified = []  # The solutions that were successful
         self.typtrans = {"fossilbil": 0, "elbil": 1, "elcykel": 2, "cykel": 3}
 
+    @timed_stage("genetic preparation")
     def prepare_simulation(self):
         self.th = TripHandler(
             locations=self.locations,
@@ -1132,13 +1221,22 @@ class AutomaticSimulation:
         self.dt = DrivingTest(fleet_handler=self.fh, trip_handler=self.th, settings=self.settings)
 
     def run_search(self):
-        number_of_searches = self.bike_estimate + 1
-        for bike_count in range(0, min(self.bike_estimate + 1, 10)):
+        """
+        Searches the best fleets for each number of bikes. The vehicle count of the scenarios are estimated in turn,
+        as the fleet handler carries the previous scenario over to the next. The genetic searches of the scenarios are
+        independent and run in parallel in search_processes processes. The solutions are added in scenario order.
+
+        Yields the step and the number of steps of the search.
+        """
+        number_of_scenarios = min(self.bike_estimate + 1, 10)
+        number_of_steps = 2 * number_of_scenarios
+        scenarios = []
+        for bike_count in range(0, number_of_scenarios):
             self.fh.bike_estimate = bike_count
             breakpoint_found, solution_with_bikes = self.dt.estimate_required_vehicles(number_of_bikes=bike_count)
             vehicle_count = sum(solution_with_bikes) - bike_count
             if vehicle_count in self.check_vehicle_counts:
-                yield bike_count, number_of_searches
+                yield bike_count, number_of_steps
                 continue
             self.check_vehicle_counts.append(vehicle_count)
             trim_scenario = len(self.fixed_vehicles) >= vehicle_count
@@ -1149,22 +1247,43 @@ class AutomaticSimulation:
             else:
                 self.fh.activate_cook_scenario()
 
-            solutions = genetic_handler(fleet_handler=self.fh)
-            for solution in solutions:
-                fleet = self.dt.build_fleet(
-                    solution,
-                    VehicleFactory(load_self=False, unique_vehicles=self.dt.fleet_to_dict(self.fh.fleet)),
-                    days=self.days
-                )
-                self.all_solutions.append({
-                    "bike_count": bike_count,
-                    "vehicle_count": vehicle_count,
-                    "fleet_list": solution,
-                    "fitness": solution.fitness.values[0],
-                    "fleet": fleet
-                })
-            yield bike_count, number_of_searches
-            continue
+            scenarios.append({
+                "bike_count": bike_count,
+                "vehicle_count": vehicle_count,
+                # copy of the handler with the activated scenario
+                "fleet_handler": copy.deepcopy(self.fh),
+                "unique_vehicles": self.dt.fleet_to_dict(self.fh.fleet),
+            })
+            yield bike_count, number_of_steps
+
+        searches = [
+            (scenario["fleet_handler"], search_seed + scenario["bike_count"])
+            for scenario in scenarios
+        ]
+        processes = min(search_processes, len(searches))
+        # the search processes must not reuse the database connections of the worker
+        pool = Pool(processes, initializer=dispose_engines) if processes > 1 else None
+        try:
+            results = map(search_scenario, searches) if pool is None else pool.imap(search_scenario, searches)
+            for scenario, solutions in zip(scenarios, results):
+                for solution, fitness in solutions:
+                    fleet = self.dt.build_fleet(
+                        solution,
+                        VehicleFactory(load_self=False, unique_vehicles=scenario["unique_vehicles"]),
+                        days=self.days
+                    )
+                    self.all_solutions.append({
+                        "bike_count": scenario["bike_count"],
+                        "vehicle_count": scenario["vehicle_count"],
+                        "fleet_list": solution,
+                        "fitness": fitness,
+                        "fleet": fleet
+                    })
+                yield number_of_scenarios + scenario["bike_count"], number_of_steps
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
 
     def run_solutions(self):
         self.all_solutions.sort(key=lambda x: x["fitness"])
@@ -1245,6 +1364,7 @@ class AutomaticSimulation:
 
             yield idx, num_solutions
 
+    @timed_stage("current fleet simulation")
     def run_current(self):
         current_fleet = []
         for current_id in self.current_vehicles:
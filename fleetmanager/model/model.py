@@ -1,5 +1,6 @@
 import datetime
 import operator
+import os
 from itertools import groupby
 
 import numpy as np
@@ -15,13 +16,19 @@ from fleetmanager.data_access import (
 )
 from fleetmanager.model import vehicle
 from fleetmanager.model.dashfree_utils import get_emission
-from fleetmanager.model.qampo import qampo_simulation
-from fleetmanager.model.qampo.classes import AlgorithmType
+from fleetmanager.model.engines import get_engine
+from fleetmanager.model.qampo.classes import AlgorithmParameters, AlgorithmType
 from fleetmanager.model.qampo.classes import Fleet as qampo_fleet
 from fleetmanager.model.qampo.classes import Trip as qampo_trip
 from fleetmanager.model.tco_calculator import TCOCalculator
+from fleetmanager.model.timing import timed_stage
 from fleetmanager.model.trip_generator import shiftify, get_kilometer_per_hour
-from fleetmanager.model.vehicle import Bike, ElectricBike
+from fleetmanager.model.vehicle import Bike, ElectricBike, encode_segments, epoch_seconds
+
+# the time limit of the intelligent allocation of a day and the relative gap at which it stops. Without a gap the
+# allocation is optimal, e.g. a gap of 0.01 accepts allocations within 1% of the optimal allocation in less time
+qampo_time_limit = int(os.getenv("QAMPO_TIME_LIMIT", 60))
+qampo_relative_gap = float(gap) if (gap := os.getenv("QAMPO_RELATIVE_GAP")) else None
 
 
 class Trips:
@@ -37,6 +44,8 @@ class Trips:
     trips : Trips in dataset applying date and department filter
     date_filter : boolean numpy array with same length as all_trips
     department_filter : boolean numpy array with same length as all_trips
+    vehicles : side table of the assignment columns of the trips. The assignment column of a fleet holds the int32
+        index of the booked vehicle in vehicles[fleet name], -1 if the trip is unassigned
     """
 
     def __init__(
@@ -54,6 +63,7 @@ class Trips:
         else:
             self.engine = engine
         self.all_trips = []
+        self.vehicles = {}
         if isinstance(dataset, pd.DataFrame):
             self.all_trips = dataset
         else:
@@ -88,11 +98,13 @@ class Trips:
                 axis=1,
             )
         print("cars in simulation trips", self.trips.car_id.unique(), flush=True)
+        self.encode_times()
         self.distance_range = (
             self.trips.distance.min(),
             self.trips.distance.max(),
         )
 
+    @timed_stage("load trips", rows=len)
     def load_trips(
         self,
         dates: list[datetime, datetime] = None,
@@ -160,16 +172,79 @@ class Trips:
             lambda x: x.replace(",", "")
         )
         self.all_trips["tripid"] = self.all_trips["id"]
-        self.all_trips["current"] = n * [vehicle.Unassigned()]
+        self.all_trips["current"] = -np.ones((n,), dtype=np.int32)
         self.all_trips["current_type"] = -np.ones((n,), dtype=int)
-        self.all_trips["simulation"] = n * [vehicle.Unassigned()]
+        self.all_trips["simulation"] = -np.ones((n,), dtype=np.int32)
         self.all_trips["simulation_type"] = -np.ones((n,), dtype=int)
 
+    def assign(self, fleet_name, vehicles, assignment, assignment_type):
+        """
+        Sets the vehicles booked for the trips by the fleet.
+
+        Parameters
+        ----------
+        fleet_name : name of the fleet, the assignment is stored in the fleet_name and fleet_name_type columns
+        vehicles : the vehicles of the fleet, the side table of the assignment
+        assignment : index of the booked vehicle in vehicles per trip, -1 if the trip is unassigned
+        assignment_type : vehicle type number of the booked vehicle per trip, -1 if the trip is unassigned
+        """
+        self.vehicles[fleet_name] = list(vehicles)
+        self.trips[fleet_name] = np.asarray(assignment, dtype=np.int32)
+        self.trips[f"{fleet_name}_type"] = assignment_type
+
+    def vehicle_table(self, fleet_name):
+        """
+        Metadata of the vehicles that the assignment column of the fleet refers to, for displaying the assignment.
+
+        Parameters
+        ----------
+        fleet_name : name of the fleet
+
+        Returns
+        -------
+        pandas frame indexed by the values of the assignment column with vehicle_name, vehicle_id and typeid
+        """
+        return pd.DataFrame(
+            [
+                {
+                    "vehicle_name": f"{v.make} {v.model} {v.name.split('_')[-1]} {v.__dict__.get('plate', '')}",
+                    "vehicle_id": str(v.id),
+                    "typeid": v.typeid,
+                }
+                for v in self.vehicles.get(fleet_name, [])
+            ],
+            columns=["vehicle_name", "vehicle_id", "typeid"],
+        )
+
     def __iter__(self):
         """Yield trips as a single pandas row."""
         for i, r in self.trips.iterrows():
             yield r
 
+    def static_acceptance(self, vehicle_):
+        """
+        The static acceptance of the trips on the vehicle, see VehicleModel.static_acceptance. The acceptance is cached
+        per trips frame on the acceptance key of the vehicle, so vehicles with the same settings share the mask across
+        the simulations on the trips.
+
+        Parameters
+        ----------
+        vehicle_ : vehicle model
+
+        Returns
+        -------
+        numpy boolean array with same length as trips, or None if the vehicle has no static rules
+        """
+        key = vehicle_.acceptance_key()
+        if key is None:
+            return None
+        cache = getattr(self, "_acceptance", None)
+        if cache is None or cache[0] is not self.trips:
+            cache = self._acceptance = (self.trips, {})
+        if key not in cache[1]:
+            cache[1][key] = vehicle_.static_acceptance(self.trips)
+        return cache[1][key]
+
     def _timestamp_to_timeslot(self, timestamp):
         """
         TODO: checkout this for a speed up: https://stackoverflow.com/questions/56796775/is-there-an-equivalent-to-numpy-digitize-that-works-on-an-pandas-intervalindex
@@ -183,13 +258,13 @@ class Trips:
         i : timeslot index as int. If None is returned the timestamp is outside the timeslots.
         """
 
-        time_indexes = np.nonzero(
+        (time_indexes,) = np.nonzero(
             np.logical_and(
                 self.timestamps.start_time <= timestamp,
                 self.timestamps.end_time > timestamp,
             )
         )
-        return time_indexes[0] if len(time_indexes) > 0 else None
+        return time_indexes[0].item() if len(time_indexes) > 0 else None
 
     def set_timestamps(self, timestamps):
         """
@@ -217,11 +292,26 @@ class Trips:
         """
         # this function should create the filtered trips from filters
         self.trips = self.all_trips.copy()
+        self.encode_times()
         self.distance_range = (
             self.trips.distance.min(),
             self.trips.distance.max(),
         )
 
+    def encode_times(self):
+        """
+        Encodes the start and end times of the trips in the epoch_start and epoch_end columns and the trip segments
+        in the epoch_segments column, see vehicle.epoch_seconds and vehicle.encode_segments. The electric vehicles
+        check the trips on the encoded times without converting the timestamps per trip.
+        """
+        self.trips["epoch_start"] = epoch_seconds(self.trips.start_time)
+        self.trips["epoch_end"] = epoch_seconds(self.trips.end_time)
+        if "trip_segments" in self.trips.columns:
+            self.trips["epoch_segments"] = [
+                encode_segments(segments) if isinstance(segments, list) else None
+                for segments in self.trips.trip_segments
+            ]
+
 
 class ConsequenceCalculator:
     """
@@ -309,6 +399,7 @@ class ConsequenceCalculator:
             ]
         self.capacity_source = d
 
+    @timed_stage("consequences")
     def compute(self, simulation, drivingallowance, tco_period):
         """
         The compute function that calculate the consequences;
@@ -364,34 +455,28 @@ class ConsequenceCalculator:
         }
         self.store = {state: [] for state in self.states}
         vehicles_used = {key: {} for key in self.states}
-        for roundtrip in simulation.trips:
+        for state in self.states:
             # co2 udledning
-            # record the vehicle and how much it spent
-            for state in self.states:
-                if getattr(roundtrip, f"{state}_type") == -1:
-                    pass
-                elif getattr(roundtrip, state) not in vehicles_used[state]:
-                    co2_pr_km = (
-                        0
-                        if pd.isna(roundtrip[state].co2_pr_km)
-                        else roundtrip[state].co2_pr_km
-                    )
-                    vehicles_used[state][getattr(roundtrip, state)] = roundtrip.distance
-                    calculate_this[state]["CO2-udledning [kg]"] += (
-                        co2_pr_km * roundtrip.distance
-                    )
-                else:
-                    co2_pr_km = (
-                        0
-                        if pd.isna(roundtrip[state].co2_pr_km)
-                        else roundtrip[state].co2_pr_km
-                    )
-                    vehicles_used[state][
-                        getattr(roundtrip, state)
-                    ] += roundtrip.distance
-                    calculate_this[state]["CO2-udledning [kg]"] += (
-                        co2_pr_km * roundtrip.distance
-                    )
+            # record the vehicles in the order of their first trip and how much they drove
+            trips = simulation.trips.trips
+            booked = (trips[f"{state}_type"] != -1).to_numpy()
+            assignment = trips[state].to_numpy()[booked]
+            distance = trips.distance.to_numpy()[booked]
+            vehicles = simulation.trips.vehicles[state]
+            used, first_trip = np.unique(assignment, return_index=True)
+            used = used[np.argsort(first_trip)]
+            co2_pr_km = np.zeros(len(vehicles))
+            for k in used:
+                if not pd.isna(vehicles[k].co2_pr_km):
+                    co2_pr_km[k] = vehicles[k].co2_pr_km
+            # summed in the order of the trips
+            calculate_this[state]["CO2-udledning [kg]"] += sum(
+                (co2_pr_km[assignment] * distance).tolist()
+            )
+            driven = np.bincount(assignment, weights=distance, minlength=len(vehicles))
+            vehicles_used[state] = dict(
+                zip([vehicles[k] for k in used], driven[used].tolist())
+            )
 
         for state in self.states:
             c_name = state[:3]
@@ -604,6 +689,8 @@ class Simulation:
                 simulated, and not the current.
     intelligent_simulation  :   bool - should intelligent simulation be used, i.e. Qampo algorithm to allocate trips.
     timestamp_set   :   bool -  whether the simulation trips already have generated timeslots
+    qampo_parameters    :   AlgorithmParameters - time limit and relative gap of the intelligent simulation,
+                            QAMPO_TIME_LIMIT and QAMPO_RELATIVE_GAP if not given
 
     """
 
@@ -616,6 +703,7 @@ class Simulation:
         intelligent_simulation=False,
         timestamps_set=False,
         timeslots=True,
+        qampo_parameters=None,
     ):
         self.trips = trips
         self.fleet_manager = fleet_manager
@@ -625,6 +713,11 @@ class Simulation:
         self.timestamps_set = timestamps_set
 
         self.useQampo = intelligent_simulation
+        if qampo_parameters is None:
+            qampo_parameters = AlgorithmParameters(
+                time_limit_in_seconds=qampo_time_limit, relative_gap=qampo_relative_gap
+            )
+        self.qampo_parameters = qampo_parameters
 
         if self.timestamps_set is False and self.timeslots:
             self.time_resolution = pd.Timedelta(minutes=1)
@@ -638,6 +731,7 @@ class Simulation:
         # dummy vehicle for unassigned trips
         self.unassigned_vehicle = vehicle.Unassigned(name="Unassigned")
 
+    @timed_stage("simulation")
     def run(self):
         """Runs simulation of current and simulation fleet"""
         # push timetable to vehicle fleet
@@ -743,8 +837,8 @@ class Simulation:
             fleet = qampo_fleet(**data["fleet"])
             trips = list(map(lambda T: qampo_trip(**T), data["trips"]))
 
-            simulation = qampo_simulation.optimize_single_day(
-                fleet, trips, AlgorithmType.EXACT_MIP
+            simulation = get_engine("qampo")(
+                fleet, trips, AlgorithmType.EXACT_MIP, self.qampo_parameters
             )
 
             # is any of today's trips spanning multiple days?
@@ -778,8 +872,10 @@ class Simulation:
             response.append(simulation)
 
         # Booking vehicles in accordance to the result from qampo api
-        trip_vehicle = [[]] * len(self.trips.trips)
-        trip_vehicle_type = [[]] * len(self.trips.trips)
+        vehicles = list(fleet_inventory)
+        vehicle_index = {v: k for k, v in enumerate(vehicles)}
+        trip_vehicle = -np.ones(len(self.trips.trips), dtype=np.int32)
+        trip_vehicle_type = self.trips.trips.bike_fleet_type.to_numpy().copy()
         for content in response:
             for assignment in content.assignments:
                 id = assignment.vehicle.id
@@ -787,16 +883,17 @@ class Simulation:
                 for t in assignment.route.trips:
                     trip = next(filter(lambda tt: tt["tripid"] == t.id, self.trips))
                     v.book_trip(trip, self.timeslots)
-                    trip_vehicle[trip.name] = v
+                    trip_vehicle[trip.name] = vehicle_index[v]
                     trip_vehicle_type[trip.name] = v.vehicle_type_number
 
-        for k in range(len(trip_vehicle)):
-            if type(trip_vehicle[k]) is list:
-                trip_vehicle[k] = self.trips.trips.bike_fleet[k]
-                trip_vehicle_type[k] = self.trips.trips.bike_fleet_type[k]
+        # the trips booked on the bike fleet refer to its vehicles after the vehicles of the fleet
+        bike_booked = self.trips.trips.bike_fleet.to_numpy() != -1
+        trip_vehicle[bike_booked] = (
+            self.trips.trips.bike_fleet.to_numpy()[bike_booked] + len(vehicles)
+        )
+        vehicles += self.trips.vehicles["bike_fleet"]
 
-        self.trips.trips[fleet_inventory.name] = trip_vehicle
-        self.trips.trips[fleet_inventory.name + "_type"] = trip_vehicle_type
+        self.trips.assign(fleet_inventory.name, vehicles, trip_vehicle, trip_vehicle_type)
 
     def generate_qampo_data(self, fleet_inventory, trips, skip_vehicles=None):
         """Convenience function for converting fleet inventory and trips data to json format
@@ -866,10 +963,13 @@ class Simulation:
         fleet_inventory : fleet inventory to run simulation on. Type model.FleetInventory.
         """
         # loop over trips
+        vehicles = list(fleet_inventory)
+        vehicle_index = {v: k for k, v in enumerate(vehicles)}
         trip_vehicle = []
         trip_vehicle_type = []
         flagged = []
-        for t in self.trips:
+        acceptance = {v: self.trips.static_acceptance(v) for v in fleet_inventory}
+        for position, t in enumerate(self.trips):
             booked_real = False
             if fleet_inventory.name == "current":
                 # overwrites the simulated booking to reflect "reality"
@@ -881,7 +981,7 @@ class Simulation:
                             )  # v.book_trip(t)
 
                             if booked:
-                                trip_vehicle.append(v)
+                                trip_vehicle.append(vehicle_index[v])
                                 trip_vehicle_type.append(v.vehicle_type_number)
                                 booked_real = True
                                 break
@@ -899,10 +999,13 @@ class Simulation:
             # loop over vehicles and check for availability
             booked = False
             for v in fleet_inventory:
-                booked, acc, avail = v.book_trip(t, self.timeslots)
+                eligible = acceptance[v]
+                booked, acc, avail = v.book_trip(
+                    t, self.timeslots, None if eligible is None else eligible[position]
+                )
 
                 if booked:
-                    trip_vehicle.append(v)
+                    trip_vehicle.append(vehicle_index[v])
                     trip_vehicle_type.append(v.vehicle_type_number)
 
                     # local sorting on km driven of same obj weight vehicles
@@ -910,12 +1013,11 @@ class Simulation:
                     break
 
             if not booked:
-                trip_vehicle.append(self.unassigned_vehicle)
+                trip_vehicle.append(-1)
                 trip_vehicle_type.append(self.unassigned_vehicle.vehicle_type_number)
 
         # add vehicles to trips
-        self.trips.trips[fleet_inventory.name] = trip_vehicle
-        self.trips.trips[fleet_inventory.name + "_type"] = trip_vehicle_type
+        self.trips.assign(fleet_inventory.name, vehicles, trip_vehicle, trip_vehicle_type)
 
     def __str__(self):
         return str(self.trips)
@@ -1050,6 +1152,7 @@ class Model:
         bike_percentage=100,
         km_aar=False,
         use_timeslots=True,
+        qampo_parameters=None,
     ):
         """
         Create and run a simulation. Updates histograms and consequence information.
@@ -1064,6 +1167,7 @@ class Model:
         bike_percentage :   how many percentage of the trips that qualifies for bike trip should be accepted
         km_aar  :   bool - should the vehicles associated km_aar constrain the vehicle from accepting trips when the
                         yearly capacity is reached. Only available on intelligent_simulation = False
+        qampo_parameters    :   time limit and relative gap of the intelligent simulation, passed to the simulation
 
         """
         if bike_time_slots is None:
@@ -1074,6 +1178,7 @@ class Model:
             self._update_progress,
             intelligent_simulation=intelligent_simulation,
             timeslots=use_timeslots,
+            qampo_parameters=qampo_parameters,
         )
 
         Bike.max_distance_pr_trip = bike_max_distance
@@ -160,6 +160,9 @@ class AlgorithmParameters(BaseModel):
     time_limit_in_seconds: Optional[int]
     """Defines for how long, an algorithm is allowed to be run."""
 
+    relative_gap: Optional[float]
+    """The exact algorithms stop when the solution is within this relative gap of the optimal solution, e.g. 0.01 for 1%. The default gap of the solver is used if not set."""
+
 
 class RoutingAlgorithm(ABC):
     """An ABC for doing a single day routing assignment."""
@@ -172,5 +175,6 @@ class RoutingAlgorithm(ABC):
         employee_car: BaseVehicle,
         emission_cost_per_ton_co2: float = 1500,
         time_limit_in_seconds: int = 60,
+        relative_gap: Optional[float] = None,
     ) -> RoutePlan:
         pass
@@ -2,7 +2,7 @@
 
 import copy
 
-from .classes import BaseVehicle
+from .classes import BaseVehicle, Trip, Vehicle
 from .cost_calculator import calculate_co2_emission_cost_per_kilometer_for_vehicle
 
 
@@ -29,3 +29,60 @@ def prioritize_vehicles_according_to_weighted_variable_costs(
     )
 
     return vehicles_sorted
+
+
+def maximal_overlap_cliques(trips: list[Trip]) -> list[list[int]]:
+    """
+    Finds the maximal cliques of the interval graph of the trips, i.e. the maximal sets of trips that are all running at the same time.
+    Two trips overlap if max(start times) < min(end times), so a trip ending at the time another trip starts does not overlap it.
+    Since a vehicle can serve at most one trip of each clique, one constraint per clique replaces the pairwise constraints of the overlapping trips.
+    There are at most as many maximal cliques as trips, and they are found in a single sweep over the sorted start and end times.
+    :param trips: Trips.
+    :return: The maximal cliques with at least two trips as lists of positions in trips.
+    """
+    # Ends are sorted before starts at the same time as the trips do not overlap. Trips without a duration overlap no trips.
+    events = sorted(
+        event
+        for position, trip in enumerate(trips)
+        if trip.start_time < trip.end_time
+        for event in ((trip.start_time, 1, position), (trip.end_time, 0, position))
+    )
+
+    cliques = []
+    running = set()
+    # A clique is maximal when a trip ends right after a trip has started.
+    started = False
+
+    for _, is_start, position in events:
+        if is_start:
+            running.add(position)
+            started = True
+            continue
+        if started and len(running) > 1:
+            cliques.append(sorted(running))
+        started = False
+        running.discard(position)
+
+    return cliques
+
+
+def identical_vehicle_groups(vehicles: list[Vehicle]) -> list[list[int]]:
+    """
+    Groups the vehicles that are interchangeable in the optimization, i.e. vehicles with the same cost, emission, range and uptime.
+    Any assignment can be changed into an equally good assignment by swapping the routes of two vehicles in the same group.
+    :param vehicles: Vehicles.
+    :return: The groups with at least two vehicles as lists of positions in vehicles.
+    """
+    groups = {}
+    for position, vehicle in enumerate(vehicles):
+        groups.setdefault(
+            (
+                vehicle.variable_cost_per_kilometer,
+                vehicle.co2_emission_gram_per_kilometer,
+                vehicle.range_in_kilometers,
+                vehicle.maximum_driving_in_minutes,
+            ),
+            [],
+        ).append(position)
+
+    return [group for group in groups.values() if len(group) > 1]
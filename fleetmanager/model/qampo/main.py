@@ -46,6 +46,7 @@ async def optimize_single_day(
             fleet.employee_car,
             fleet.emission_cost_per_ton_co2,
             algorithm_parameters.time_limit_in_seconds,
+            algorithm_parameters.relative_gap,
         )
     elif algorithm_type is AlgorithmType.EXACT_CP:
         return RoutingCp().optimize_single_day(
@@ -54,6 +55,7 @@ async def optimize_single_day(
             fleet.employee_car,
             fleet.emission_cost_per_ton_co2,
             algorithm_parameters.time_limit_in_seconds,
+            algorithm_parameters.relative_gap,
         )
     # Unsupported algorithm type.
     else:
@@ -25,6 +25,7 @@ def optimize_single_day(
             fleet.employee_car,
             fleet.emission_cost_per_ton_co2,
             algorithm_parameters.time_limit_in_seconds,
+            algorithm_parameters.relative_gap,
         )
     elif algorithm_type is AlgorithmType.EXACT_CP:
         return RoutingCp().optimize_single_day(
@@ -33,6 +34,7 @@ def optimize_single_day(
             fleet.employee_car,
             fleet.emission_cost_per_ton_co2,
             algorithm_parameters.time_limit_in_seconds,
+            algorithm_parameters.relative_gap,
         )
     # Unsupported algorithm type.
     else:
@@ -1,14 +1,18 @@
 """ This file contains code, that optimizes a single day routing given a fixed fleet in an optimal manner using the Constraint programming solver from ortools."""
 
 import logging
+import time
+from typing import Optional
 
 from ortools.sat.python import cp_model
 
 from .classes import BaseVehicle, RoutePlan, RoutingAlgorithm, Trip, Vehicle
 from .cost_calculator import calculate_co2_emission_cost_per_kilometer_for_vehicle
 from .exceptions import NoSolutionFoundException
+from .helper_functions import identical_vehicle_groups, maximal_overlap_cliques
 from .routeplan_factory import route_plan_from_vehicle_trip_map
 from .validation import check_trips_only_has_single_date
+from .warm_start import greedy_warm_start
 
 # Initialize logger.
 log = logging.getLogger(__name__)
@@ -25,6 +29,9 @@ class RoutingCp(RoutingAlgorithm):
         employee_car: BaseVehicle,
         emission_cost_per_ton_co2: float = 1500,
         time_limit_in_seconds: int = 60,
+        relative_gap: Optional[float] = None,
+        warm_start: bool = True,
+        break_symmetry: bool = False,
     ) -> RoutePlan:
         """
         This is an exact SAT algorithm that assigns trips to vehicles based on a weight of the variable cost per kilometer and the CO2 emission. time_limit_in_seconds specifies for how long, the algorithm is allowed to be run.
@@ -33,6 +40,9 @@ class RoutingCp(RoutingAlgorithm):
         :param employee_car: Employee car a trip can be assigned to.
         :param emission_cost_per_ton_co2: CO2 emission cost per ton for the entire route plan.
         :param time_limit_in_seconds: Time limit for the running time of the algorithm.
+        :param relative_gap: Stop when the solution is within this relative gap of the optimal solution, e.g. 0.01 for 1%. The default gap of the solver is used if None.
+        :param warm_start: Whether the solver starts from the solution of the greedy algorithm.
+        :param break_symmetry: Whether to add constraints breaking the symmetry between identical vehicles. The solver detects the symmetry itself, which usually works better within a short time limit.
         :return Routing plan created after optimization has been performed.
         """
 
@@ -43,127 +53,155 @@ class RoutingCp(RoutingAlgorithm):
 
         log.debug("Checked trips input for being single day.")
 
-        # Create the mip solver with the SCIP backend.
-        model = cp_model.CpModel()
+        build_start = time.perf_counter()
 
-        # Holds all the variables related to the normal vehicles.
-        vehicles_var = {}
+        # Create the CP model.
+        model = cp_model.CpModel()
 
-        for vehicle in vehicles:
-            for trip in trips:
-                # Make a binary variable that is 1 if the trip is assigned to the vehicle, otherwise 0.
-                vehicles_var[(vehicle, trip)] = model.NewBoolVar(
-                    f"vehicle_{vehicle.id}_trip_{trip.id}."
-                )
+        # Holds all the variables related to the normal vehicles, vehicles_var[i][j] is the variable of vehicles[i] and trips[j].
+        # Make a binary variable that is 1 if the trip is assigned to the vehicle, otherwise 0.
+        vehicles_var = [
+            [
+                model.NewBoolVar(f"vehicle_{vehicle.id}_trip_{trip.id}.")
+                for trip in trips
+            ]
+            for vehicle in vehicles
+        ]
 
         log.debug("Created variables for normal vehicles.")
 
-        # Holds all the variables related to the employee car as this has some special logical later on.
-        employee_car_var = {}
-
-        for trip in trips:
-            # Make a binary variable that is 1 if the trip is assigned to the employee car, 0 otherwise.
-            employee_car_var[trip] = model.NewBoolVar(f"employee_car_trip_{trip.id}.")
+        # Holds all the variables related to the employee car as this has some special logical later on, employee_car_var[j] is the variable of trips[j].
+        # Make a binary variable that is 1 if the trip is assigned to the employee car, 0 otherwise.
+        employee_car_var = [
+            model.NewBoolVar(f"employee_car_trip_{trip.id}.") for trip in trips
+        ]
 
         log.debug("Created variables for employee car.")
 
         # Create constraints to ensure that a vehicle cannot serve overlapping trips.
-        for first_trip in trips:
-            for second_trip in trips:
-                # Do nothing if the trips are the same.
-                if first_trip == second_trip:
-                    continue
-
-                # Check if the two trips overlap in time.
-                # See https://stackoverflow.com/questions/325933/determine-whether-two-date-ranges-overlap
-                if max(first_trip.start_time, second_trip.start_time) < min(
-                    first_trip.end_time, second_trip.end_time
-                ):
-                    # Overlap and add a constraint for each normal vehicle.
-                    for vehicle in vehicles:
-                        model.Add(
-                            vehicles_var.get((vehicle, first_trip))
-                            + vehicles_var.get((vehicle, second_trip))
-                            <= 1
-                        )
+        # A vehicle can serve at most one trip of each set of trips running at the same time.
+        for clique in maximal_overlap_cliques(trips):
+            for vehicle_var in vehicles_var:
+                model.AddAtMostOne(vehicle_var[j] for j in clique)
 
         log.debug(
             "Created constraints to ensure that overlapping trips are not assigned to the same vehicle."
         )
 
         # Create constraints to ensure all trips are assigned to a vehicle (normal or employee car).
-        for trip in trips:
-            model.Add(
-                sum(vehicles_var.get((vehicle, trip)) for vehicle in vehicles)
-                + employee_car_var.get(trip)
-                == 1
+        for j in range(len(trips)):
+            model.AddExactlyOne(
+                [vehicle_var[j] for vehicle_var in vehicles_var] + [employee_car_var[j]]
             )
 
         log.debug(
             "Created constraints to ensure each trip is assigned to a vehicle or employee car."
         )
 
+        trip_lengths = [
+            int(SCALING_OF_TRIPS * trip.length_in_kilometers) for trip in trips
+        ]
+        trip_minutes = [trip.get_trip_length_in_minutes() for trip in trips]
+
         # Create a constraint on the maximum range and the maximum time  for a vehicle.
-        for vehicle in vehicles:
+        for vehicle, vehicle_var in zip(vehicles, vehicles_var):
             # Constraint for maximum range.
             model.Add(
-                sum(
-                    int(SCALING_OF_TRIPS * trip.length_in_kilometers)
-                    * vehicles_var.get((vehicle, trip))
-                    for trip in trips
-                )
+                cp_model.LinearExpr.WeightedSum(vehicle_var, trip_lengths)
                 <= int(SCALING_OF_TRIPS * vehicle.range_in_kilometers)
             )
             # Constraint for maximum uptime.
             model.Add(
-                sum(
-                    trip.get_trip_length_in_minutes()
-                    * vehicles_var.get((vehicle, trip))
-                    for trip in trips
-                )
+                cp_model.LinearExpr.WeightedSum(vehicle_var, trip_minutes)
                 <= vehicle.maximum_driving_in_minutes
             )
 
         log.debug("Created range constraints for each vehicle.")
 
-        # All objective terms.
-        objective_terms = []
-
-        for trip in trips:
-            # Add term for employee car.
-            objective_terms.append(
-                trip.length_in_kilometers
-                * (
-                    employee_car.variable_cost_per_kilometer
-                    + calculate_co2_emission_cost_per_kilometer_for_vehicle(
-                        employee_car, emission_cost_per_ton_co2
+        # Break the symmetry between identical vehicles, as swapping their routes gives an equally good solution.
+        # Within a group of identical vehicles, a vehicle drives at most as far as the previous vehicle in the group.
+        vehicle_groups = identical_vehicle_groups(vehicles) if break_symmetry else []
+        for group in vehicle_groups:
+            for previous, current in zip(group, group[1:]):
+                model.Add(
+                    cp_model.LinearExpr.WeightedSum(
+                        vehicles_var[previous], trip_lengths
+                    )
+                    >= cp_model.LinearExpr.WeightedSum(
+                        vehicles_var[current], trip_lengths
                     )
                 )
-                * employee_car_var.get(trip)
+
+        log.debug(
+            f"Created symmetry breaking constraints for {len(vehicle_groups)} groups of identical vehicles."
+        )
+
+        # The weighted cost per kilometer of the employee car and the vehicles.
+        employee_car_cost = (
+            employee_car.variable_cost_per_kilometer
+            + calculate_co2_emission_cost_per_kilometer_for_vehicle(
+                employee_car, emission_cost_per_ton_co2
+            )
+        )
+        vehicle_costs = [
+            vehicle.variable_cost_per_kilometer
+            + calculate_co2_emission_cost_per_kilometer_for_vehicle(
+                vehicle, emission_cost_per_ton_co2
             )
+            for vehicle in vehicles
+        ]
+
+        # All objective terms, as variables and their coefficients.
+        objective_vars = []
+        objective_coefficients = []
+
+        for j, trip in enumerate(trips):
+            # Add term for employee car.
+            objective_vars.append(employee_car_var[j])
+            objective_coefficients.append(trip.length_in_kilometers * employee_car_cost)
 
             # Add terms for all the other vehicles.
-            for vehicle in vehicles:
-                objective_terms.append(
-                    trip.length_in_kilometers
-                    * (
-                        vehicle.variable_cost_per_kilometer
-                        + calculate_co2_emission_cost_per_kilometer_for_vehicle(
-                            vehicle, emission_cost_per_ton_co2
-                        )
-                    )
-                    * vehicles_var.get((vehicle, trip))
-                )
+            for cost, vehicle_var in zip(vehicle_costs, vehicles_var):
+                objective_vars.append(vehicle_var[j])
+                objective_coefficients.append(trip.length_in_kilometers * cost)
 
-        model.Minimize(sum(objective_terms))
+        model.Minimize(
+            cp_model.LinearExpr.WeightedSum(objective_vars, objective_coefficients)
+        )
 
         log.debug("Created objective function.")
 
+        model_proto = model.Proto()
+        log.info(
+            f"Built SAT model with {len(model_proto.variables)} variables and {len(model_proto.constraints)} constraints "
+            f"for {len(trips)} trips and {len(vehicles)} vehicles in {time.perf_counter() - build_start:.3f} seconds."
+        )
+
+        # Start from the solution of the greedy algorithm.
+        if warm_start:
+            hint = greedy_warm_start(
+                trips,
+                vehicles,
+                employee_car,
+                vehicle_groups,
+                trip_lengths,
+                emission_cost_per_ton_co2,
+                time_limit_in_seconds,
+            )
+            if hint is not None:
+                for j in range(len(trips)):
+                    for i, vehicle_var in enumerate(vehicles_var):
+                        model.AddHint(vehicle_var[j], hint[j] == i)
+                    model.AddHint(employee_car_var[j], hint[j] is None)
+
         log.info("About to solve the optimization problem using the SAT solver.")
 
         solver = cp_model.CpSolver()
 
         solver.parameters.max_time_in_seconds = time_limit_in_seconds
+        # Stop when the solution is proven to be within the relative gap of the optimal solution.
+        if relative_gap is not None:
+            solver.parameters.relative_gap_limit = relative_gap
 
         status = solver.Solve(model)
 
@@ -176,9 +214,9 @@ class RoutingCp(RoutingAlgorithm):
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             log.info(f"Objective value was {solver.ObjectiveValue()}")
 
-            for trip in trips:
+            for j, trip in enumerate(trips):
                 # Check if trip was assigned to the employee car.
-                if solver.Value(employee_car_var.get(trip)):
+                if solver.Value(employee_car_var[j]):
                     log.debug(
                         f"Trip with id {trip.id} was assigned to the employee car."
                     )
@@ -186,8 +224,8 @@ class RoutingCp(RoutingAlgorithm):
                     # Go to next trip.
                     continue
 
-                for vehicle in vehicles:
-                    if solver.Value(vehicles_var.get((vehicle, trip))):
+                for vehicle, vehicle_var in zip(vehicles, vehicles_var):
+                    if solver.Value(vehicle_var[j]):
                         log.debug(
                             f"Trip with id {trip.id} was assigned to vehicle with id {vehicle.id}."
                         )
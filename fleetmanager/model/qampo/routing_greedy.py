@@ -4,6 +4,7 @@ the same as the algorithm in the overall project (IFFK) that simulates car assig
 import copy
 import datetime
 import logging
+from typing import Optional
 
 from .classes import BaseVehicle, RoutePlan, RoutingAlgorithm, Trip, Vehicle
 from .exceptions import NoSolutionFoundException
@@ -23,6 +24,7 @@ class RoutingGreedy(RoutingAlgorithm):
         employee_car: BaseVehicle,
         emission_cost_per_ton_co2: float = 1500,
         time_limit_in_seconds: int = 60,
+        relative_gap: Optional[float] = None,
     ) -> RoutePlan:
         """
         This is a simple greedy algorithm that assigns trips to vehicles based on a weight of the variable cost per kilometer and the CO2 emission. Greedily means that earliest trips are assigned first to the cheapest vehicle. time_limit_in_seconds specifies for how long, the algorithm is allowed to be run.
@@ -31,6 +33,7 @@ class RoutingGreedy(RoutingAlgorithm):
         :param employee_car: Employee car a trip can be assigned to.
         :param emission_cost_per_ton_co2: CO2 emission cost per ton for the entire route plan.
         :param time_limit_in_seconds: Time limit for the running time of the algorithm.
+        :param relative_gap: Not used by the greedy algorithm.
         :return Routing plan created after optimization has been performed.
         """
 
@@ -2,14 +2,18 @@
 (utilizing SCIP)."""
 
 import logging
+import time
+from typing import Optional
 
 from ortools.linear_solver import pywraplp
 
 from .classes import BaseVehicle, RoutePlan, RoutingAlgorithm, Trip, Vehicle
 from .cost_calculator import calculate_co2_emission_cost_per_kilometer_for_vehicle
 from .exceptions import NoSolutionFoundException
+from .helper_functions import identical_vehicle_groups, maximal_overlap_cliques
 from .routeplan_factory import route_plan_from_vehicle_trip_map
 from .validation import check_trips_only_has_single_date
+from .warm_start import greedy_warm_start
 
 # Initialize logger.
 log = logging.getLogger(__name__)
@@ -23,6 +27,9 @@ class RoutingMip(RoutingAlgorithm):
         employee_car: BaseVehicle,
         emission_cost_per_ton_co2: float = 1500,
         time_limit_in_seconds: int = 60,
+        relative_gap: Optional[float] = None,
+        warm_start: bool = True,
+        break_symmetry: bool = False,
     ) -> RoutePlan:
         """
         An exact MIP algorithm that will assign trips to vehicles based on a weight of the variable cost per kilometer and the CO2 emission.
@@ -32,6 +39,9 @@ class RoutingMip(RoutingAlgorithm):
         :param employee_car: Employee car a trip can be assigned to.
         :param emission_cost_per_ton_co2: CO2 emission cost per ton for the entire route plan.
         :param time_limit_in_seconds: Time limit for the running time of the algorithm.
+        :param relative_gap: Stop when the solution is within this relative gap of the optimal solution, e.g. 0.01 for 1%. The default gap of the solver is used if None.
+        :param warm_start: Whether the solver starts from the solution of the greedy algorithm.
+        :param break_symmetry: Whether to add constraints breaking the symmetry between identical vehicles. The solver detects the symmetry itself, which usually works better within a short time limit.
         :return Routing plan created after optimization has been performed.
         """
 
@@ -42,59 +52,46 @@ class RoutingMip(RoutingAlgorithm):
 
         log.debug("Checked trips input for being single day.")
 
+        build_start = time.perf_counter()
+
         # Create the mip solver with the SCIP backend.
         solver = pywraplp.Solver.CreateSolver("SCIP")
 
-        # Variables related to the normal vehicles.
-        vehicles_var = {}
-
-        for vehicle in vehicles:
-            for trip in trips:
-                # Binary variable that is 1 if the trip is assigned to the vehicle, otherwise 0.
-                vehicles_var[(vehicle, trip)] = solver.BoolVar(
-                    f"vehicle_{vehicle.id}_trip_{trip.id}"
-                )
+        # Variables related to the normal vehicles, vehicles_var[i][j] is the variable of vehicles[i] and trips[j].
+        # Binary variable that is 1 if the trip is assigned to the vehicle, otherwise 0.
+        vehicles_var = [
+            [
+                solver.BoolVar(f"vehicle_{vehicle.id}_trip_{trip.id}")
+                for trip in trips
+            ]
+            for vehicle in vehicles
+        ]
 
         log.debug("Created variables for normal vehicles.")
 
-        # Variables related to the employee car as this has some special logic later on.
-        employee_car_var = {}
-
-        for trip in trips:
-            # Binary variable that is 1 if the trip is assigned to the employee car, otherwise 0.
-            employee_car_var[trip] = solver.BoolVar(f"employee_car_trip_{trip.id}")
+        # Variables related to the employee car as this has some special logic later on, employee_car_var[j] is the variable of trips[j].
+        # Binary variable that is 1 if the trip is assigned to the employee car, otherwise 0.
+        employee_car_var = [
+            solver.BoolVar(f"employee_car_trip_{trip.id}") for trip in trips
+        ]
 
         log.debug("Created variables for employee car.")
 
         # Create constraints to ensure, a vehicle cannot serve overlapping trips.
-        for first_trip in trips:
-            for second_trip in trips:
-                # Do nothing if the trips are the same.
-                if first_trip == second_trip:
-                    continue
-
-                # Check if the two trips overlap in time.
-                # See https://stackoverflow.com/questions/325933/determine-whether-two-date-ranges-overlap
-                if max(first_trip.start_time, second_trip.start_time) < min(
-                    first_trip.end_time, second_trip.end_time
-                ):
-                    # An overlap is found. Add a constraint for each normal vehicle.
-                    for vehicle in vehicles:
-                        solver.Add(
-                            vehicles_var.get((vehicle, first_trip))
-                            + vehicles_var.get((vehicle, second_trip))
-                            <= 1
-                        )
+        # A vehicle can serve at most one trip of each set of trips running at the same time.
+        for clique in maximal_overlap_cliques(trips):
+            for vehicle_var in vehicles_var:
+                solver.Add(sum(vehicle_var[j] for j in clique) <= 1)
 
         log.debug(
             "Created constraints to ensure, overlapping trips are not assigned to the same vehicle."
         )
 
         # Create constraints to ensure, all trips are assigned to a vehicle (normal or employee car).
-        for trip in trips:
+        for j in range(len(trips)):
             solver.Add(
-                sum(vehicles_var.get((vehicle, trip)) for vehicle in vehicles)
-                + employee_car_var.get(trip)
+                sum(vehicle_var[j] for vehicle_var in vehicles_var)
+                + employee_car_var[j]
                 == 1
             )
 
@@ -102,61 +99,103 @@ class RoutingMip(RoutingAlgorithm):
             "Created constraints to ensure, each trip is assigned to a vehicle or employee car."
         )
 
+        trip_lengths = [trip.length_in_kilometers for trip in trips]
+        trip_minutes = [trip.get_trip_length_in_minutes() for trip in trips]
+
         # Create a constraint on the maximum range and the maximum uptime  for a vehicle.
-        for vehicle in vehicles:
+        for vehicle, vehicle_var in zip(vehicles, vehicles_var):
             # Constraint for maximum range.
             solver.Add(
-                sum(
-                    trip.length_in_kilometers * vehicles_var.get((vehicle, trip))
-                    for trip in trips
-                )
+                sum(length * var for length, var in zip(trip_lengths, vehicle_var))
                 <= vehicle.range_in_kilometers
             )
             # Constraint for maximum uptime.
             solver.Add(
-                sum(
-                    trip.get_trip_length_in_minutes()
-                    * vehicles_var.get((vehicle, trip))
-                    for trip in trips
-                )
+                sum(minutes * var for minutes, var in zip(trip_minutes, vehicle_var))
                 <= vehicle.maximum_driving_in_minutes
             )
 
         log.debug("Created range constraints for each vehicle.")
 
+        # Break the symmetry between identical vehicles, as swapping their routes gives an equally good solution.
+        # Within a group of identical vehicles, a vehicle drives at most as far as the previous vehicle in the group.
+        vehicle_groups = identical_vehicle_groups(vehicles) if break_symmetry else []
+        for group in vehicle_groups:
+            for previous, current in zip(group, group[1:]):
+                solver.Add(
+                    sum(
+                        length * (previous_var - current_var)
+                        for length, previous_var, current_var in zip(
+                            trip_lengths,
+                            vehicles_var[previous],
+                            vehicles_var[current],
+                        )
+                    )
+                    >= 0
+                )
+
+        log.debug(
+            f"Created symmetry breaking constraints for {len(vehicle_groups)} groups of identical vehicles."
+        )
+
+        # The weighted cost per kilometer of the employee car and the vehicles.
+        employee_car_cost = (
+            employee_car.variable_cost_per_kilometer
+            + calculate_co2_emission_cost_per_kilometer_for_vehicle(
+                employee_car, emission_cost_per_ton_co2
+            )
+        )
+        vehicle_costs = [
+            vehicle.variable_cost_per_kilometer
+            + calculate_co2_emission_cost_per_kilometer_for_vehicle(
+                vehicle, emission_cost_per_ton_co2
+            )
+            for vehicle in vehicles
+        ]
+
         # All objective terms.
         objective_terms = []
 
-        for trip in trips:
+        for j, length in enumerate(trip_lengths):
             # Add the terms for the employee car.
-            objective_terms.append(
-                trip.length_in_kilometers
-                * (
-                    employee_car.variable_cost_per_kilometer
-                    + calculate_co2_emission_cost_per_kilometer_for_vehicle(
-                        employee_car, emission_cost_per_ton_co2
-                    )
-                )
-                * employee_car_var.get(trip)
-            )
+            objective_terms.append(length * employee_car_cost * employee_car_var[j])
 
             # Add the terms for all the other vehicles.
-            for vehicle in vehicles:
-                objective_terms.append(
-                    trip.length_in_kilometers
-                    * (
-                        vehicle.variable_cost_per_kilometer
-                        + calculate_co2_emission_cost_per_kilometer_for_vehicle(
-                            vehicle, emission_cost_per_ton_co2
-                        )
-                    )
-                    * vehicles_var.get((vehicle, trip))
-                )
+            for cost, vehicle_var in zip(vehicle_costs, vehicles_var):
+                objective_terms.append(length * cost * vehicle_var[j])
 
         solver.Minimize(sum(objective_terms))
 
         log.debug("Created objective function.")
 
+        log.info(
+            f"Built MIP model with {solver.NumVariables()} variables and {solver.NumConstraints()} constraints "
+            f"for {len(trips)} trips and {len(vehicles)} vehicles in {time.perf_counter() - build_start:.3f} seconds."
+        )
+
+        # Start from the solution of the greedy algorithm.
+        if warm_start:
+            hint = greedy_warm_start(
+                trips,
+                vehicles,
+                employee_car,
+                vehicle_groups,
+                trip_lengths,
+                emission_cost_per_ton_co2,
+                time_limit_in_seconds,
+            )
+            if hint is not None:
+                solver.SetHint(
+                    [var for vehicle_var in vehicles_var for var in vehicle_var]
+                    + employee_car_var,
+                    [
+                        float(hint[j] == i)
+                        for i in range(len(vehicles))
+                        for j in range(len(trips))
+                    ]
+                    + [float(hint[j] is None) for j in range(len(trips))],
+                )
+
         log.info("About to solve the optimization problem using the MIP solver.")
 
         # This check is performed because 0 is treated as infinity in the C++ wrapper.
@@ -165,7 +204,14 @@ class RoutingMip(RoutingAlgorithm):
         else:
             solver.set_time_limit(time_limit_in_seconds * 1000)
 
-        status = solver.Solve()
+        # Stop when the solution is proven to be within the relative gap of the optimal solution.
+        solver_parameters = pywraplp.MPSolverParameters()
+        if relative_gap is not None:
+            solver_parameters.SetDoubleParam(
+                pywraplp.MPSolverParameters.RELATIVE_MIP_GAP, relative_gap
+            )
+
+        status = solver.Solve(solver_parameters)
 
         log.info(f"Optimization terminated with status {status}.")
 
@@ -176,9 +222,9 @@ class RoutingMip(RoutingAlgorithm):
         if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
             log.info(f"Objective value was {solver.Objective().Value()}.")
 
-            for trip in trips:
+            for j, trip in enumerate(trips):
                 # Check if trip was assigned to the employee car.
-                if employee_car_var.get(trip).solution_value() > 0.990:
+                if employee_car_var[j].solution_value() > 0.990:
                     log.debug(
                         f"Trip with id {trip.id} was assigned to the employee car."
                     )
@@ -187,8 +233,8 @@ class RoutingMip(RoutingAlgorithm):
                     # Go to next trip in the loop.
                     continue
 
-                for vehicle in vehicles:
-                    if vehicles_var.get((vehicle, trip)).solution_value() > 0.990:
+                for vehicle, vehicle_var in zip(vehicles, vehicles_var):
+                    if vehicle_var[j].solution_value() > 0.990:
                         log.debug(
                             f"Trip with id {trip.id} was assigned to vehicle with id {vehicle.id}."
                         )
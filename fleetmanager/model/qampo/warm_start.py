@@ -0,0 +1,74 @@
+""" This file defines the warm start of the exact algorithms from the solution of the greedy algorithm."""
+
+import logging
+from typing import Optional
+
+from .classes import BaseVehicle, Trip, Vehicle
+from .exceptions import NoSolutionFoundException
+from .routing_greedy import RoutingGreedy
+
+# Initialize logger.
+log = logging.getLogger(__name__)
+
+
+def greedy_warm_start(
+    trips: list[Trip],
+    vehicles: list[Vehicle],
+    employee_car: BaseVehicle,
+    vehicle_groups: list[list[int]],
+    trip_weights: list[float],
+    emission_cost_per_ton_co2: float = 1500,
+    time_limit_in_seconds: int = 60,
+) -> Optional[list[Optional[int]]]:
+    """
+    Runs the greedy algorithm and converts its route plan to a hint for the exact algorithms.
+    The routes of identical vehicles are swapped such that the hint satisfies the symmetry breaking constraints, i.e. within a group of identical vehicles the total weight of the trips is non-increasing.
+    :param trips: List of trips in the route plan.
+    :param vehicles: List of vehicles in the route plan.
+    :param employee_car: Employee car a trip can be assigned to.
+    :param vehicle_groups: Groups of identical vehicles as lists of positions in vehicles.
+    :param trip_weights: The weights of the trips used in the symmetry breaking constraints.
+    :param emission_cost_per_ton_co2: CO2 emission cost per ton for the entire route plan.
+    :param time_limit_in_seconds: Time limit for the running time of the greedy algorithm.
+    :return: For each trip the position of the vehicle serving it, None for the employee car. None if the greedy algorithm found no solution.
+    """
+    try:
+        route_plan = RoutingGreedy().optimize_single_day(
+            trips,
+            vehicles,
+            employee_car,
+            emission_cost_per_ton_co2,
+            time_limit_in_seconds,
+        )
+    except NoSolutionFoundException:
+        log.info("Greedy algorithm found no solution to warm start from.")
+        return None
+
+    trip_positions = {trip.id: j for j, trip in enumerate(trips)}
+    vehicle_positions = {vehicle.id: i for i, vehicle in enumerate(vehicles)}
+
+    # The positions of the trips served by each vehicle.
+    routes = [[] for _ in vehicles]
+    for assignment in route_plan.assignments:
+        routes[vehicle_positions[assignment.vehicle.id]] = [
+            trip_positions[trip.id] for trip in assignment.route.trips
+        ]
+
+    # Within each group, the route with the highest weight goes to the first vehicle.
+    for group in vehicle_groups:
+        group_routes = sorted(
+            (routes[i] for i in group),
+            key=lambda route: sum(trip_weights[j] for j in route),
+            reverse=True,
+        )
+        for i, route in zip(group, group_routes):
+            routes[i] = route
+
+    hint = [None] * len(trips)
+    for i, route in enumerate(routes):
+        for j in route:
+            hint[j] = i
+
+    log.info(f"Warm starting from greedy solution with cost {route_plan.total_cost}.")
+
+    return hint
@@ -25,8 +25,9 @@ from fleetmanager.model.model import (
     Trips,
 )
 from fleetmanager.model.tco_calculator import TCOCalculator
-from fleetmanager.model.trip_generator import extract_peak_day
-from fleetmanager.model.vehicle import Unassigned
+from fleetmanager.model.timing import timed_stage
+from fleetmanager.model.trip_generator import concurrency_profile, extract_peak_day
+from fleetmanager.model.vehicle import FleetPool
 
 
 class TabuSearch:
@@ -140,7 +141,10 @@ class TabuSearch:
         self.vehicle2id, self.id2vehicle, self.vehicle2type = self.mapper()
         self.best_objective_value = None
         self.report = None
+        # the fleets of the evaluated solutions, reset when a solution is evaluated again
+        self.fleets = FleetPool()
 
+    @timed_stage("tabu search")
     def run(self):
         """
         Method for handling the run of the tabu search. First calls the least_viable to get the least number of
@@ -516,15 +520,7 @@ class TabuSearch:
         ]
 
         if terminate:
-            chec = checked[terminate[0]]
-            while True:
-                _, _, twv = self.real_simulation([chec])
-                if twv == 0:
-                    break
-                chec += 1
-
-            new_solution = {vehicle: chec}
-            return True, new_solution
+            return True, self.confirm_breakpoint(vehicle, checked[terminate[0]])
         elif iteration > max_iter:
             return False, new_solution
 
@@ -552,6 +548,30 @@ class TabuSearch:
 
         return new_solution
 
+    def confirm_breakpoint(self, vehicle, count):
+        """
+        Increases the count of the vehicle until the simulation leaves no trips without vehicle
+        """
+        while True:
+            _, _, twv = self.real_simulation([count])
+            if twv == 0:
+                break
+            count += 1
+        return {vehicle: count}
+
+    def lower_bound(self):
+        """
+        The least number of vehicles that can drive the dummy trips, i.e. the peak number of simultaneous trips
+        including the sub_time of the vehicles. Timeslots do not use the sub_time.
+        """
+        trips = self.dummy_trips.trips
+        profile = concurrency_profile(
+            # unallocated trips without distance are not punished by calculate_slack
+            trips[trips.distance > 0],
+            sub_time=0 if self.use_timeslots else self.fleet_optimisation.settings["sub_time"],
+        )
+        return profile.peak
+
     def least_viable(self):
         """
         Method to control the least viability search to find the minimum vehicles needed to satisfy the number of
@@ -564,12 +584,23 @@ class TabuSearch:
         if self.fixed_antal:
             self.minimum_cars = self.fixed_antal
 
-        # construct the most expensive solution
-        most_expensive_solution = {self.cheap_list[0]: max_vehicles}
-        # find the minimum number of cars required to handle the driving requirement
-        breakpoint_found, self.breakpoint_solution = self.drivability_search(
-            most_expensive_solution, start=1
-        )
+        # a vehicle drives one trip at a time, hence the number of simultaneous trips bounds the vehicles needed
+        vehicle = self.cheap_list[0]
+        lower = self.lower_bound()
+        numbers_checked = None
+        if lower > 0 and self.driving_checking({vehicle: lower}):
+            breakpoint_found, self.breakpoint_solution = True, self.confirm_breakpoint(vehicle, lower)
+        else:
+            if lower > 0:
+                # search between the bound and the most expensive solution
+                numbers_checked = {lower: False}
+                max_vehicles = max(max_vehicles, lower + 1)
+            # construct the most expensive solution
+            most_expensive_solution = {vehicle: max_vehicles}
+            # find the minimum number of cars required to handle the driving requirement
+            breakpoint_found, self.breakpoint_solution = self.drivability_search(
+                most_expensive_solution, start=1, numbers_checked=numbers_checked
+            )
         breakpoint_el_found = None
         if breakpoint_found:
             # the least viable with electrical vehicles
@@ -621,8 +652,11 @@ class TabuSearch:
         -------
         bool    :   is solution able to satisfy the need with no unallocated trips
         """
-        fleet = self.fleet_optimisation.build_fleet_simulation(
-            solution, days=1, exception=True
+        fleet = self.fleets.get(
+            ("drivability", *sorted(solution.items())),
+            lambda: self.fleet_optimisation.build_fleet_simulation(
+                solution, days=1, exception=True
+            ),
         )
         simulation = Simulation(
             self.dummy_trips,
@@ -706,9 +740,9 @@ class TabuSearch:
         else:
             trip_set = self.total_trips
             n = len(trip_set.trips)
-        trip_set.trips["current"] = n * [Unassigned()]
+        trip_set.trips["current"] = -np.ones((n,), dtype=np.int32)
         trip_set.trips["current_type"] = n * [-1]
-        trip_set.trips["simulation"] = n * [Unassigned()]
+        trip_set.trips["simulation"] = -np.ones((n,), dtype=np.int32)
         trip_set.trips["simulation_type"] = n * [-1]
         if pd.isna(fleet):
             days = (
@@ -719,9 +753,13 @@ class TabuSearch:
                 / 3600
                 / 24
             )
-            solution = {self.id2vehicle[k]: count for k, count in enumerate(solution)}
-            fleet = self.fleet_optimisation.build_fleet_simulation(
-                solution, name=fleet_name, days=days
+            counts = tuple(solution)
+            solution = {self.id2vehicle[k]: count for k, count in enumerate(counts)}
+            fleet = self.fleets.get(
+                (fleet_name, small_set, days, *counts),
+                lambda: self.fleet_optimisation.build_fleet_simulation(
+                    solution, name=fleet_name, days=days
+                ),
             )
         simulation = Simulation(
             trip_set,
@@ -776,7 +814,7 @@ class TabuSearch:
             return None
         rt.trips.drop(["current", "current_type", "simulation", "simulation_type"], axis=1, inplace=True)
         rt.trips["tripid"] = rt.trips.index.values
-        rt.trips["fleetinventory"] = len(rt.trips) * [Unassigned()]
+        rt.trips["fleetinventory"] = -np.ones((len(rt.trips),), dtype=np.int32)
         rt.trips["fleetinventory_type"] = -np.ones((len(rt.trips),), dtype=int)
 
         if self.use_timeslots:  # is rarely used and much slower
@@ -801,7 +839,7 @@ class TabuSearch:
         peak_day["tripid"] = peak_day.index.values
         peak_day["id"] = peak_day.tripid
         peak_day[["start_location_id", "department"]] = 0
-        peak_day["fleetinventory"] = len(peak_day) * [Unassigned()]
+        peak_day["fleetinventory"] = -np.ones((len(peak_day),), dtype=np.int32)
         peak_day["fleetinventory_type"] = -np.ones((len(peak_day),), dtype=int)
         peak_day[
             [
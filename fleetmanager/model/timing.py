@@ -0,0 +1,175 @@
+"""
+Timing of the stages of the simulations. A stage records its wall time, cpu time, number of rows and the peak resident
+memory of the process when it ends. The stages are summed by name in the timings collected by collect_timings, which
+the celery tasks attach to the progress and the results of the simulations. Stages may be nested, the time of a
+nested stage is included in the enclosing stage. Outside collect_timings a stage records nothing.
+
+    with collect_timings() as timings:
+        with stage("load trips") as span:
+            trips = load_trips()
+            span.rows = len(trips)
+    timings.as_dict()
+"""
+import functools
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+openmetrics_content_type = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# name, unit, help and key of the stage measurement of the exported metrics
+openmetrics_families = [
+    ("fleetmanager_stage_wall_seconds", "seconds", "Wall time of the stage", "wall_seconds"),
+    ("fleetmanager_stage_cpu_seconds", "seconds", "Cpu time of the process during the stage", "cpu_seconds"),
+    ("fleetmanager_stage_calls", None, "Number of times the stage ran", "calls"),
+    ("fleetmanager_stage_rows", None, "Number of rows handled by the stage", "rows"),
+    ("fleetmanager_stage_peak_rss_bytes", "bytes", "Peak resident memory of the process after the stage", "peak_rss_bytes"),
+]
+
+_timings = ContextVar("timings", default=None)
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    The peak resident memory of the process
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """
+    A running stage, the stage can set the number of rows it handled
+    """
+
+    __slots__ = ("name", "rows")
+
+    def __init__(self, name: str, rows: int | None = None):
+        self.name = name
+        self.rows = rows
+
+
+class Timings:
+    """
+    The measurements of the stages summed by name, in the order the stages first ran
+    """
+
+    def __init__(self):
+        self.stages: dict[str, dict] = {}
+
+    def add(self, name: str, wall: float, cpu: float, rows: int | None, peak: int | None):
+        measurement = self.stages.setdefault(
+            name,
+            {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": None, "peak_rss_bytes": None},
+        )
+        measurement["calls"] += 1
+        measurement["wall_seconds"] += wall
+        measurement["cpu_seconds"] += cpu
+        if rows is not None:
+            measurement["rows"] = (measurement["rows"] or 0) + int(rows)
+        if peak is not None:
+            measurement["peak_rss_bytes"] = max(measurement["peak_rss_bytes"] or 0, peak)
+
+    def as_dict(self) -> dict[str, dict]:
+        return {
+            name: {
+                **measurement,
+                "wall_seconds": round(measurement["wall_seconds"], 4),
+                "cpu_seconds": round(measurement["cpu_seconds"], 4),
+            }
+            for name, measurement in self.stages.items()
+        }
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collects the timings of the stages that run in the context
+    """
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings() -> dict[str, dict] | None:
+    """
+    The timings collected so far, None outside collect_timings
+    """
+    timings = _timings.get()
+    return None if timings is None else timings.as_dict()
+
+
+@contextmanager
+def stage(name: str, rows: int | None = None):
+    """
+    Times the stage, yields the span of the stage
+    """
+    span = Span(name, rows)
+    timings = _timings.get()
+    if timings is None:
+        yield span
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield span
+    finally:
+        timings.add(
+            name, time.perf_counter() - wall, time.process_time() - cpu, span.rows, peak_rss_bytes()
+        )
+
+
+def timed_stage(name: str, rows: Callable[..., int] | None = None):
+    """
+    Times the calls of the decorated function as the stage, the number of rows is counted from the returned value
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name) as span:
+                result = function(*args, **kwargs)
+                if rows is not None:
+                    span.rows = rows(result)
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def openmetrics(timings: dict[str, dict], **labels: str) -> str:
+    """
+    The timings in the OpenMetrics text format, the labels are added to every sample
+    """
+
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    lines = []
+    for family, unit, description, key in openmetrics_families:
+        lines.append(f"# TYPE {family} gauge")
+        if unit is not None:
+            lines.append(f"# UNIT {family} {unit}")
+        lines.append(f"# HELP {family} {description}.")
+        for name, measurement in timings.items():
+            if measurement.get(key) is None:
+                continue
+            sample_labels = ",".join(
+                f'{label}="{escape(value)}"' for label, value in {**labels, "stage": name}.items()
+            )
+            lines.append(f"{family}{{{sample_labels}}} {measurement[key]}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
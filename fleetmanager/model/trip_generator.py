@@ -10,6 +10,7 @@ from sqlalchemy.engine.base import Engine
 
 from fleetmanager.data_access.db_engine import engine_creator
 from fleetmanager.data_access.dbschema import RoundTrips, RoundTripSegments
+from fleetmanager.model.timing import timed_stage
 
 
 def generate_trips_simulation(
@@ -183,7 +184,85 @@ def extract_peak_day(data):
     return pd.DataFrame(peak_day)
 
 
-def __simulate_avg_day(data, seed, padding):
+@dataclass
+class ConcurrencyProfile:
+    """
+    peak        :   the maximum number of trips running at the same time
+    peak_time   :   the first time the peak is reached, None if there are no trips
+    daily       :   the maximum number of simultaneous trips per date
+    """
+
+    peak: int
+    peak_time: datetime | None
+    daily: pd.Series
+
+
+def concurrency_profile(data: pd.DataFrame, sub_time: float = 0, segments: bool = False) -> ConcurrencyProfile:
+    """
+    Computes the number of simultaneous trips with a sweep line over the start and end times of the trips.
+    A vehicle can only drive one trip at a time, so the peak is a lower bound for the number of vehicles needed to
+    drive the trips. For identical vehicles without range restrictions the bound is exact.
+
+    Parameters
+    ----------
+    data        :   trips with start_time and end_time, and trip_segments if segments is set
+    sub_time    :   minutes a vehicle is unavailable after a trip, a trip starting at or before the end of the
+                    previous trip plus sub_time counts as overlapping
+    segments    :   use the segments of the roundtrips instead of the roundtrips, such that the time between the
+                    segments does not count as driving
+
+    Returns
+    -------
+    ConcurrencyProfile
+    """
+    if segments and "trip_segments" in data.columns:
+        intervals = [
+            (segment["start_time"], segment["end_time"])
+            for row in data.itertuples()
+            for segment in (
+                row.trip_segments
+                if isinstance(row.trip_segments, list) and len(row.trip_segments) > 0
+                else [{"start_time": row.start_time, "end_time": row.end_time}]
+            )
+        ]
+        start_times = pd.to_datetime(pd.Series([start for start, _ in intervals], dtype=object))
+        end_times = pd.to_datetime(pd.Series([end for _, end in intervals], dtype=object))
+    else:
+        start_times = pd.to_datetime(data["start_time"])
+        end_times = pd.to_datetime(data["end_time"])
+
+    if len(start_times) == 0:
+        return ConcurrencyProfile(peak=0, peak_time=None, daily=pd.Series(dtype=int))
+
+    starts = start_times.values.astype("datetime64[ns]")
+    ends = (end_times + pd.Timedelta(minutes=sub_time)).values.astype("datetime64[ns]")
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([np.ones(len(starts), dtype=int), -np.ones(len(ends), dtype=int)])
+    # starts go before ends at the same time, since a vehicle is not available at the end of its trip
+    order = np.lexsort((-deltas, times))
+    times = times[order]
+    levels = np.cumsum(deltas[order])
+
+    peak_index = int(np.argmax(levels))
+
+    # the maximum per date is the level carried over from the previous date or the maximum reached on the date
+    dates = pd.date_range(
+        pd.Timestamp(times[0]).normalize(), pd.Timestamp(times[-1]).normalize(), freq="D"
+    )
+    carried = np.searchsorted(times, dates.values, side="left") - 1
+    carried_levels = np.where(carried >= 0, levels[np.maximum(carried, 0)], 0)
+    daily = pd.Series(levels, index=pd.DatetimeIndex(times).normalize()).groupby(level=0).max()
+    daily = daily.reindex(dates, fill_value=0)
+    daily = pd.Series(np.maximum(daily.values, carried_levels), index=dates.date, name="concurrency")
+
+    return ConcurrencyProfile(
+        peak=int(levels[peak_index]),
+        peak_time=pd.Timestamp(times[peak_index]).to_pydatetime(),
+        daily=daily,
+    )
+
+
+def __simulate_avg_day(data, seed, padding, day_start=None):
     grouped_start_time = data.groupby([data["start_time"].dt.date])
     # Add 20% to compensate for missing trips in database
     avg_trips_pr_day = round(grouped_start_time.size().mean() * padding)
@@ -240,8 +319,12 @@ def __simulate_avg_day(data, seed, padding):
 
     simulated_day = []
 
+    # the simulated day is placed a year ahead unless the day is given, e.g. for reproducible trips
+    if day_start is None:
+        day_start = datetime.now() + timedelta(days=365)
+
     for i in range(avg_trips_pr_day):
-        start_time = datetime.now() + timedelta(days=365, minutes=new_start_times[i])
+        start_time = day_start + timedelta(minutes=new_start_times[i])
         end_time = start_time + timedelta(minutes=new_distances[i] * km_pr_min)
         simulated_day.append(
             {
@@ -255,6 +338,7 @@ def __simulate_avg_day(data, seed, padding):
     return simulated_day
 
 
+@timed_stage("shiftify", rows=len)
 def shiftify(roundtrips, shifts):
     def create_aggregate(routes):
         use_trip_segment = True if "trip_segments" in routes[0]._asdict() else False
@@ -549,6 +633,7 @@ def alternate(row, ssh=time(hour=7), seh=time(hour=15)):
     return time.total_seconds()
 
 
+@timed_stage("kilometer per hour", rows=len)
 def get_kilometer_per_hour(roundtrip_frame, engine):
     batch_size = 2000
 
@@ -1,4 +1,9 @@
 import datetime
+import hashlib
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Callable
 
 import numpy as np
 import pandas as pd
@@ -7,6 +12,7 @@ from sqlalchemy.orm.query import Query
 
 from fleetmanager.data_access import Cars, FuelTypes, VehicleTypes, engine_creator
 from fleetmanager.model.tco_calculator import TCOCalculator
+from fleetmanager.model.timing import timed_stage
 
 # initialise global mappers
 vehicle_mapping = {
@@ -18,6 +24,211 @@ vehicle_mapping = {
 }
 
 
+# the unit costs by the TCOCalculator parameters of the vehicle specifications, the costs are shared by the vehicles
+# of a specification across the fleets
+_unit_costs: OrderedDict[tuple, tuple[float, float]] = OrderedDict()
+_unit_costs_lock = threading.Lock()
+unit_costs_size = 1024
+
+
+def unit_costs(**parameters) -> tuple[float, float]:
+    """
+    The variable cost pr. km and the gram CO2e pr. km of a vehicle specification, from the TCOCalculator on 10000 km
+    in one year. The parameters are the TCOCalculator parameters that specify the vehicle, e.g. drivmiddel and
+    braendstofforbrug. The costs are computed once per specification.
+    """
+    key = tuple(
+        sorted(
+            (name, "nan" if isinstance(value, float) and value != value else value)
+            for name, value in parameters.items()
+        )
+    )
+    with _unit_costs_lock:
+        if key in _unit_costs:
+            _unit_costs.move_to_end(key)
+            return _unit_costs[key]
+
+    tco = TCOCalculator(
+        koerselsforbrug=10000,
+        antal=1,
+        evalueringsperiode=1,
+        fremskrivnings_aar=0,
+        **parameters,
+    )
+    costs = tco.tco_average / 10000, tco.ekstern_miljoevirkning(sum_it=True)[0] * 100
+
+    with _unit_costs_lock:
+        _unit_costs[key] = costs
+        while len(_unit_costs) > unit_costs_size:
+            _unit_costs.popitem(last=False)
+    return costs
+
+
+class SlotBookings:
+    """
+    The bookings of a vehicle in the time slots, kept as the sorted disjoint intervals of slots booked by a trip
+    instead of an array with a trip id per slot. Indexing a slot gives the booked trip id like the array, 0 if the
+    slot is free. Booking trip id 0 frees the slots, as writing 0 to the array did.
+    """
+
+    __slots__ = ("slots", "starts", "ends", "trip_ids")
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.starts = []
+        self.ends = []
+        self.trip_ids = []
+
+    def __len__(self):
+        return self.slots
+
+    def __getitem__(self, slot: int) -> int:
+        k = bisect_right(self.starts, slot) - 1
+        return self.trip_ids[k] if k >= 0 and self.ends[k] >= slot else 0
+
+    def overlapping(self, start: int, end: int) -> tuple[int, int]:
+        """The range of the intervals that overlap the slots from start to end, both included"""
+        return bisect_left(self.ends, start), bisect_right(self.starts, end)
+
+    def booked(self, start: int, end: int) -> bool:
+        """True if any of the slots from start to end, both included, is booked"""
+        end = min(end, self.slots - 1)
+        if end < start:
+            return False
+        first, last = self.overlapping(start, end)
+        return first < last
+
+    def book(self, start: int, end: int, trip_id: int):
+        """Books the slots from start to end, both included, to the trip"""
+        end = min(end, self.slots - 1)
+        if end < start:
+            return
+        first, last = self.overlapping(start, end)
+        intervals = []
+        if first < last and self.starts[first] < start:
+            intervals.append((self.starts[first], start - 1, self.trip_ids[first]))
+        if int(trip_id) > 0:
+            intervals.append((start, end, int(trip_id)))
+        if first < last and self.ends[last - 1] > end:
+            intervals.append((end + 1, self.ends[last - 1], self.trip_ids[last - 1]))
+        self.starts[first:last] = [interval[0] for interval in intervals]
+        self.ends[first:last] = [interval[1] for interval in intervals]
+        self.trip_ids[first:last] = [interval[2] for interval in intervals]
+
+
+def time_of_day(times: pd.Series) -> np.ndarray:
+    """The time since midnight of the timestamps as timedelta64"""
+    return (times - times.dt.normalize()).to_numpy()
+
+
+def epoch_seconds(times) -> np.ndarray:
+    """
+    The timestamps as float seconds since the epoch. The timestamps are taken in microseconds, so whole seconds are
+    exact and the differences are the total_seconds of the timedeltas
+    """
+    return np.asarray(times, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def encode_segments(segments: list) -> np.ndarray:
+    """
+    The trip segments as an array with a row of start times, end times and distances, the times as epoch_seconds
+    """
+    return np.array(
+        [
+            epoch_seconds([segment.get("start_time") for segment in segments]),
+            epoch_seconds([segment.get("end_time") for segment in segments]),
+            [segment.get("distance") for segment in segments],
+        ],
+        dtype=float,
+    ).reshape(3, len(segments))
+
+
+def trip_epoch(trip) -> tuple[float, float]:
+    """The start and end of the trip as epoch_seconds, encoded by Trips.encode_times or from the timestamps"""
+    start = getattr(trip, "epoch_start", None)
+    if start is None or pd.isna(start):
+        return tuple(epoch_seconds([trip.start_time, trip.end_time]).tolist())
+    return float(start), float(trip.epoch_end)
+
+
+def within_time_slots(trips: pd.DataFrame, time_slots: list) -> np.ndarray:
+    """
+    Vectorised check of the trips starting and ending within one of the time slots
+
+    parameters
+    ----------
+    trips : frame of trips with start_time and end_time
+    time_slots : list of (start, end) datetimes of which only the time of day is used
+
+    returns
+    -------
+    numpy boolean array, True if the trip is within one of the slots
+    """
+    start = time_of_day(trips.start_time)
+    end = time_of_day(trips.end_time)
+    within = np.zeros(len(trips), dtype=bool)
+    for slot_start, slot_end in time_slots:
+        slot_start, slot_end = (
+            np.timedelta64(
+                datetime.datetime.combine(datetime.date.min, t.time())
+                - datetime.datetime.min
+            )
+            for t in (slot_start, slot_end)
+        )
+        within |= (
+            (start >= slot_start)
+            & (start <= slot_end)
+            & (end <= slot_end)
+            & (end >= slot_start)
+        )
+    return within
+
+
+def bike_acceptance(trips: pd.DataFrame, bike, speed: float) -> np.ndarray:
+    """
+    Vectorised static acceptance of trips on a bike, i.e. the duration, distance, speed and time slot rules
+
+    parameters
+    ----------
+    trips : frame of trips with start_time, end_time, distance and km/h
+    bike : Bike or ElectricBike with the bike settings
+    speed : the speed of the bike
+
+    returns
+    -------
+    numpy boolean array, True if the bike can accept the trip with enough mileage left
+    """
+    duration = (trips.end_time - trips.start_time).dt.total_seconds().to_numpy() / 3600
+    accept = ~(duration > bike.max_time_slot) & (
+        trips.distance.to_numpy() < bike.max_distance_pr_trip
+    )
+    if not bike.skip_kmh_check:
+        accept &= trips["km/h"].to_numpy() < speed
+    return accept & within_time_slots(trips, bike.allowed_driving_time_slots)
+
+
+def bike_accepts(trip, bike, speed: float) -> bool:
+    """Static acceptance of a single trip on a bike, see bike_acceptance"""
+    if (trip.end_time - trip.start_time).total_seconds() / 3600 > bike.max_time_slot:
+        return False
+    if not (
+        trip.distance < bike.max_distance_pr_trip
+        and (bike.skip_kmh_check or trip["km/h"] < speed)
+    ):
+        return False
+    for start, end in bike.allowed_driving_time_slots:
+        if all(
+            [
+                trip.start_time.time() >= start.time(),
+                trip.start_time.time() <= end.time(),
+                trip.end_time.time() <= end.time(),
+                trip.end_time.time() >= start.time(),
+            ]
+        ):
+            return True
+    return False
+
+
 class VehicleModel:
     """General vehicle model. Not directly instantiated but specific vehicle models inherit from it"""
 
@@ -30,14 +241,22 @@ class VehicleModel:
     vehicle_type_number = None
     yearly_set = False
     sub_time = 1
+    timestamps = None
 
     def __init__(self, name=None, vehicle_id=None):
         self.vehicle_id = vehicle_id
-        self.timeslots = []
         self.name = name
         self.days = 0
-        self.end_time = datetime.datetime(year=1900, month=1, day=1)
         self.timedelta = datetime.timedelta(minutes=self.sub_time)
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the bookings of the vehicle, such that it can be simulated again without being rebuilt. The
+        specification of the vehicle, the class attributes and the costs derived from them, is kept.
+        """
+        self.end_time = datetime.datetime(year=1900, month=1, day=1)
+        self.timeslots = [] if self.timestamps is None else SlotBookings(len(self.timestamps))
 
     def set_timestamps(self, new_timestamps):
         """Initailize timeslot of vehicle to match timestamps.
@@ -49,7 +268,7 @@ class VehicleModel:
         self.timestamps = new_timestamps
 
         # initialise timeslots here
-        self.timeslots = np.zeros((len(self.timestamps),), dtype=int)
+        self.timeslots = SlotBookings(len(self.timestamps))
         self.days = (
             (
                 self.timestamps[-1].to_timestamp() - self.timestamps[0].to_timestamp()
@@ -58,12 +277,14 @@ class VehicleModel:
             / 24
         )
 
-    def book_trip(self, trip, use_slot=True):
+    def book_trip(self, trip, use_slot=True, eligible=None):
         """Function for trying to book trip on vehicle
 
         parameters
         ----------
         trip : pandas row with a trip
+        use_slot : book in the timeslots of the vehicle, otherwise the end time of the last booked trip is used
+        eligible : the static acceptance of the trip from Trips.static_acceptance, checked in place if None
 
         returns
         -------
@@ -75,7 +296,7 @@ class VehicleModel:
         # the vehicle can perform this trip and 'available' is true if it is available in this
 
         # test acceptance of trip
-        accept = self.accept_trip(trip)
+        accept = self.accept_trip(trip, eligible)
         if use_slot:
             try:
                 start_slot = int(trip.start_slot)
@@ -93,10 +314,7 @@ class VehicleModel:
 
             # lookup in timeslots list
             try:
-                if any(self.timeslots[start_slot : (end_slot + 1)] > 0):
-                    available = False
-                else:
-                    available = True
+                available = not self.timeslots.booked(start_slot, end_slot)
             except:
                 print(start_slot)
                 print(end_slot)
@@ -105,13 +323,12 @@ class VehicleModel:
             # collect and book
             if accept and available:
                 # vehicle accept trip and vehicle available
-                self.timeslots[start_slot : (end_slot + 1)] = trip.tripid
+                self.timeslots.book(start_slot, end_slot, trip.tripid)
                 return True, accept, available
             else:
                 # vehicle not available or cannot accept trip
                 if accept and self.vehicle_type_number in [1, 2, 3]:
-                    self.trips.pop(-1)
-                    self.milage_left += trip.distance
+                    self.release_trip(trip)
                 if accept and self.vehicle_type_number in [0, 1]:
                     self.counter -= trip.distance
                 return False, accept, available
@@ -126,8 +343,7 @@ class VehicleModel:
                 return True, accept, available
             else:
                 if accept and self.vehicle_type_number in [1, 2, 3]:
-                    self.trips.pop(-1)
-                    self.milage_left += trip.distance
+                    self.release_trip(trip)
                 if accept and self.vehicle_type_number in [0, 1]:
                     self.counter -= trip.distance
                 return False, accept, available
@@ -136,19 +352,52 @@ class VehicleModel:
         if use_slot:
             start_slot = int(trip.start_slot)
             end_slot = int(trip.end_slot)
-            self.timeslots[start_slot : (end_slot + 1)] = trip.tripid
+            self.timeslots.book(start_slot, end_slot, trip.tripid)
         return True, True, True
 
-    def accept_trip(self, trip):
+    def release_trip(self, trip):
+        """Releases the last accepted trip, when the vehicle accepted the trip but was not available for it
+
+        parameters
+        ----------
+        trip : pandas row with the trip that was accepted last
+        """
+        self.trips.pop(-1)
+        self.milage_left += trip.distance
+
+    def accept_trip(self, trip, eligible=None):
         """function that returns true if the given type of trip is possible for the vehicle given length, duration,
         milage_left should be overwritten for each type of vehicle
 
         parameters
         ----------
         trip : pandas row with a trip
+        eligible : the static acceptance of the trip from static_acceptance, checked in place if None
         """
         return True
 
+    def acceptance_key(self):
+        """
+        Key of the settings that the static acceptance of trips depends on, vehicles with equal keys accept the same
+        trips. None if the vehicle has no static rules.
+        """
+        return None
+
+    def static_acceptance(self, trips):
+        """
+        Vectorised acceptance of the rules that only depend on the trip and the settings of the vehicle, i.e. not on the
+        trips booked on the vehicle. Should be overwritten along with acceptance_key.
+
+        parameters
+        ----------
+        trips : pandas frame of trips
+
+        returns
+        -------
+        numpy boolean array, True if the vehicle may accept the trip
+        """
+        return np.ones(len(trips), dtype=bool)
+
     def percentage_accept(self):
         """
         Method that ensures that bike trips accepted gets as close to the input percentage as possible
@@ -198,25 +447,23 @@ class Car(VehicleModel):
         if pd.isna("co2emission_per_km") is False:
             self.co2emission_per_km = getattr(self, "co2_pr_km")
 
-        tco = TCOCalculator(
-            koerselsforbrug=10000,
+        self.vcprkm, self.qampo_gr = unit_costs(
             drivmiddel=self.fuel,
             bil_type=self.fuel,
-            antal=1,
-            evalueringsperiode=1,
-            fremskrivnings_aar=0,
             braendstofforbrug=self.wltp_fossil,
             elforbrug=0,
             leasingydelse=0,
         )
-        self.vcprkm = tco.tco_average / 10000
-        self.qampo_gr = tco.ekstern_miljoevirkning(sum_it=True)[0] * 100
 
         if pd.isna(getattr(self, "km_aar")) is False:
             self.yearly_allowance = getattr(self, "km_aar") * 1.15
             self.yearly_set = True
 
-    def accept_trip(self, trip):
+    def reset(self):
+        super().reset()
+        self.counter = 0
+
+    def accept_trip(self, trip, eligible=None):
         """
         Returns true if the trip is accepted, and false if the yearly_set is true and the yearly_allowance is exceeded
         """
@@ -262,75 +509,87 @@ class ElectricCar(VehicleModel):
             self.yearly_allowance = getattr(self, "km_aar") * 1.15
             self.yearly_set = True
 
-        self.milage_left = self.max_distance_per_day
-        self.trips = []
+        self.reset()
 
-        tco = TCOCalculator(
-            koerselsforbrug=10000,
+        self.vcprkm, self.qampo_gr = unit_costs(
             drivmiddel="el",
             bil_type="el",
-            antal=1,
-            evalueringsperiode=1,
-            fremskrivnings_aar=0,
             braendstofforbrug=0,
             elforbrug=self.wltp_el,
             leasingydelse=0,
         )
-        self.vcprkm = tco.tco_average / 10000
-        self.qampo_gr = tco.ekstern_miljoevirkning(sum_it=True)[0] * 100
 
-    def accept_trip(self, trip):
+    def reset(self):
+        super().reset()
+        self.milage_left = self.max_distance_per_day
+        self.trips = []
+        self.reset_time = None
+        self.idle = 0
+        self.overlaps = 0
+        self.counter = 0
+
+    def acceptance_key(self):
+        return ElectricCar, self.sleep
+
+    def static_acceptance(self, trips):
+        """The trip alone leaves the vehicle idle for at least self.sleep hours of the 24 hours from its start"""
+        duration = (trips.end_time - trips.start_time).dt.total_seconds().to_numpy()
+        return ((24 * 3600) - duration) / 3600 > self.sleep
+
+    def accept_trip(self, trip, eligible=None):
         """
         Returns true if the trip is accepted, and false if its declined
         The electrical car will only accept if the following is true
             distance for trip must be less than milage left
             vehicle must still be idle for at least self.sleep hours pr. 24 hours
+
+        The rest state of the period, the reset time, the idle time between the trips and the overlaps, is kept
+        incrementally in seconds since the epoch, see epoch_seconds, such that the trip is checked without
+        revisiting the trips of the period.
         """
-        # todo trip related segments determine the acceptance if the trip exceed 24 - sleep hours
-        # todo for new rt, check when it was last used..
+        start, end = trip_epoch(trip)
         segment_trip_check = False
         time_good = True
-        if len(self.trips):
-            start_of_period = self.trips[0]
-            if (trip.start_time - start_of_period[0]).days >= 1:
-                # reset the milage and the trips record
-                self.milage_left = self.max_distance_per_day
-                self.trips = []
+        if len(self.trips) and start - self.reset_time >= 24 * 3600:
+            # reset the milage and the trips record
+            self.milage_left = self.max_distance_per_day
+            self.trips = []
 
         if len(self.trips):
             # check that the car can sleep at least 7 hours from last reset
             # hours when the car has been idle
-            idles = [
-                (forward[0] - current[1]).total_seconds() / 3600
-                for forward, current in zip(
-                    self.trips[1:] + [(trip.start_time, None)], self.trips
-                )
-            ]
+            wait = start - self.trips[-1][1]
             # indication if the route begins before last end
-            if any([time < 0 for time in idles]):
+            if self.overlaps or wait < 0:
                 time_good = False
-            in_between_wait = sum(idles)
-            start = self.trips[0][0]
-            timeleft = ((24 * 3600) - (trip.end_time - start).total_seconds()) / 3600
+            in_between_wait = (self.idle + wait) / 3600
+            timeleft = ((24 * 3600) - (end - self.reset_time)) / 3600
             if in_between_wait + timeleft < self.sleep:
                 time_good = False
-        else:
-            timeleft = ((24 * 3600) - (trip.end_time - trip.start_time).total_seconds()) / 3600
+        elif eligible is None:
+            timeleft = ((24 * 3600) - (end - start)) / 3600
             time_good = timeleft > self.sleep
+        else:
+            time_good = bool(eligible)
         # if the trip distance is greater than the milage left or trip duration is longer than max allowed trip duration
 
         if hasattr(trip, "trip_segments") and trip.distance > self.milage_left or time_good is False:
             segment_trip_check = True
-            total_travelled = 0
+
+            segments = getattr(trip, "epoch_segments", None)
+            if not isinstance(segments, np.ndarray):
+                segments = encode_segments(trip.trip_segments)
+            segment_start, segment_end, segment_distance = segments
+            # the car is recharged if it is idle for more than self.sleep hours between the segments
+            recharged = ((segment_start[1:] - segment_end[:-1]) / 3600 > self.sleep).tolist() + [False]
 
             temporary_km_left = self.milage_left
-            for k, segment in enumerate(trip.trip_segments):
-                if temporary_km_left - segment.get("distance") < 0:
+            for distance, recharge in zip(segment_distance.tolist(), recharged):
+                if temporary_km_left - distance < 0:
                     return False
 
-                temporary_km_left -= segment.get("distance")
-                total_travelled += segment.get("distance")
-                if k != len(trip.trip_segments) - 1 and (trip.trip_segments[k+1].get("start_time") - segment.get("end_time")).total_seconds() / 3600 > self.sleep:
+                temporary_km_left -= distance
+                if recharge:
                     temporary_km_left = self.max_distance_per_day
 
             self.milage_left = temporary_km_left
@@ -344,13 +603,29 @@ class ElectricCar(VehicleModel):
                     return False
             if segment_trip_check is False:
                 self.milage_left = self.milage_left - trip.distance
-            self.trips.append((trip.start_time, trip.end_time))
+            if len(self.trips):
+                wait = start - self.trips[-1][1]
+                self.idle += wait
+                self.overlaps += wait < 0
+            else:
+                self.reset_time = start
+                self.idle = 0
+                self.overlaps = 0
+            self.trips.append((start, end))
             self.counter += trip.distance
             return True
         else:
             # trip is too long to accept or timing not good
             return False
 
+    def release_trip(self, trip):
+        start, end = self.trips.pop(-1)
+        if len(self.trips):
+            wait = start - self.trips[-1][1]
+            self.idle -= wait
+            self.overlaps -= wait < 0
+        self.milage_left += trip.distance
+
 
 class Bike(VehicleModel):
     """Class for representing a bike"""
@@ -373,12 +648,28 @@ class Bike(VehicleModel):
         # todo update to := notation
         if pd.isna(getattr(self, "bike_speed")) is False:
             self.bike_speed = getattr(self, "bike_speed")
+        self.reset()
+        self.percentage /= 100
+
+    def reset(self):
+        super().reset()
         self.milage_left = self.max_distance_per_day
         self.trips = []
         self.accept_record = []
-        self.percentage /= 100
 
-    def accept_trip(self, trip):
+    def acceptance_key(self):
+        return (
+            Bike,
+            self.max_time_slot,
+            self.max_distance_pr_trip,
+            None if self.skip_kmh_check else self.bike_speed,
+            tuple(tuple(time_slot) for time_slot in self.allowed_driving_time_slots),
+        )
+
+    def static_acceptance(self, trips):
+        return bike_acceptance(trips, self, self.bike_speed)
+
+    def accept_trip(self, trip, eligible=None):
         """
         Returns true if the trip is accepted, and false if its declined
         The bike will only accept if the following is true
@@ -392,37 +683,19 @@ class Bike(VehicleModel):
                 self.milage_left = self.max_distance_per_day
                 self.trips = []
 
-        if (
-            trip.end_time - trip.start_time
-        ).total_seconds() / 3600 > self.max_time_slot:
-            return False
-        elif (
-            trip.distance < self.max_distance_pr_trip
-            and self.milage_left - trip.distance > 0
-            and (self.skip_kmh_check or trip["km/h"] < self.bike_speed)
-        ):
-            for start, end in self.allowed_driving_time_slots:
-                if all(
-                    [
-                        trip.start_time.time() >= start.time(),
-                        trip.start_time.time() <= end.time(),
-                        trip.end_time.time() <= end.time(),
-                        trip.end_time.time() >= start.time(),
-                    ]
-                ):
-                    accepted = self.percentage_accept()
-                    self.accept_record.append(accepted)
-                    if accepted:
-                        self.milage_left = self.milage_left - trip.distance
-                        self.trips.append((trip.start_time, trip.end_time))
-                        return True
-                    else:
-                        return False
-            return False
-        else:
-            # trip is too long to accept
+        if eligible is None:
+            eligible = bike_accepts(trip, self, self.bike_speed)
+        if not eligible or not self.milage_left - trip.distance > 0:
+            # trip is too long to accept or outside the allowed time slots
             return False
 
+        accepted = self.percentage_accept()
+        self.accept_record.append(accepted)
+        if accepted:
+            self.milage_left = self.milage_left - trip.distance
+            self.trips.append((trip.start_time, trip.end_time))
+        return accepted
+
 
 class ElectricBike(VehicleModel):
     """Class for representing an electric bike"""
@@ -444,19 +717,34 @@ class ElectricBike(VehicleModel):
             self.max_distance_per_day = getattr(self, "range")
         if pd.isna(getattr(self, "electrical_bike_speed")) is False:
             self.electrical_bike_speed = getattr(self, "electrical_bike_speed")
+        self.reset()
+        self.percentage /= 100
+
+    def reset(self):
+        super().reset()
         self.milage_left = self.max_distance_per_day
         self.trips = []
         self.accept_record = []
-        self.percentage /= 100
 
-    def accept_trip(self, trip):
+    def acceptance_key(self):
+        return (
+            ElectricBike,
+            self.max_time_slot,
+            self.max_distance_pr_trip,
+            None if self.skip_kmh_check else self.electrical_bike_speed,
+            tuple(tuple(time_slot) for time_slot in self.allowed_driving_time_slots),
+        )
+
+    def static_acceptance(self, trips):
+        return bike_acceptance(trips, self, self.electrical_bike_speed)
+
+    def accept_trip(self, trip, eligible=None):
         """
         Returns true if the trip is accepted, and false if its declined
         The bike will only accept if the following is true
             distance for trip must be less than milage left
             trip start - and end time must be within the allowed driving slot
         """
-        # accept if enough km left on car
         if len(self.trips):
             start_of_period = self.trips[0]
             if (trip.start_time - start_of_period[0]).days >= 1:
@@ -464,37 +752,19 @@ class ElectricBike(VehicleModel):
                 self.milage_left = self.max_distance_per_day
                 self.trips = []
 
-        if (
-            trip.end_time - trip.start_time
-        ).total_seconds() / 3600 > self.max_time_slot:
-            return False
-        elif (
-            trip.distance < self.max_distance_pr_trip
-            and self.milage_left - trip.distance > 0
-            and (self.skip_kmh_check or trip["km/h"] < self.electrical_bike_speed)
-        ):
-            for start, end in self.allowed_driving_time_slots:
-                if all(
-                    [
-                        trip.start_time.time() >= start.time(),
-                        trip.start_time.time() <= end.time(),
-                        trip.end_time.time() <= end.time(),
-                        trip.end_time.time() >= start.time(),
-                    ]
-                ):
-                    accepted = self.percentage_accept()
-                    self.accept_record.append(accepted)
-                    if accepted:
-                        self.milage_left = self.milage_left - trip.distance
-                        self.trips.append((trip.start_time, trip.end_time))
-                        return True
-                    else:
-                        return False
-            return False
-        else:
-            # trip is too long to accept
+        if eligible is None:
+            eligible = bike_accepts(trip, self, self.electrical_bike_speed)
+        if not eligible or not self.milage_left - trip.distance > 0:
+            # trip is too long to accept or outside the allowed time slots
             return False
 
+        accepted = self.percentage_accept()
+        self.accept_record.append(accepted)
+        if accepted:
+            self.milage_left = self.milage_left - trip.distance
+            self.trips.append((trip.start_time, trip.end_time))
+        return accepted
+
 
 class Unassigned(VehicleModel):
     """Class for representing an unassigned vehicle. Used for computing capacity."""
@@ -506,7 +776,7 @@ class Unassigned(VehicleModel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def accept_trip(self, trip):
+    def accept_trip(self, trip, eligible=None):
         # always accept
         return True
 
@@ -524,6 +794,7 @@ def VehicleClassGenerator(name, vehicle_type=Car):
 class VehicleFactory:
     """Class for containing the vehicle types that are used in the simulation"""
 
+    @timed_stage("vehicle loading")
     def __init__(self, load_self=True, unique_vehicles=None):
         if load_self:
             self.engine = engine_creator()
@@ -566,6 +837,11 @@ class VehicleFactory:
             self.unique_vehicles = pd.DataFrame(unique_vehicles)
             self.unique_vehicles = self.unique_vehicles.set_index(self.unique_vehicles.id)
 
+        # content hash of the vehicles, results derived from the vehicles can be cached on it
+        self.generation = hashlib.sha256(
+            pd.util.hash_pandas_object(self.unique_vehicles, index=True).values.tobytes()
+        ).hexdigest()
+
         # type to class mapper
         self.type_mapper = {
             "cykel": Bike,
@@ -698,15 +974,11 @@ class FleetInventory:
                 sorting.append(vehicle_name)
                 vehicle_type_ids.append(vehicle_object.type_id)
                 continue
-            qmpgr = TCOCalculator(
+            vehicle_vcprkm, vehicle_qampo_gr = unit_costs(
                 drivmiddel=vehicle_object.fuel,
                 bil_type=vehicle_object.fuel,
-                koerselsforbrug=10000,
                 braendstofforbrug=vehicle_object.wltp_fossil,
                 elforbrug=vehicle_object.wltp_el,
-                evalueringsperiode=1,
-                fremskrivnings_aar=0,
-                antal=1,
                 leasingydelse=0
                 if pd.isna(vehicle_object.omkostning_aar)
                 else vehicle_object.omkostning_aar,
@@ -715,8 +987,8 @@ class FleetInventory:
                 el_udledning=el_udledning,
                 hvo_udledning=hvo_udledning
             )
-            vcprkm.append(qmpgr.tco_average / 10000)
-            qampo_gr.append(qmpgr.ekstern_miljoevirkning(sum_it=True)[0] * 100)
+            vcprkm.append(vehicle_vcprkm)
+            qampo_gr.append(vehicle_qampo_gr)
             sorting.append(vehicle_name)
             vehicle_type_ids.append(vehicle_object.type_id)
 
@@ -754,6 +1026,15 @@ class FleetInventory:
                 if n + 1 == getattr(self, vehicle_name) and self.name != "current":
                     self.sort_index[vehicle_name] = (start_index, start_index + n + 1)
 
+    def reset(self):
+        """
+        Resets the bookings of the vehicles in place and restores their initial order, such that the fleet can be
+        simulated again instead of being rebuilt
+        """
+        self.vehicles.sort(key=lambda vehicle: vehicle.vehicle_id)
+        for vehicle in self.vehicles:
+            vehicle.reset()
+
     def copy_bike_fleet(self, name="fleetinventory"):
         """
         Convenience function used in intelligent simulation for copying only the bike fleet as the Qampo algorithms
@@ -806,3 +1087,31 @@ class FleetInventory:
     def __iter__(self):
         # iterator that first traverses bikes, ebikes, ecars and then cars
         yield from self.vehicles
+
+
+class FleetPool:
+    """
+    Least recently used fleet inventories of a search by the key of the vehicle counts they are built from. The
+    searches evaluate the same counts repeatedly, hence the inventory of a key is built once and reset when it's
+    evaluated again. An inventory is only valid until its key is requested again and must not be kept by the caller.
+
+    parameters
+    ----------
+    size: the number of inventories kept
+    """
+
+    def __init__(self, size: int = 32):
+        self.size = size
+        self.fleets: OrderedDict[tuple, FleetInventory] = OrderedDict()
+
+    def get(self, key: tuple, build: Callable[[], FleetInventory]) -> FleetInventory:
+        fleet = self.fleets.get(key)
+        if fleet is None:
+            fleet = build()
+        else:
+            fleet.reset()
+        self.fleets[key] = fleet
+        self.fleets.move_to_end(key)
+        while len(self.fleets) > self.size:
+            self.fleets.popitem(last=False)
+        return fleet
@@ -1,10 +1,77 @@
 import datetime
+import threading
+from collections import OrderedDict
 
-import numpy as np
 import pandas as pd
 
 from fleetmanager.model.vehicle import FleetInventory, VehicleFactory
 
+# vehicles that are identical on these columns are equivalent to the search, only the cheapest of them are searched
+equivalence_columns = [
+    "make",
+    "model",
+    "type",
+    "fuel",
+    "wltp_fossil",
+    "wltp_el",
+    "capacity_decrease",
+    "co2_pr_km",
+    "range",
+    "sleep",
+]
+
+# equivalence classes by the generation of the vehicle factory, repeated goal simulations on unchanged vehicles
+# reuse the classes
+_equivalence_classes: OrderedDict[str, tuple[dict[str, str], list[str]]] = OrderedDict()
+_equivalence_classes_lock = threading.Lock()
+equivalence_classes_size = 8
+
+
+def equivalence_classes(
+    vehicles: pd.DataFrame, generation: str | None = None
+) -> tuple[dict[str, str], list[str]]:
+    """
+    Groups the vehicles that are identical on the equivalence columns in one pass. The cheapest vehicles of a group
+    translate to the first of them, the class vehicle. The more expensive vehicles of a group are left out of the
+    translation.
+
+    Parameters
+    ----------
+    vehicles    :   frame of the vehicles indexed by their vehicle factory index, without missing values
+    generation  :   generation of the vehicle factory the vehicles are from, the classes are cached on it if given
+
+    Returns
+    -------
+    translation :   dict, index of the vehicle to the index of its class vehicle
+    classes :   list, indices of the class vehicles in the order of the first vehicle of their group
+    """
+    if generation is not None:
+        with _equivalence_classes_lock:
+            if generation in _equivalence_classes:
+                _equivalence_classes.move_to_end(generation)
+                return _equivalence_classes[generation]
+
+    groups = vehicles.groupby(equivalence_columns, sort=False, dropna=False)
+    cheapest = (vehicles.omkostning_aar == groups.omkostning_aar.transform("min")).values
+    qualified = pd.DataFrame(
+        {
+            "group": groups.ngroup().values[cheapest],
+            "index": vehicles.index.values[cheapest].astype(str),
+        }
+    )
+    class_ids = qualified.groupby("group")["index"].transform("first")
+    result = (
+        dict(zip(qualified["index"], class_ids)),
+        qualified.groupby("group", sort=True)["index"].first().tolist(),
+    )
+
+    if generation is not None:
+        with _equivalence_classes_lock:
+            _equivalence_classes[generation] = result
+            while len(_equivalence_classes) > equivalence_classes_size:
+                _equivalence_classes.popitem(last=False)
+    return result
+
 
 class FleetOptimisation:
     """
@@ -55,8 +122,8 @@ class FleetOptimisation:
 
     def get_active_vehicles(self):
         """
-        Method for loading the active vehicles. In order not to exhaust the resources, unique types
-        of the vehicles are loaded in the uniquely value. If a car of a type that was removed because it was identical
+        Method for loading the active vehicles. In order not to exhaust the resources, only the equivalence classes
+        of the vehicles are loaded, see equivalence_classes. If a car of a type that was removed because it was identical
         to a cheaper one, it's added to the translation dictionary, which bookkeeps the vehicles.
 
         Returns
@@ -66,7 +133,6 @@ class FleetOptimisation:
         """
         active_vehicles = {}
         temp = {}
-        self.translation = {}
         temp_frame = self.vf.all_vehicles.copy()
         temp_frame = temp_frame[
             ((~temp_frame.wltp_fossil.isna()) | (~temp_frame.wltp_el.isna()))
@@ -80,39 +146,11 @@ class FleetOptimisation:
                 temp_frame[column] = temp_frame[column].fillna(pd.NaT)
             else:
                 temp_frame[column] = temp_frame[column].fillna(0)
-        uniquely = temp_frame[
-            [
-                "make",
-                "model",
-                "type",
-                "fuel",
-                "wltp_fossil",
-                "wltp_el",
-                "capacity_decrease",
-                "co2_pr_km",
-                "range",
-                "sleep",
-            ]
-        ].drop_duplicates()
-        for id, unique_car in uniquely.iterrows():
-            idx = np.array(
-                [
-                    list(temp_frame[key] == val)
-                    for key, val in unique_car.to_dict().items()
-                ]
-            )
-            c_vehicles = temp_frame[np.all(idx.T, axis=1)]
-            qualified = c_vehicles[
-                c_vehicles.omkostning_aar == c_vehicles.omkostning_aar.min()
-            ]
-            indices = qualified.index.values
-            class_id = str(indices[0])
-            for index in indices:
-                self.translation[str(index)] = class_id
-            id = str(class_id)
-            temp[id] = {"count": 0, "class": None}
-            if temp[id]["class"] is None:
-                temp[id]["class"] = self.vf.vmapper[id]
+        translation, classes = equivalence_classes(temp_frame, self.vf.generation)
+        # the cached translation is extended with the active and selected vehicles below
+        self.translation = translation.copy()
+        for class_id in classes:
+            temp[class_id] = {"count": 0, "class": self.vf.vmapper[class_id]}
 
         active_vehicle_indexes = [
             vehicle_id for vehicle_id in self.settings["active_vehicles"].keys()
@@ -132,7 +170,9 @@ class FleetOptimisation:
         if "special_selected" in self.settings:
             if len(self.settings["special_selected"]) > 0:
                 only_selected_and_active = {}
-                selected_frame = temp_frame[temp_frame.id.apply(lambda x: int(x) in self.settings["special_selected"])]
+                selected_frame = temp_frame[
+                    temp_frame.id.astype(int).isin(self.settings["special_selected"])
+                ]
                 for selected_vehicle in selected_frame.itertuples():
                     id_ = str(selected_vehicle.Index)
                     if id_ not in self.translation:
@@ -1,9 +1,12 @@
-import time
+import os
+import threading
+from collections import OrderedDict, defaultdict
 from datetime import date, datetime
+from typing import Callable
 
 import pandas as pd
-from sqlalchemy import and_, case, not_, or_, select, func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, or_, select, func
+from sqlalchemy.orm import Session, joinedload
 
 from fleetmanager.api.configuration.schemas import (
     FuelType,
@@ -20,6 +23,7 @@ from fleetmanager.api.simulation_setup.schemas import (
     Forvaltninger,
 )
 from fleetmanager.configuration.util import load_name_settings
+from fleetmanager.data_access import data_watermark
 from fleetmanager.data_access.dbschema import AllowedStarts, Cars, RoundTrips
 
 
@@ -56,6 +60,105 @@ def get_forvaltninger(session: Session):
     return parsed.__root__
 
 
+# memo of the vehicles of the setup page per database, period and locations, the entries are valid for one data
+# watermark
+location_vehicles_cache_size = int(os.getenv("LOCATION_VEHICLES_CACHE_SIZE", 64))
+_location_vehicles_cache: OrderedDict[tuple, tuple[tuple, LocationsVehicleList]] = OrderedDict()
+_location_vehicles_lock = threading.Lock()
+
+
+def memoized_location_vehicles(
+    session: Session, key: tuple, build: Callable[[], LocationsVehicleList]
+) -> LocationsVehicleList:
+    """
+    Returns the memoized vehicles of the key if the data watermark is unchanged, otherwise builds and memoizes them.
+    The key is qualified by the database of the session, as the process may hold engines of several databases.
+    The returned object is shared between requests and must not be changed.
+    """
+    key = (session.get_bind().url.render_as_string(hide_password=True), *key)
+    watermark = data_watermark(session)
+    with _location_vehicles_lock:
+        entry = _location_vehicles_cache.get(key)
+        if entry is not None and entry[0] == watermark:
+            _location_vehicles_cache.move_to_end(key)
+            return entry[1]
+
+    result = build()
+    with _location_vehicles_lock:
+        _location_vehicles_cache[key] = (watermark, result)
+        _location_vehicles_cache.move_to_end(key)
+        while len(_location_vehicles_cache) > location_vehicles_cache_size:
+            _location_vehicles_cache.popitem(last=False)
+    return result
+
+
+def period_roundtrip_counts(
+    session: Session, start_date: date, end_date: date
+) -> dict[int, dict[int | None, int]]:
+    """
+    The number of roundtrips of each vehicle in the period per start location, from a single grouped pass over the
+    roundtrips. The trips at the home location and the locations the vehicle has moved from are read from it.
+    """
+    rows = session.execute(
+        select(RoundTrips.car_id, RoundTrips.start_location_id, func.count(RoundTrips.id))
+        .where(RoundTrips.start_time.between(start_date, end_date))
+        .where(RoundTrips.end_time.between(start_date, end_date))
+        .group_by(RoundTrips.car_id, RoundTrips.start_location_id)
+    )
+    counts = defaultdict(dict)
+    for car_id, location_id, count in rows:
+        counts[car_id][location_id] = count
+    return counts
+
+
+def vehicle_view(car: Cars, name_fields: list[str], status: str, **fields) -> VehicleView:
+    return VehicleView(
+        name=" ".join([value for field in name_fields if (value := getattr(car, field))]),
+        id=car.id,
+        capacity_decrease=car.capacity_decrease,
+        wltp_fossil=car.wltp_fossil,
+        start_leasing=car.start_leasing,
+        end_leasing=car.end_leasing,
+        omkostning_aar=car.omkostning_aar,
+        co2_pr_km=car.co2_pr_km,
+        wltp_el=car.wltp_el,
+        km_aar=car.km_aar,
+        sleep=car.sleep,
+        plate=car.plate,
+        make=car.make,
+        model=car.model,
+        range=car.range,
+        status=status,
+        department=car.department,
+        leasing_type=LeasingType(
+            id=car.leasing_type_obj.id, name=car.leasing_type_obj.name
+        )
+        if car.leasing_type_obj != None
+        else None,
+        fuel=FuelType(id=car.fuel_obj.id, name=car.fuel_obj.name)
+        if car.fuel_obj != None
+        else None,
+        type=VehicleType(id=car.type_obj.id, name=car.type_obj.name)
+        if car.type_obj != None
+        else None,
+        location=Location(id=car.location_obj.id, address=car.location_obj.address)
+        if car.location_obj != None
+        else None,
+        disabled=car.disabled,
+        deleted=car.deleted,
+        **fields,
+    )
+
+
+def vehicles_query(*columns):
+    return select(Cars, *columns).options(
+        joinedload(Cars.leasing_type_obj),
+        joinedload(Cars.fuel_obj),
+        joinedload(Cars.type_obj),
+        joinedload(Cars.location_obj),
+    )
+
+
 def get_location_vehicles(
     session: Session,
     start_date: date,
@@ -67,6 +170,19 @@ def get_location_vehicles(
         start_date if type(start_date) != str else datetime.fromisoformat(start_date)
     )
     end_date = end_date if type(end_date) != str else datetime.fromisoformat(end_date)
+    return memoized_location_vehicles(
+        session,
+        ("vehicles", start_date, end_date, location_id),
+        lambda: _get_location_vehicles(session, start_date, end_date, location_id),
+    )
+
+
+def _get_location_vehicles(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    location_id: int | None = None,
+) -> LocationsVehicleList | None:
     # lokationer
     location_to_vehicles = LocationsVehicleList(
         locations=[
@@ -74,171 +190,61 @@ def get_location_vehicles(
             for start in session.scalars(select(AllowedStarts))
         ]
     )
+    locations = {location.id: location for location in location_to_vehicles.locations}
 
-    # køretøjer der har kørt i den valgte periode
-    contributed_cars = (
-        select(RoundTrips.car_id)
-        .where(RoundTrips.start_time.between(start_date, end_date))
-        .where(RoundTrips.end_time.between(start_date, end_date))
-        .distinct()
-    )
-
-    # uinteressante køretøjer, leasing færdig og ingen rundture
-    leasing_ended_cars = (
-        select(Cars.id)
-        .where(Cars.end_leasing < end_date)
-        .where(Cars.id.not_in(contributed_cars))
-    )
+    # rundture i perioden pr. køretøj og lokation
+    counts = period_roundtrip_counts(session, start_date, end_date)
 
     # køretøjer med manglende værdier
-    data_missing_cars = select(Cars.id).where(
-        or_(
-            and_(Cars.end_leasing == None, Cars.leasing_type.in_([1, 2])),
-            and_(Cars.wltp_el == None, Cars.wltp_fossil == None, Cars.fuel != 10),
-            Cars.omkostning_aar == None,
-        )
+    data_missing = or_(
+        and_(Cars.end_leasing == None, Cars.leasing_type.in_([1, 2])),
+        and_(Cars.wltp_el == None, Cars.wltp_fossil == None, Cars.fuel != 10),
+        Cars.omkostning_aar == None,
     )
-
-    # Køretøjer med status, notActive, dataMissing, leasingEnded eller ok
-    status_query = (
-        select(
-            Cars,
-            case(
-                (Cars.id.in_(data_missing_cars), "dataMissing"),
-                (
-                    and_(
-                        select(RoundTrips)
-                        .where(RoundTrips.car_id == Cars.id)
-                        .where(RoundTrips.start_time.between(start_date, end_date))
-                        .where(RoundTrips.end_time.between(start_date, end_date))
-                        .exists(),
-                        Cars.end_leasing < end_date,
-                    ),
-                    "leasingEnded",
-                ),
-                (
-                    not_(
-                        select(RoundTrips)
-                        .where(RoundTrips.car_id == Cars.id)
-                        .where(RoundTrips.start_location_id == Cars.location)
-                        .where(RoundTrips.start_time.between(start_date, end_date))
-                        .where(RoundTrips.end_time.between(start_date, end_date))
-                        .exists()
-                    ),
-                    "notActive",
-                ),
-                else_="ok",
-            ).label("status"),
+    vehicles = session.execute(
+        vehicles_query(
+            case((data_missing, True), else_=False).label("data_missing"),
+            case((Cars.end_leasing < end_date, True), else_=False).label("leasing_ended"),
         )
         .where(Cars.location != None)
-        .where(Cars.id.notin_(leasing_ended_cars))
-    )
-
-    # Køretøjer med ændring af lokation
-    location_changed_query = (
-        select(
-            RoundTrips.start_location_id.label("oldLocation"),
-            Cars,
-            case(
-                (
-                    and_(
-                        RoundTrips.start_location_id != Cars.location,
-                        RoundTrips.start_location_id != None,
-                    ),
-                    "locationChanged",
-                ),
-                else_=None,
-            ).label("status"),
-        )
-        .join(RoundTrips, RoundTrips.car_id == Cars.id)
-        .where(RoundTrips.start_time.between(start_date, end_date))
-        .where(RoundTrips.end_time.between(start_date, end_date))
-        .distinct()
-    )
-
-    first = session.execute(status_query).fetchall()
-    second = session.execute(location_changed_query).fetchall()
+        .order_by(Cars.id)
+    ).all()
     name_fields = load_name_settings(session)
 
-    # for row in status_query + location_changed_query:
-    for row in first + second:
-        # python is confused about types in named tuples so we help it a bit
+    # Køretøjer med status, notActive, dataMissing, leasingEnded eller ok, efterfulgt af køretøjer med ændring af
+    # lokation
+    statuses = []
+    moved = []
+    for row in vehicles:
         car: Cars = row.Cars
-        if row.status is None:  # case is from locationChanged and not qualified
+        car_counts = counts.get(car.id, {})
+        if row.leasing_ended and not car_counts:
+            # uinteressante køretøjer, leasing færdig og ingen rundture
+            status = None
+        elif row.data_missing:
+            status = "dataMissing"
+        elif row.leasing_ended:
+            status = "leasingEnded"
+        elif not car_counts.get(car.location):
+            status = "notActive"
+        else:
+            status = "ok"
+        if status is not None:
+            statuses.append((car.location, car, status))
+        moved += [
+            (old_location, car, "locationChanged")
+            for old_location in car_counts
+            if old_location is not None and old_location != car.location
+        ]
+
+    for search_location, car, status in statuses + moved:
+        location = locations.get(search_location)
+        if location is None or car.disabled or car.deleted:
             continue
+        location.vehicles.append(vehicle_view(car, name_fields, status))
 
-        search_location = car.location
-        if row.status == "locationChanged":
-            search_location = row.oldLocation
-        location = next(
-            filter(
-                lambda loc: loc.id == search_location, location_to_vehicles.locations
-            ),
-            None,
-        )
-        if location != None:
-            if row.status == "notActive" and (car.disabled or car.deleted):
-                # quicker way to check than to include in leasing_ended_cars query
-                continue
-            if car.disabled or car.deleted:
-                continue
-            location.vehicles.append(
-                VehicleView(
-                    name=" ".join(
-                        [
-                            value
-                            for field in name_fields
-                            if (value := getattr(car, field))
-                        ]
-                    ),
-                    id=car.id,
-                    capacity_decrease=car.capacity_decrease,
-                    wltp_fossil=car.wltp_fossil,
-                    start_leasing=car.start_leasing,
-                    end_leasing=car.end_leasing,
-                    omkostning_aar=car.omkostning_aar,
-                    co2_pr_km=car.co2_pr_km,
-                    wltp_el=car.wltp_el,
-                    km_aar=car.km_aar,
-                    sleep=car.sleep,
-                    plate=car.plate,
-                    make=car.make,
-                    model=car.model,
-                    range=car.range,
-                    status=row.status,
-                    department=car.department,
-                    leasing_type=LeasingType(
-                        id=car.leasing_type_obj.id, name=car.leasing_type_obj.name
-                    )
-                    if car.leasing_type_obj != None
-                    else None,
-                    fuel=FuelType(id=car.fuel_obj.id, name=car.fuel_obj.name)
-                    if car.fuel_obj != None
-                    else None,
-                    type=VehicleType(id=car.type_obj.id, name=car.type_obj.name)
-                    if car.type_obj != None
-                    else None,
-                    location=Location(
-                        id=car.location_obj.id, address=car.location_obj.address
-                    )
-                    if car.location_obj != None
-                    else None,
-                    disabled=car.disabled,
-                    deleted=car.deleted,
-                )
-            )
     if location_id:
-        return LocationsVehicleList(
-            locations=[
-                next(
-                    filter(
-                        lambda loc: loc.id == location_id,
-                        location_to_vehicles.locations,
-                    ),
-                    None,
-                )
-            ]
-        )
+        return LocationsVehicleList(locations=[locations.get(location_id)])
     else:
         return location_to_vehicles
 
@@ -249,89 +255,47 @@ def get_location_vehicles_loc(
     end_date: date,
     location_ids: list[int],
 ) -> LocationsVehicleList | None:
-    # køretøjer der har kørt i den valgte periode
-    contributed_vehicles = (
-        session.query(RoundTrips.car_id)
-        .filter(
-            RoundTrips.start_location_id.in_(location_ids),
-            RoundTrips.start_time >= start_date,
-            RoundTrips.end_time <= end_date,
-        )
-        .distinct()
+    return memoized_location_vehicles(
+        session,
+        ("locations", start_date, end_date, tuple(sorted(location_ids))),
+        lambda: _get_location_vehicles_loc(session, start_date, end_date, location_ids),
     )
 
-    # all other cars
-    other_cars = [
-        id_[0]
-        for id_ in session.query(Cars.id)
-        .filter(Cars.id.not_in(contributed_vehicles), Cars.location.in_(location_ids))
-        .distinct()
-        .all()
-    ]
 
-    contributed_vehicles = [id_[0] for id_ in contributed_vehicles.all()]
-    vehicles = contributed_vehicles + other_cars
+def _get_location_vehicles_loc(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    location_ids: list[int],
+) -> LocationsVehicleList | None:
+    # køretøjer der har kørt fra lokationerne i den valgte periode
+    contributed_vehicles = {
+        car_id
+        for car_id, car_counts in period_roundtrip_counts(session, start_date, end_date).items()
+        if any(location_id in location_ids for location_id in car_counts)
+    }
+
+    # og alle andre køretøjer på lokationerne
+    cars = session.scalars(
+        vehicles_query()
+        .where(or_(Cars.id.in_(list(contributed_vehicles)), Cars.location.in_(location_ids)))
+        .order_by(Cars.id)
+    ).all()
     name_fields = load_name_settings(session)
+    vehicles = [
+        vehicle_view(
+            car,
+            name_fields,
+            car_status(car, location_ids, end_date, car.id in contributed_vehicles),
+            description=car.description,
+            forvaltning=car.forvaltning,
+        )
+        for car in cars
+        if not (car.deleted == True or car.disabled == True)
+    ]
     location = LocationsVehicleList(
         locations=[
-            LocationVehicles(
-                id=row.id,
-                address=row.address,
-                vehicles=[
-                    VehicleView(
-                        name=" ".join(
-                            [
-                                value
-                                for field in name_fields
-                                if (value := getattr(car, field))
-                            ]
-                        ),
-                        id=car.id,
-                        capacity_decrease=car.capacity_decrease,
-                        wltp_fossil=car.wltp_fossil,
-                        start_leasing=car.start_leasing,
-                        end_leasing=car.end_leasing,
-                        omkostning_aar=car.omkostning_aar,
-                        co2_pr_km=car.co2_pr_km,
-                        wltp_el=car.wltp_el,
-                        km_aar=car.km_aar,
-                        sleep=car.sleep,
-                        plate=car.plate,
-                        make=car.make,
-                        model=car.model,
-                        range=car.range,
-                        status=car_status(
-                            car,
-                            location_ids,
-                            end_date,
-                            True if car.id in contributed_vehicles else False,
-                        ),
-                        department=car.department,
-                        leasing_type=LeasingType(
-                            id=car.leasing_type_obj.id, name=car.leasing_type_obj.name
-                        )
-                        if car.leasing_type_obj != None
-                        else None,
-                        fuel=FuelType(id=car.fuel_obj.id, name=car.fuel_obj.name)
-                        if car.fuel_obj != None
-                        else None,
-                        type=VehicleType(id=car.type_obj.id, name=car.type_obj.name)
-                        if car.type_obj != None
-                        else None,
-                        location=Location(
-                            id=car.location_obj.id, address=car.location_obj.address
-                        )
-                        if car.location_obj != None
-                        else None,
-                        disabled=car.disabled,
-                        deleted=car.deleted,
-                        description=car.description,
-                        forvaltning=car.forvaltning
-                    )
-                    for car in session.query(Cars).filter(Cars.id.in_(vehicles))
-                    if not (car.deleted == True or car.disabled == True)
-                ],
-            )
+            LocationVehicles(id=row.id, address=row.address, vehicles=vehicles)
             for row in session.query(AllowedStarts).filter(
                 AllowedStarts.id.in_(location_ids)
             )
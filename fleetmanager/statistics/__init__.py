@@ -5,8 +5,10 @@ from .util import (
     total_driven,
     daily_driving,
     driving_data_to_excel,
+    driving_data_to_frame,
     get_daily_driving_data,
     grouped_driving_data_to_excel,
+    grouped_driving_data_to_frame,
     get_aggregation_key,
     date_duration_getter,
     group_by_vehicle_location,
@@ -1,5 +1,4 @@
 import datetime
-import io
 import time
 from ast import literal_eval
 from dataclasses import dataclass
@@ -23,6 +22,11 @@ from fleetmanager.data_access import (
     SimulationSettings,
     get_default_fuel_types,
 )
+from fleetmanager.export import (
+    constant_memory_workbook,
+    header_format,
+    spooled_file,
+)
 from fleetmanager.model.tco_calculator import TCOCalculator
 from fleetmanager.model.trip_generator import alternate
 
@@ -697,9 +701,12 @@ def daily_driving(
 
 
 def driving_data_to_excel(data, threshold):
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine="xlsxwriter")
-    workbook = writer.book
+    """
+    Writes the daily driven kilometers per vehicle to an excel sheet with a table for each location and shift.
+    The workbook is written in constant_memory mode to a spooled temporary file, so only one row is kept in memory.
+    """
+    output = spooled_file()
+    workbook = constant_memory_workbook(output)
     worksheet = workbook.add_worksheet()
 
     df = pd.DataFrame(data["driving_data"])
@@ -708,8 +715,7 @@ def driving_data_to_excel(data, threshold):
     )  # Convert date column to string
     new_df = df[["shift_id", "date", "plate", "distance", "location_id"]]
 
-    # Step 1: Find the complete list of unique plates and dates
-    all_plates = new_df["plate"].unique()
+    # Step 1: Find the complete list of unique dates
     all_dates = sorted(new_df["date"].unique())
 
     # Step 2-5
@@ -718,7 +724,7 @@ def driving_data_to_excel(data, threshold):
     if len(shift_ids.unique()) == 1:
         shift_ranges[0] = f"00:00-23:59"
     else:
-        for shift_id in shift_ids:
+        for shift_id in shift_ids.unique():
             shift_dict = data["shifts"][shift_id]
             shift_start = shift_dict["shift_start"]
             shift_end = shift_dict["shift_end"]
@@ -730,140 +736,104 @@ def driving_data_to_excel(data, threshold):
     # Get unique shift_id values
     unique_shift_ids = new_df["shift_id"].unique()
 
+    # Sum the distances once for all locations, shifts, plates and dates
+    summed = (
+        new_df.groupby(["location_id", "shift_id", "plate", "date"])["distance"]
+        .sum()
+        .apply(lambda x: round(x, 1))
+    )
+    summed_tables = {
+        key: table.droplevel(["location_id", "shift_id"]).unstack(fill_value=0)
+        for key, table in summed.groupby(level=["location_id", "shift_id"])
+    }
+
     # Set the initial row and column values
     start_row = 0
     start_col = 0
 
     query_vehicles = pd.DataFrame(data["query_vehicles"])
 
-    format_table = workbook.add_format(
-        {"bg_color": "#FFC7CE"}
-    )  # Set the background color for cells inside the table
+    format_header = header_format(workbook)
+    heading_format = workbook.add_format(
+        {"bold": True, "font_size": 14}
+    )  # Create a format for the heading
+    empty_format = workbook.add_format({"bg_color": "#FF0000"})
+    threshold_format = workbook.add_format(
+        {"bg_color": "#FFFFFF"}
+    )  # White color for cells above threshold
+    color_scale_format = workbook.add_format()
+    color_scale_format.set_num_format(
+        50
+    )  # Set the number format to be used for the color scale
+
     for loc in data["query_locations"]:
+        vehicles_at_location = query_vehicles[
+            (query_vehicles["location_id"] == loc["id"])
+        ]["plate"].unique()
         for shift_id in unique_shift_ids:
-            # Filter based on shift_id and date
-            location_filtered = new_df[(new_df["location_id"] == loc["id"])]
-            filtered_df = location_filtered[(location_filtered["shift_id"] == shift_id)]
-            # Groupby and calculate sum of distances
-            summed_df = (
-                filtered_df.groupby(["plate", "date"])["distance"]
-                .sum()
-                .apply(lambda x: round(x, 1))
-                .reset_index()
-            )
-
-            vehicles_at_location = query_vehicles[
-                (query_vehicles["location_id"] == loc["id"])
-            ]
-
-            # Step 2: Create an empty table with all plates and dates
-            empty_table = pd.DataFrame(
-                index=vehicles_at_location["plate"].unique(), columns=all_dates
-            )
-            empty_table = empty_table.fillna(0)  # Fill empty cells with 0
-
-            # Step 3: Update the empty table with distance values from the filtered DataFrame
-            empty_table.update(
-                summed_df.pivot(index="plate", columns=["date"], values="distance")
-            )
-
-            # Step 4: Add "Nummerplader" as the first column in each table
-            empty_table.insert(0, "Nummerplader", empty_table.index)
+            # Table with all plates and dates, filled with the summed distances
+            table = summed_tables.get((loc["id"], shift_id))
+            if table is None:
+                table = pd.DataFrame(0, index=vehicles_at_location, columns=all_dates)
+            else:
+                table = table.reindex(
+                    index=vehicles_at_location, columns=all_dates, fill_value=0
+                )
+            column_names = ["Nummerplader"] + all_dates
 
-            # Create the DataFrame
-            table_range = (
-                start_row,
-                start_col,
-                start_row + len(empty_table) + 1,
-                start_col + len(empty_table.columns),
-            )  # Adjusted the last_col value
-            column_names = list(empty_table.columns)
+            last_row = len(table) + start_row + 1
+            last_col = len(column_names) + start_col - 1
 
-            # Write the heading title
+            # Write the heading title. Rows can only be written in increasing order in constant_memory mode
             sheet_name = (
                 f"Vagtlag: kl. {shift_ranges[int(shift_id)]} - {loc['address'].strip()}"
             )
-            heading_format = workbook.add_format(
-                {"bold": True, "font_size": 14}
-            )  # Create a format for the heading
+            worksheet.set_row(start_row, None, None, {"level": 1})
             worksheet.merge_range(
                 start_row,
                 start_col,
                 start_row,
-                start_col + len(column_names) - 1,
+                last_col,
                 sheet_name,
                 heading_format,
             )
 
             # Write the column names and autofit columns
+            worksheet.write_row(start_row + 1, start_col, column_names, format_header)
             for col_num, column_name in enumerate(column_names):
-                worksheet.write(
-                    start_row + 1, start_col + col_num, column_name, format_table
-                )
                 column_width = len(column_name) + 2  # Add some padding
                 worksheet.set_column(
                     start_col + col_num, start_col + col_num, column_width
                 )  # Set column width based on column name
-            worksheet.set_row(
-                start_row, None, None, {"level": 1}
-            )  # Set the row height for the merged cells
 
             # Write the data rows
-            for row_num, (_, row) in enumerate(empty_table.iterrows(), start_row + 2):
-                for col_num, value in enumerate(row, start_col):
-                    worksheet.write(row_num, col_num, value)
-
-            # Add a table
-            last_row = len(empty_table) + start_row + 1
-            last_col = (
-                len(empty_table.columns) + start_col - 1
-            )  # Adjusted the last_col value
-            table_range = (start_row + 1, start_col, last_row, last_col)
-            column_names = list(empty_table.columns)
-            format_table = workbook.add_format(
-                {"bg_color": "#FFC7CE"}
-            )  # Set the background color for cells inside the table
-            worksheet.add_table(
-                *table_range,
+            for row_num, (plate, values) in enumerate(
+                zip(table.index, table.itertuples(index=False, name=None)),
+                start_row + 2,
+            ):
+                worksheet.write(row_num, start_col, plate)
+                worksheet.write_row(row_num, start_col + 1, values)
+
+            # Add conditional format to highlight empty cells inside the table, relative to the top left cell
+            worksheet.conditional_format(
+                start_row + 2,
+                start_col,
+                last_row,
+                last_col,
                 {
-                    "header_row": True,
-                    "style": "Table Style Medium 2",
-                    "columns": [
-                        {"header": name, "format": format_table}
-                        for name in column_names
-                    ],
+                    "type": "formula",
+                    "criteria": f"ISBLANK({xl_rowcol_to_cell(start_row + 2, start_col)})",
+                    "format": empty_format,
                 },
             )
 
-            # Add conditional format to highlight empty cells inside the table
-            empty_format = workbook.add_format({"bg_color": "#FF0000"})
-            for row_num in range(start_row + 2, last_row + 1):
-                for col_num in range(start_col, last_col + 1):
-                    cell_address = xl_rowcol_to_cell(row_num, col_num)
-                    formula = f"ISBLANK({cell_address})"
-                    worksheet.conditional_format(
-                        cell_address,
-                        {
-                            "type": "formula",
-                            "criteria": formula,
-                            "format": empty_format,
-                        },
-                    )
-
             # The threshold for when the cells turns white
             color_threshold = threshold
 
             # Add 3-step color scale for the distance values
             data_range = xl_range(start_row + 2, start_col + 1, last_row, last_col)
-            color_scale_format = workbook.add_format()
-            color_scale_format.set_num_format(
-                50
-            )  # Set the number format to be used for the color scale
 
             # Add conditional format for values below the threshold
-            threshold_format = workbook.add_format(
-                {"bg_color": "#FFFFFF"}
-            )  # White color for cells above threshold
             worksheet.conditional_format(
                 data_range,
                 {
@@ -887,11 +857,29 @@ def driving_data_to_excel(data, threshold):
             )
             start_row = last_row + 3
 
-    writer.close()
+    workbook.close()
     output.seek(0)
     return output
 
 
+def driving_data_to_frame(data):
+    """
+    Flat representation of the daily driven kilometers per location, shift and vehicle used for csv and parquet
+    exports, which are not limited by the size of an excel sheet.
+    """
+    df = pd.DataFrame(data["driving_data"])
+    locations = {loc["id"]: loc["address"] for loc in data["query_locations"]}
+    df["date"] = df.end_time.apply(lambda x: x.date())
+    summed = (
+        df.groupby(["location_id", "shift_id", "plate", "date"])["distance"]
+        .sum()
+        .apply(lambda x: round(x, 1))
+        .reset_index()
+    )
+    summed.insert(1, "location", summed.location_id.map(locations))
+    return summed
+
+
 def get_daily_driving_data(
     session: Session,
     start_date,
@@ -1173,7 +1161,13 @@ def get_daily_driving_data(
 
 
 def grouped_driving_data_to_excel(data, threshold):
+    """
+    Writes the grouped driving data to an excel workbook with a sheet for vehicles and a sheet for locations.
+    The workbook is written in constant_memory mode to a spooled temporary file.
+    """
     locations = {loc["id"]: loc["address"] for loc in data.get("query_locations", [])}
+    vehicle_grouped = {veh["idInt"]: veh for veh in data.get("vehicle_grouped")}
+    location_grouped = {loc["idInt"]: loc for loc in data.get("location_grouped")}
 
     response = {}
     for vehicle in data.get("query_vehicles", []):
@@ -1185,12 +1179,7 @@ def grouped_driving_data_to_excel(data, threshold):
                 "address": locations[vehicle_location],
                 "data": [],
             }
-        vehicle_data = next(
-            filter(
-                lambda veh: veh["idInt"] == vehicle.get("id"),
-                data.get("vehicle_grouped"),
-            )
-        )
+        vehicle_data = vehicle_grouped[vehicle.get("id")]
         response[vehicle_location]["data"].append(
             {
                 "name": vehicle.get("name"),
@@ -1201,22 +1190,18 @@ def grouped_driving_data_to_excel(data, threshold):
 
     location_response = {}
     for location_id, location_address in locations.items():
-        location_data = next(
-            filter(lambda location: location["idInt"] ==
-                   location_id, data.get("location_grouped"))
-        )
+        location_data = location_grouped[location_id]
         location_response[location_id] = {
             "address": location_address,
             "x": list(map(lambda entry: entry["x"], location_data.get("data", []))),
             "y": list(map(lambda entry: entry["y"], location_data.get("data", [])))
         }
 
-    output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine="xlsxwriter")
-    workbook = writer.book
+    output = spooled_file()
+    workbook = constant_memory_workbook(output)
     worksheet = workbook.add_worksheet(name="Køretøjer")
     location_worksheet = workbook.add_worksheet(name="Lokationer")
-    format_table = workbook.add_format({"bg_color": "#FFC7CE"})
+    format_header = header_format(workbook)
     heading_format = workbook.add_format({"bold": True, "font_size": 14})
     cell_format = workbook.add_format({"border": 1})
     cell_format.set_align("left")
@@ -1231,7 +1216,7 @@ def grouped_driving_data_to_excel(data, threshold):
         start_row = row
         dates = location_content.get("data")[0]["x"]
         headers = ["Køretøj"] + dates
-        worksheet.write_row(row, col, headers)
+        worksheet.write_row(row, col, headers, format_header)
         worksheet.set_column(1, 1 + len(dates), max(map(lambda x: len(x) + 2, dates)))
         row += 1
 
@@ -1241,22 +1226,10 @@ def grouped_driving_data_to_excel(data, threshold):
                 max_col_width = len(vehicle_name) + 2
                 worksheet.set_column(0, 0, max_col_width)
             worksheet.write(row, col, vehicle_name, cell_format)
-            for i, value in enumerate(vehicle["y"]):
-                worksheet.write(row, col + 1 + i, value)
+            worksheet.write_row(row, col + 1, vehicle["y"])
 
             row += 1
         table_range = (start_row, 0, row - 1, len(dates))
-        worksheet.add_table(
-            *table_range,
-            {
-                "header_row": True,
-                "style": "Table Style Medium 2",
-                "columns": [
-                    {"header": name, "format": format_table}
-                    for name in headers
-                ],
-            },
-        )
 
         worksheet.conditional_format(
             *table_range,
@@ -1280,6 +1253,7 @@ def grouped_driving_data_to_excel(data, threshold):
     if location_content:
         dates = location_content[0]["x"]
         headers = ["Lokation"] + dates
+        location_worksheet.write_row(row, col, headers, format_header)
         location_worksheet.set_column(
             1, 1 + len(dates), max(map(lambda x: len(x) + 2, dates)))
         row += 1
@@ -1290,22 +1264,10 @@ def grouped_driving_data_to_excel(data, threshold):
                 max_col_width = len(location_name) + 2
                 location_worksheet.set_column(0, 0, max_col_width)
             location_worksheet.write(row, col, location_name)
-            for i, value in enumerate(location_data["y"]):
-                location_worksheet.write(row, col + 1 + i, value)
+            location_worksheet.write_row(row, col + 1, location_data["y"])
 
             row += 1
         table_range = (0, 0, row - 1, len(dates))
-        location_worksheet.add_table(
-            *table_range,
-            {
-                "header_row": True,
-                "style": "Table Style Medium 2",
-                "columns": [
-                    {"header": name, "format": format_table}
-                    for name in headers
-                ]
-            }
-        )
         location_worksheet.conditional_format(
             *table_range,
             {
@@ -1319,12 +1281,38 @@ def grouped_driving_data_to_excel(data, threshold):
             }
         )
 
-    writer.close()
+    workbook.close()
     output.seek(0)
 
     return output
 
 
+def grouped_driving_data_to_frame(data):
+    """
+    Flat representation of the grouped driving data with a row per vehicle and date, used for csv and parquet
+    exports.
+    """
+    locations = {loc["id"]: loc["address"] for loc in data.get("query_locations", [])}
+    vehicle_grouped = {veh["idInt"]: veh for veh in data.get("vehicle_grouped")}
+    rows = [
+        (
+            vehicle.get("location_id"),
+            locations.get(vehicle.get("location_id")),
+            vehicle.get("id"),
+            vehicle.get("name"),
+            entry.get("x"),
+            entry.get("y"),
+        )
+        for vehicle in data.get("query_vehicles", [])
+        if vehicle.get("location_id") is not None
+        for entry in vehicle_grouped[vehicle.get("id")].get("data")
+    ]
+    return pd.DataFrame(
+        rows,
+        columns=["location_id", "location", "vehicle_id", "vehicle", "period", "distance"],
+    )
+
+
 def get_aggregation_key(date_key, level):
     month = {
         1: "januar",
@@ -1,26 +1,40 @@
 import os
+from contextlib import suppress
 
-from celery import Celery
+from celery import Celery, chord, group
+from celery.signals import worker_init, worker_process_init
 from kombu import Queue, serialization
 from datetime import datetime, date
+from sqlalchemy.orm import sessionmaker
 from uuid import uuid4
 
 from fleetmanager.api.fleet_simulation.schemas import FleetSimulationOptions
 from fleetmanager.api.goal_simulation.schemas import GoalSimulationOptions
 from fleetmanager.api.location.schemas import PrecisionTestOptions
+from fleetmanager.data_access.db_engine import dispose_engines, engine_creator
+from fleetmanager.data_access.serialization import codec_name, content_type, register_codec
 from fleetmanager.fleet_simulation import fleet_simulator
 from fleetmanager.goal_simulation import goal_simulator, automatic_simulator
-from fleetmanager.location import precision_test
+from fleetmanager.location import (
+    precision_test_car,
+    precision_test_cars,
+    precision_test_path,
+    precision_test_results,
+)
+from fleetmanager.model.engines import preload_engines
+from fleetmanager.model.timing import collect_timings
 
 app = Celery(
     os.getenv("CELERY_USER", f"fleetmanager_{uuid4().hex}"),
     broker=os.getenv("CELERY_BROKER_URL", "amqp://localhost"),
     backend=os.getenv("CELERY_BACKEND_URL", "redis://localhost"),
 )
+register_codec()
 app.conf.event_serializer = "pickle"
-app.conf.task_serializer = "pickle"
-app.conf.result_serializer = "pickle"
-app.conf.accept_content = ["pickle", "application/json", "application/x-python-serialize"]
+# the codec reads the legacy pickled results, pickle is accepted for the messages sent before the codec
+app.conf.task_serializer = codec_name
+app.conf.result_serializer = codec_name
+app.conf.accept_content = [content_type, "pickle", "application/json", "application/x-python-serialize"]
 app.conf.update(result_extended=True)
 queue = os.getenv("CELERY_QUEUE", "default")
 serialization.register_pickle()
@@ -29,24 +43,120 @@ serialization.enable_insecure_serializers()
 app.conf.task_queues = [Queue(queue)]
 
 
-@app.task(queue=queue)
+@worker_init.connect
+def preload_worker(**kwargs):
+    # the solvers are imported once in the parent, such that the forked workers share them instead of each
+    # importing them on their first simulation
+    preload_engines()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # forked workers must not reuse the connections of the parent, the schema is bootstrapped once per worker
+    dispose_engines()
+    engine_creator()
+
+
+# the started state tells the running simulations from the lost ones in the simulation cache
+@app.task(queue=queue, track_started=True)
 def run_fleet_simulation(settings: FleetSimulationOptions):
-    return fleet_simulator(settings)
+    with collect_timings() as timings:
+        result = fleet_simulator(settings)
+    result["timings"] = timings.as_dict()
+    return result
 
 
 @app.task(bind=True, queue=queue)
 def run_goal_simulation(self, settings: GoalSimulationOptions, sim_start: datetime):
-    # return goal_simulator(settings, self, sim_start)
-    return automatic_simulator(settings, self, sim_start)  # todo temporary testing ge algorithm
+    with collect_timings() as timings:
+        # result = goal_simulator(settings, self, sim_start)
+        result = automatic_simulator(settings, self, sim_start)  # todo temporary testing ge algorithm
+    result["timings"] = timings.as_dict()
+    return result
+
+
+def precision_test_cancelled(settings: PrecisionTestOptions):
+    test_path = precision_test_path(settings.test_name)
+    return test_path is not None and not os.path.exists(test_path)
 
 
 @app.task(bind=True, queue=queue)
 def run_precision_location_test(self, settings: PrecisionTestOptions):
-    return precision_test(
+    """
+    Fans the precision test out to a test per car. The task is replaced by a chord of the car tests and the
+    reduction of their results, which keeps the id of the task, so the result is read from the id of the task.
+    """
+    self.update_state(
+        state="PROGRESS", meta={"progress": 0, "test_name": settings.test_name}
+    )
+    session = sessionmaker(bind=engine_creator())()
+    try:
+        car_ids = [car.id for car in precision_test_cars(session, settings.location)]
+    finally:
+        session.close()
+    if not car_ids:
+        return reduce_precision_location_test([], settings)
+
+    # the car tests report the progress of the test from the number of finished car tests
+    car_test_ids = [str(uuid4()) for _ in car_ids]
+    car_tests = app.GroupResult(
+        str(uuid4()), [app.AsyncResult(car_test_id) for car_test_id in car_test_ids]
+    )
+    car_tests.save()
+    return self.replace(
+        chord(
+            group(
+                run_precision_car_test.s(
+                    settings, car_id, self.request.id, car_tests.id
+                ).set(task_id=car_test_id)
+                for car_id, car_test_id in zip(car_ids, car_test_ids)
+            ),
+            reduce_precision_location_test.s(settings),
+        )
+    )
+
+
+@app.task(bind=True, queue=queue)
+def run_precision_car_test(
+    self, settings: PrecisionTestOptions, car_id: int, test_id: str, car_tests_id: str
+):
+    if precision_test_cancelled(settings):
+        return None
+    car_result = precision_test_car(
         extractors=settings.extractors,
         location=settings.location,
+        car_id=car_id,
+        test_specific_start=settings.test_specific_start,
+        start_date=settings.start_date,
+    )
+    car_tests = app.GroupResult.restore(car_tests_id)
+    if car_tests is not None:
+        # this test is not stored as finished until it returns
+        finished = car_tests.completed_count() + 1
+        self.update_state(
+            task_id=test_id,
+            state="PROGRESS",
+            meta={
+                "progress": finished / len(car_tests.results),
+                "test_name": settings.test_name,
+            },
+        )
+    return car_result
+
+
+@app.task(queue=queue)
+def reduce_precision_location_test(results: list, settings: PrecisionTestOptions):
+    if precision_test_cancelled(settings):
+        results = []
+    else:
+        test_path = precision_test_path(settings.test_name)
+        if test_path is not None:
+            # the test may be cancelled since the check, which removes the file as well
+            with suppress(FileNotFoundError):
+                os.remove(test_path)
+    return precision_test_results(
+        results,
+        location=settings.location,
         test_specific_start=settings.test_specific_start,
         start_date=settings.start_date,
-        task=self,
-        test_name=settings.test_name
     )
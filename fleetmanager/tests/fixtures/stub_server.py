@@ -0,0 +1,58 @@
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubServer:
+    """
+    Local http server replaying recorded responses, used to test the extractors without calling the providers.
+    Responses are queued per path and served in order, the last response of a path is repeated once the queue
+    is exhausted. All received requests are recorded in self.requests as (method, path including query, body).
+    """
+
+    def __init__(self):
+        self.responses = defaultdict(deque)
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                path = self.path.split("?")[0]
+                with stub.lock:
+                    stub.requests.append((self.command, self.path, body))
+                    queue = stub.responses[path]
+                    status, headers, content = (
+                        queue.popleft() if len(queue) > 1 else queue[0]
+                    ) if queue else (404, {}, "")
+                content = content.encode() if isinstance(content, str) else content
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def add(self, path, content="", status=200, headers=None):
+        self.responses[path].append((status, headers or {}, content))
+        return self
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
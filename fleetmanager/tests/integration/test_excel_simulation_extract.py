@@ -1,4 +1,4 @@
-from io import BytesIO
+from tempfile import SpooledTemporaryFile
 
 import pandas as pd
 
@@ -20,8 +20,8 @@ def test_excel_fleet_simulation_export(db_session):
     )
     assert type(location) == str, f"Location is not string, but type {type(location)}"
     assert (
-        type(stream) == BytesIO
-    ), f"Returned stream is not expected type BytesIO, but {type(stream)}"
+        type(stream) == SpooledTemporaryFile
+    ), f"Returned stream is not expected type SpooledTemporaryFile, but {type(stream)}"
     save_file = "excel_export_test.xlsx"
     with open(save_file, "wb") as f:
         f.write(stream.read())
@@ -1,5 +1,9 @@
+import numpy as np
+import pandas as pd
+
 from fleetmanager.fleet_simulation.util import fleet_simulator
 from fleetmanager.api.fleet_simulation.schemas import FleetSimulationOptions
+from fleetmanager.model.model import ConsequenceCalculator
 from fleetmanager.tests.fixtures.fleet_simulation_requests import simulation_request_naive, simulation_request_intelligent
 
 
@@ -69,3 +73,58 @@ def test_fleet_simulator_intelligent():
         == 0
     ), "Unallocated trips was above 0"
     assert 1 == 1, f"results {results}"
+
+
+def test_assignment_consequences(monkeypatch):
+    """
+    The vehicles of the trips are stored as indices into the vehicle table of the fleet. The consequences must equal
+    the ones computed trip by trip from the booked vehicles.
+    """
+    computed = []
+    compute = ConsequenceCalculator.compute
+
+    def record_compute(self, simulation, *args):
+        compute(self, simulation, *args)
+        computed.append((self, simulation))
+
+    monkeypatch.setattr(ConsequenceCalculator, "compute", record_compute)
+    request = simulation_request_naive.copy()
+    # bikes and a fleet too small for all the trips
+    request["simulation_vehicles"] = [
+        {"id": 202, "simulation_count": 1},
+        {"id": 407, "simulation_count": 2},
+        {"id": 408, "simulation_count": 2},
+    ]
+    results = fleet_simulator(FleetSimulationOptions(**request))
+    ((calculator, simulation),) = computed
+    trips = simulation.trips.trips
+    driving_book = pd.DataFrame(results["driving_book"])
+    co2_key = calculator.table_keys.index("CO2-udledning [kg]")
+
+    for state in ["current", "simulation"]:
+        assert trips[state].dtype == np.int32
+        vehicles = simulation.trips.vehicles[state]
+        co2 = 0
+        driven = {}
+        for trip in trips.itertuples():
+            if getattr(trip, f"{state}_type") == -1:
+                assert getattr(trip, state) == -1
+                continue
+            vehicle = vehicles[getattr(trip, state)]
+            co2_pr_km = 0 if pd.isna(vehicle.co2_pr_km) else vehicle.co2_pr_km
+            co2 += co2_pr_km * trip.distance
+            driven[vehicle] = driven.get(vehicle, 0) + trip.distance
+        assert calculator.consequence_table[f"{state[:3]}_values"][co2_key] == co2
+        # the employee car is stored first, then the used vehicles in the order of their first trip
+        assert [usage[1] for usage in calculator.store[state][1 : len(driven) + 1]] == [
+            round(distance) for distance in driven.values()
+        ]
+        assert driving_book[f"{state}_vehicle_name"].tolist() == [
+            "Ikke allokeret"
+            if assignment == -1
+            else f"{vehicles[assignment].make} {vehicles[assignment].model} "
+            f"{vehicles[assignment].name.split('_')[-1]} "
+            f"{vehicles[assignment].__dict__.get('plate', '')}"
+            for assignment in trips[state]
+        ]
+    assert (trips.simulation_type == -1).any()
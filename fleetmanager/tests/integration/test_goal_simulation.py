@@ -1,7 +1,21 @@
+import asyncio
+import copy
+import io
+from datetime import time
+
 import numpy as np
+import pandas as pd
+from celery import states
+from celery.backends.cache import CacheBackend
 
+from fleetmanager.api.goal_simulation.routes import get_goal_simulation
 from fleetmanager.api.goal_simulation.schemas import GoalSimulationOptions
-from fleetmanager.goal_simulation.util import goal_simulator
+from fleetmanager.export.util import media_types
+from fleetmanager.fleet_simulation import simulation_driving_book
+from fleetmanager.goal_simulation import util
+from fleetmanager.goal_simulation.util import automatic_simulator, goal_simulator
+from fleetmanager.model import genetic
+from fleetmanager.tasks import app
 from fleetmanager.tests.fixtures.goal_simulation_request import simulation_request
 
 
@@ -71,3 +85,63 @@ def test_goal_simulation_add():
         ]
     ), f"Solution results are not in expected " \
        f"type {[type(getattr(results.get('solutions')[0], key)) for key, value_type in key_types]}"
+
+
+def test_genetic_search_processes(monkeypatch):
+    """The bike scenarios are searched alike in process and in the search processes"""
+    searches = []
+
+    class RecordedSearch(genetic.AutomaticSimulation):
+        def run_search(self):
+            yield from super().run_search()
+            searches.append([
+                (solution["bike_count"], solution["fleet_list"], solution["fitness"])
+                for solution in self.all_solutions
+            ])
+
+        def run_solutions(self):
+            # the solutions are not evaluated, the test only concerns the search
+            return iter(())
+
+    monkeypatch.setattr(util, "get_engine", lambda name: RecordedSearch)
+    request = copy.deepcopy(simulation_request)
+    request["fixed_vehicles"] = []
+    # bikes that can take any trip, such that the bike counts make different scenarios
+    request["settings"]["bike_settings"].update(
+        max_km_pr_trip=100,
+        percentage_of_trips=100,
+        bike_speed=30,
+        electrical_bike_speed=40,
+        bike_slots=[{"bike_start": time(0, 0), "bike_end": time(23, 59)}],
+    )
+    for processes in (1, 2):
+        monkeypatch.setattr(genetic, "search_processes", processes)
+        automatic_simulator(GoalSimulationOptions(**request))
+
+    in_process, parallel = searches
+    assert in_process == parallel
+    bike_counts = [bike_count for bike_count, _, _ in parallel]
+    assert len(set(bike_counts)) > 1, "The search processes were not used for a single scenario"
+    assert bike_counts == sorted(bike_counts), "The solutions are not in scenario order"
+
+
+def test_goal_simulation_download(monkeypatch):
+    backend = CacheBackend(app=app, url="memory://")
+    monkeypatch.setattr(app._local, "backend", backend, raising=False)
+    results = automatic_simulator(GoalSimulationOptions(**simulation_request))
+    backend.store_result("goal simulation", results, states.SUCCESS)
+
+    for file_format in ("xlsx", "csv"):
+        response = get_goal_simulation(
+            "goal simulation", solution_index=0, sec_fetch_dest=None, download=True, file_format=file_format
+        )
+        assert response.headers["content-type"] == media_types[file_format]
+        assert response.headers["content-disposition"].endswith(f'.{file_format}"')
+
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    driving_book = pd.read_csv(io.BytesIO(asyncio.run(read())))
+    expected = simulation_driving_book(results["solutions"][0].results)
+    assert list(driving_book.columns) == list(expected.columns)
+    assert len(driving_book) == len(expected)
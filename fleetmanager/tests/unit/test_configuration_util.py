@@ -1,4 +1,7 @@
 from datetime import date, timedelta, datetime, time
+from io import BytesIO
+
+import pandas as pd
 
 from fleetmanager.api.configuration.schemas import (
     Vehicle,
@@ -19,6 +22,8 @@ from fleetmanager.configuration.util import (
     get_all_configurations_from_db,
     validate_settings,
     save_all_configurations,
+    update_vehicle_metadata,
+    validate_vehicle_metadata,
 )
 from fleetmanager.data_access import Cars, RoundTrips
 
@@ -255,3 +260,54 @@ def test_save_all_configuration(db_session):
             configuration_after_saving.shift_settings,
         )
     )
+
+
+def test_vehicle_metadata_upload(db_session):
+    car = get_single_vehicle(db_session, vehicle_id=202)
+    row = {
+        "id": 202,
+        "Nummerplade": car["plate"],
+        "Mærke": car["make"],
+        "Model": car["model"],
+        "Type": car["type"]["name"],
+        "Drivmiddel": car["fuel"]["name"],
+        "Wltp (Fossil)": car["wltp_fossil"],
+        "Wltp (El)": car["wltp_el"],
+        "Procentvis WLTP": car["capacity_decrease"],
+        "CO2 (g/km)": car["co2_pr_km"],
+        "Rækkevidde (km)": car["range"],
+        "Omk./år": 12345,
+        "Lokation": car["location"]["address"],
+        "Afdeling": car["department"],
+        "Forvaltning": "TMF",
+        "Start leasing": car["start_leasing"],
+        "Slut leasing": car["end_leasing"],
+        "Leasing type": car["leasing_type"]["name"],
+        "Kilometer pr/år": car["km_aar"],
+        "Hvile": car["sleep"],
+    }
+    rows = [
+        row,
+        {**row, "Lokation": "Ukendt"},
+        {**row, "Drivmiddel": "Ukendt", "Type": "Ukendt"},
+        {**row, "id": 999999},
+        {**row, "Omk./år": "dyr"},
+    ]
+    workbook = BytesIO()
+    pd.DataFrame(rows).to_excel(workbook, index=False)
+
+    validation, vehicles = validate_vehicle_metadata(db_session, workbook.getvalue())
+    assert validation == {
+        2: "ok",
+        3: "Fejl i: Lokation: Lokation eksisterer ikke",
+        4: "Fejl i: Drivmiddel",
+        5: "Ignoreres: Id ikke i database",
+        6: "Fejl i: Omk./år: value is not a valid float",
+    }
+
+    assert update_vehicle_metadata(db_session, {2: "ok", 5: validation[5]}, vehicles) == 1
+    db_session.expire_all()
+    updated_car = db_session.get(Cars, 202)
+    assert updated_car.omkostning_aar == 12345
+    assert updated_car.forvaltning == "TMF"
+    assert updated_car.plate == car["plate"]
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect, select, text
+
+from fleetmanager.data_access.db_engine import (
+    create_missing_indexes,
+    explain,
+    missing_indexes,
+    redundant_indexes,
+)
+from fleetmanager.data_access.dbschema import RoundTrips, Trips
+
+
+def test_create_missing_indexes(db_session):
+    engine = db_session.get_bind()
+    assert missing_indexes(engine) == []
+    query = select(RoundTrips.start_time, RoundTrips.distance).where(
+        RoundTrips.start_location_id == 1, RoundTrips.start_time >= "2022-01-01"
+    )
+
+    # an existing database from before the index was declared
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_roundtrips_start_location_id_start_time_end_time"))
+    assert [index.name for index in missing_indexes(engine)] == [
+        "ix_roundtrips_start_location_id_start_time_end_time"
+    ]
+    assert "ix_roundtrips_start_location_id_start_time_end_time" not in " ".join(explain(engine, query))
+
+    assert create_missing_indexes(engine) == ["ix_roundtrips_start_location_id_start_time_end_time"]
+    assert missing_indexes(engine) == []
+    assert "ix_roundtrips_start_location_id_start_time_end_time" in " ".join(explain(engine, query))
+
+
+def test_drop_redundant_indexes(db_session):
+    engine = db_session.get_bind()
+    assert redundant_indexes(engine) == []
+
+    # a database from before the composite vehicle index, with the single column index of the vehicle
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_roundtrips_car_id_start_time_end_time"))
+        connection.execute(text("CREATE INDEX ix_roundtrips_car_id ON roundtrips (car_id)"))
+        connection.execute(text("CREATE INDEX ix_trips_car_id ON trips (car_id)"))
+    # the roundtrip index is kept until the composite index exists
+    assert [index.name for index in redundant_indexes(engine)] == ["ix_trips_car_id"]
+
+    assert create_missing_indexes(engine) == ["ix_roundtrips_car_id_start_time_end_time"]
+    assert redundant_indexes(engine) == []
+    indexes = {
+        index["name"]
+        for table in (RoundTrips, Trips)
+        for index in inspect(engine).get_indexes(table.__tablename__)
+    }
+    assert not indexes & {"ix_roundtrips_car_id", "ix_trips_car_id"}
+    query = select(RoundTrips.start_time).where(RoundTrips.car_id == 202)
+    assert "ix_roundtrips_car_id_start_time_end_time" in " ".join(explain(engine, query))
@@ -0,0 +1,110 @@
+import json
+import time
+from functools import partial
+
+from fleetmanager.extractors import http
+from fleetmanager.extractors.http import (
+    RateLimiter,
+    TokenBucket,
+    fetch_all,
+    fetch_pages,
+    request,
+    request_async,
+)
+from fleetmanager.extractors.skyhost.parsers import DrivingBook
+from fleetmanager.extractors.skyhost.soap_agent import SoapAgent
+from fleetmanager.tests.fixtures.skyhost_response import mileage_response
+from fleetmanager.tests.fixtures.stub_server import StubServer
+
+
+def test_token_bucket():
+    bucket = TokenBucket(capacity=10, period=1)
+    assert bucket.reserve(10) == 0
+    assert 0.4 < bucket.reserve(5) <= 0.5
+
+    limiter = RateLimiter([(100, 1), (1000, 60)])
+    waits = [limiter.reserve(100) for _ in range(11)]
+    assert waits[0] == 0
+    # the minute bucket is empty after 10 calls of 100 points
+    assert waits[-1] > 5
+
+
+def test_retry_after(monkeypatch):
+    monkeypatch.setattr(http, "max_retries", 2)
+    with StubServer() as server:
+        server.add("/trips", status=429, headers={"Retry-After": "0"})
+        server.add("/trips", json.dumps({"trips": [1]}))
+        response = request("GET", f"{server.url}/trips", provider="stub")
+    assert response.status_code == 200
+    assert response.json() == {"trips": [1]}
+    assert len(server.requests) == 2
+
+
+def test_fetch_all_order():
+    with StubServer() as server:
+        for k in range(5):
+            server.add(f"/period/{k}", json.dumps({"period": k}))
+        start = time.time()
+        responses = fetch_all(
+            [
+                partial(request_async, method="GET", uri=f"{server.url}/period/{k}", provider="stub")
+                for k in range(5)
+            ]
+        )
+    assert [response.json()["period"] for response in responses] == list(range(5))
+    assert time.time() - start < 5
+
+
+def test_fetch_pages():
+    def next_page(response):
+        next_link = response.json().get("next")
+        return None if next_link is None else {"uri": next_link}
+
+    with StubServer() as server:
+        server.add("/trips", json.dumps({"trips": [1], "next": f"{server.url}/trips/2"}))
+        server.add("/trips/2", json.dumps({"trips": [2]}))
+        (pages,) = fetch_all(
+            [
+                partial(
+                    fetch_pages,
+                    uri=f"{server.url}/trips",
+                    provider="stub",
+                    next_page=next_page,
+                    params={"from": "2023-01-01"},
+                )
+            ]
+        )
+    assert [trip for page in pages for trip in page.json()["trips"]] == [1, 2]
+    assert all("from=2023-01-01" in path for _, path, _ in server.requests)
+
+
+def test_replay_skyhost_fixture():
+    with StubServer() as server:
+        server.add("/soap/basic.svc", mileage_response)
+        response = request("POST", f"{server.url}/soap/basic.svc", provider="stub", content="<s:Envelope/>")
+    driving_book = DrivingBook()
+    driving_book.parse(response.text)
+    assert len(driving_book.frame) == 6
+    assert server.requests[0][2] == b"<s:Envelope/>"
+
+
+def test_soap_agent_retries():
+    sequence_response = (
+        '<s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope"><s:Body>'
+        "<CreateSequenceResponse><Identifier>urn:uuid:sequence</Identifier></CreateSequenceResponse>"
+        "</s:Body></s:Envelope>"
+    )
+    with StubServer() as server:
+        server.add("/soap/basic.svc", sequence_response)
+        server.add("/soap/basic.svc", status=503, headers={"Retry-After": "0"})
+        server.add("/soap/basic.svc", "")
+        server.add("/soap/basic.svc", status=429, headers={"Retry-After": "0"})
+        server.add("/soap/basic.svc", mileage_response)
+        agent = SoapAgent("retry-key", base_service=f"{server.url}/soap/basic.svc")
+        response = agent.execute_action("Trackers_GetMilageLog", {"TrackerID": 1})
+    assert response.status_code == 200
+    assert len(server.requests) == 5
+    assert agent.sequence_id == "urn:uuid:sequence"
+    # every attempt is charged to the minute bucket of the api key, 100 points for each of the 5 calls
+    minute_bucket = http.get_rate_limiter("skyhost_soap", key="retry-key").buckets[-1]
+    assert minute_bucket.tokens < 600
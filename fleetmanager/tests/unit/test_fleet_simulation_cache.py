@@ -0,0 +1,92 @@
+import copy
+from datetime import datetime
+
+from celery import states
+from celery.backends.cache import CacheBackend
+from sqlalchemy import insert
+
+from fleetmanager.api.fleet_simulation.schemas import FleetSimulationOptions
+from fleetmanager.data_access import bump_data_generation
+from fleetmanager.data_access.dbschema import Cars, RoundTrips
+from fleetmanager.fleet_simulation.util import (
+    SimulationCache,
+    cached_simulation,
+    simulation_cache_key,
+)
+from fleetmanager.tasks import app
+from fleetmanager.tests.fixtures.fleet_simulation_requests import simulation_request_naive
+
+
+def test_simulation_cache_key(db_session):
+    request = copy.deepcopy(simulation_request_naive)
+    key = simulation_cache_key(db_session, FleetSimulationOptions(**request))
+
+    request["current_vehicles"] = request["current_vehicles"][::-1]
+    request["simulation_vehicles"] = request["simulation_vehicles"][::-1]
+    assert simulation_cache_key(db_session, FleetSimulationOptions(**request)) == key
+
+    request["end_date"] = datetime(2023, 8, 9)
+    assert simulation_cache_key(db_session, FleetSimulationOptions(**request)) != key
+    request["end_date"] = simulation_request_naive["end_date"]
+
+    # new roundtrips on the location
+    db_session.execute(
+        insert(RoundTrips).values(
+            start_time=datetime(2023, 1, 1, 8),
+            end_time=datetime(2023, 1, 1, 9),
+            distance=10,
+            start_location_id=1,
+            car_id=request["current_vehicles"][0],
+        )
+    )
+    db_session.commit()
+    new_key = simulation_cache_key(db_session, FleetSimulationOptions(**request))
+    assert new_key != key
+
+    # changed vehicle
+    vehicle = db_session.get(Cars, request["current_vehicles"][0])
+    vehicle.omkostning_aar = (vehicle.omkostning_aar or 0) + 1
+    bump_data_generation(db_session)
+    db_session.commit()
+    assert simulation_cache_key(db_session, FleetSimulationOptions(**request)) != new_key
+
+
+def test_simulation_cache():
+    cache = SimulationCache(size=2)
+    cache.put("a", "task a")
+    cache.put("b", "task b")
+    assert cache.get("a") == "task a"
+    # b is the least recently used
+    cache.put("c", "task c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "task a"
+    assert cache.get("c") == "task c"
+    cache.discard("a")
+    assert cache.get("a") is None
+
+    expired = SimulationCache(size=2, max_age=0)
+    expired.put("a", "task a")
+    assert expired.get("a") is None
+
+
+def test_cached_simulation(monkeypatch):
+    backend = CacheBackend(app=app, url="memory://")
+    monkeypatch.setattr(app._local, "backend", backend, raising=False)
+    cache = SimulationCache(size=8)
+    for key, state in [
+        ("started", states.STARTED),
+        ("done", states.SUCCESS),
+        ("failed", states.FAILURE),
+        ("revoked", states.REVOKED),
+    ]:
+        backend.store_result(f"task {key}", None if state != states.FAILURE else ValueError(), state)
+        cache.put(key, f"task {key}")
+    # the worker of the task died before the task was started
+    cache.put("lost", "task lost")
+
+    assert cached_simulation(cache, "started").id == "task started"
+    assert cached_simulation(cache, "done").id == "task done"
+    for key in ("failed", "revoked", "lost"):
+        assert cached_simulation(cache, key) is None
+        assert cache.get(key) is None
+    assert cached_simulation(cache, "missing") is None
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fleetmanager.model import engines
+
+# seconds the api may take to import, including the bootstrap of the in memory database
+import_budget = float(os.getenv("API_IMPORT_BUDGET", 4))
+
+
+def test_api_import_budget():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import fleetmanager.api\n"
+        "print(time.perf_counter() - start)\n"
+        "print(','.join(m for m in ('ortools', 'deap', 'sklearn', 'fleetmanager.extractors.skyhost.updatedb') "
+        "if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.split("\n")
+    assert output[1] == "", f"The api imports the solver modules {output[1]}"
+    assert float(output[0]) < import_budget
+
+
+def test_engine_registry():
+    engines.register_engine("test", "fleetmanager.model.tco_calculator:TCOCalculator")
+    try:
+        from fleetmanager.model.tco_calculator import TCOCalculator
+
+        assert engines.get_engine("test") is TCOCalculator
+        engines.register_engine("test", "fleetmanager.model.vehicle:VehicleFactory")
+        assert engines.get_engine("test").__name__ == "VehicleFactory"
+    finally:
+        engines.engines.pop("test")
+        engines._loaded.pop("test", None)
+    with pytest.raises(KeyError):
+        engines.get_engine("test")
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from celery.backends.cache import CacheBackend
+
+from fleetmanager.api.location.schemas import AllowedStart, PrecisionTestOptions
+from fleetmanager.location.util import precision_test_cars, precision_test_results
+from fleetmanager.tasks import celery as tasks
+
+
+def test_precision_test_results():
+    test_specific_start = AllowedStart(id=1, address="", latitude=56.1, longitude=10.2)
+    results = precision_test_results(
+        [
+            {"car_id": 1, "precision": 0.5, "kilometers": 100},
+            None,  # a car that was not found by the extractors
+            {"car_id": 2, "precision": 1, "kilometers": 300},
+            {"car_id": 3, "precision": 0, "kilometers": 0},
+        ],
+        location=1,
+        test_specific_start=test_specific_start,
+        start_date=datetime(2023, 1, 1),
+    )
+    assert results.km == 400
+    assert results.roundtrip_km == 350
+    assert results.precision == 350 / 400
+
+    empty = precision_test_results([], 1, test_specific_start, datetime(2023, 1, 1))
+    assert empty.precision == 0
+
+
+def test_precision_test_cars(db_session):
+    cars = precision_test_cars(db_session, location=1)
+    assert cars
+    car_ids = [cars[0].id]
+    assert [car.id for car in precision_test_cars(db_session, 1, car_ids)] == car_ids
+
+
+class RecordingBackend(CacheBackend):
+    """In memory result backend that records the states stored for the tasks"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stored = []
+
+    def store_result(self, task_id, result, state, *args, **kwargs):
+        self.stored.append((task_id, state, result))
+        return super().store_result(task_id, result, state, *args, **kwargs)
+
+
+def test_precision_location_test(db_session, monkeypatch, tmp_path):
+    backend = RecordingBackend(app=tasks.app, url="memory://")
+    monkeypatch.setattr(tasks.app._local, "backend", backend, raising=False)
+    monkeypatch.setattr(tasks.app.conf, "task_always_eager", True)
+    monkeypatch.setattr(tasks.app.conf, "task_store_eager_result", True)
+    monkeypatch.setattr(tasks, "engine_creator", db_session.get_bind)
+    monkeypatch.setattr(tasks, "precision_test_path", lambda test_name: str(tmp_path / f"{test_name}.txt"))
+    # the car tests find every car with half of its 10 km driven in the roundtrips
+    monkeypatch.setattr(
+        tasks,
+        "precision_test_car",
+        lambda car_id, **kwargs: {"car_id": car_id, "precision": 0.5, "kilometers": 10},
+    )
+    settings = PrecisionTestOptions(
+        location=1,
+        test_specific_start=AllowedStart(id=1, address="", latitude=56.1, longitude=10.2),
+        start_date=datetime(2023, 1, 1),
+        extractors=["skyhost"],
+        test_name="precision",
+    )
+    cars = len(precision_test_cars(db_session, location=1))
+
+    test_path = tmp_path / "precision.txt"
+    test_path.touch()
+    tasks.run_precision_location_test.apply(args=(settings,), task_id="test")
+    progress = [result["progress"] for task_id, state, result in backend.stored if state == "PROGRESS"]
+    assert progress == [k / cars for k in range(cars + 1)]
+    meta = backend.get_task_meta("test")
+    assert meta["status"] == "SUCCESS"
+    assert meta["result"].km == 10 * cars
+    assert meta["result"].precision == 0.5
+    # the reduction removes the running task file
+    assert not test_path.exists()
+
+    # a test cancelled before the car tests reduces to an empty result
+    tasks.run_precision_location_test.apply(args=(settings,), task_id="cancelled")
+    meta = backend.get_task_meta("cancelled")
+    assert meta["status"] == "SUCCESS"
+    assert meta["result"].km == 0
+
+    # a test cancelled after the check of the reduction
+    monkeypatch.setattr(tasks, "precision_test_cancelled", lambda settings: False)
+    tasks.run_precision_location_test.apply(args=(settings,), task_id="late")
+    assert backend.get_task_meta("late")["status"] == "SUCCESS"
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from fleetmanager.data_access import RoundTrips, RoundTripSegments, data_watermark
+from fleetmanager.extractors.maintenance import (
+    clean_roundtrips,
+    duplicate_roundtrips,
+    purge_roundtrips,
+    remove_duplicate_roundtrips,
+)
+
+
+def test_clean_roundtrips(db_session):
+    session_maker = sessionmaker(bind=db_session.get_bind())
+    roundtrips = db_session.scalar(select(func.count(RoundTrips.id)))
+    assert duplicate_roundtrips(db_session) == []
+
+    # a roundtrip and two copies, with segments
+    original, *copies = [
+        db_session.execute(
+            insert(RoundTrips).values(
+                start_time=datetime(2023, 6, 1, 8),
+                end_time=datetime(2023, 6, 1, 9),
+                distance=10,
+                start_location_id=1,
+                car_id=202,
+            )
+        ).inserted_primary_key[0]
+        for _ in range(3)
+    ]
+    for copy in [original] + copies:
+        db_session.execute(
+            insert(RoundTripSegments).values(distance=1, round_trip_id=copy)
+        )
+    db_session.commit()
+
+    assert duplicate_roundtrips(db_session) == copies
+    assert remove_duplicate_roundtrips(session_maker, size=1) == 2
+    db_session.expire_all()
+    assert db_session.scalar(select(func.count(RoundTrips.id))) == roundtrips + 1
+    assert db_session.get(RoundTrips, original) is not None
+    assert not db_session.scalars(
+        select(RoundTripSegments.id).where(RoundTripSegments.round_trip_id.in_(copies))
+    ).all()
+
+    # the retention purge
+    before = datetime(2022, 3, 2)
+    old = db_session.scalar(
+        select(func.count(RoundTrips.id)).where(RoundTrips.start_time < before)
+    )
+    assert 0 < old < roundtrips
+    assert purge_roundtrips(session_maker, before, size=7) == old
+    assert db_session.scalar(select(func.count(RoundTrips.id))) == roundtrips + 1 - old
+    assert (
+        db_session.scalar(
+            select(func.count(RoundTripSegments.id))
+            .outerjoin(RoundTrips, RoundTrips.id == RoundTripSegments.round_trip_id)
+            .where(RoundTrips.id.is_(None))
+        )
+        == 0
+    )
+
+
+def test_clean_roundtrips_watermark(db_session):
+    session_maker = sessionmaker(bind=db_session.get_bind())
+    _, generation = data_watermark(db_session)
+    # the removed roundtrips do not lower the last roundtrip id, the generation is bumped instead
+    clean_roundtrips(session_maker)
+    assert data_watermark(db_session)[1] == generation + 1
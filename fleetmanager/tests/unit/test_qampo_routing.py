@@ -0,0 +1,104 @@
+import itertools
+import random
+from datetime import datetime
+
+from fleetmanager.model.qampo.classes import BaseVehicle, Trip, Vehicle
+from fleetmanager.model.qampo.helper_functions import (
+    identical_vehicle_groups,
+    maximal_overlap_cliques,
+)
+from fleetmanager.model.qampo.instance_generator import generate_trips
+from fleetmanager.model.qampo.routing_cp import RoutingCp
+from fleetmanager.model.qampo.routing_greedy import RoutingGreedy
+from fleetmanager.model.qampo.routing_mip import RoutingMip
+from fleetmanager.model.qampo.warm_start import greedy_warm_start
+
+
+def test_maximal_overlap_cliques():
+    random.seed(42)
+    trips = generate_trips(6, 18, 80, 1, 30).trips
+    cliques = maximal_overlap_cliques(trips)
+    assert len(cliques) <= len(trips)
+
+    # the cliques cover exactly the overlapping pairs of trips
+    overlapping = {
+        (first, second)
+        for first, second in itertools.combinations(range(len(trips)), 2)
+        if max(trips[first].start_time, trips[second].start_time)
+        < min(trips[first].end_time, trips[second].end_time)
+    }
+    covered = {pair for clique in cliques for pair in itertools.combinations(clique, 2)}
+    assert covered == overlapping
+
+
+def test_routing_overlapping_trips():
+    # trip 1 overlaps trip 0 and 2, trip 0 ends when trip 2 starts
+    trips = [
+        Trip(
+            id=k,
+            start_time=datetime(2023, 1, 1, start),
+            end_time=datetime(2023, 1, 1, end),
+            length_in_kilometers=10,
+        )
+        for k, (start, end) in enumerate([(8, 10), (9, 11), (10, 12)])
+    ]
+    vehicles = [
+        Vehicle(
+            id=k,
+            variable_cost_per_kilometer=1,
+            co2_emission_gram_per_kilometer=0,
+            range_in_kilometers=100,
+            maximum_driving_in_minutes=600,
+        )
+        for k in range(2)
+    ]
+    employee_car = BaseVehicle(
+        variable_cost_per_kilometer=5, co2_emission_gram_per_kilometer=0
+    )
+    for algorithm in (RoutingMip(), RoutingCp()):
+        route_plan = algorithm.optimize_single_day(trips, vehicles[:1], employee_car)
+        assert route_plan.total_cost == 20 + 50
+        route_plan = algorithm.optimize_single_day(trips, vehicles, employee_car)
+        assert route_plan.total_cost == 30
+
+
+def test_warm_start_identical_vehicles():
+    random.seed(7)
+    trips = generate_trips(6, 18, 16, 1, 30).trips
+    # two groups of identical vehicles
+    vehicles = [
+        Vehicle(
+            id=k,
+            variable_cost_per_kilometer=1 + k % 2,
+            co2_emission_gram_per_kilometer=0,
+            range_in_kilometers=100,
+            maximum_driving_in_minutes=600,
+        )
+        for k in range(4)
+    ]
+    employee_car = BaseVehicle(
+        variable_cost_per_kilometer=5, co2_emission_gram_per_kilometer=0
+    )
+    groups = identical_vehicle_groups(vehicles)
+    assert groups == [[0, 2], [1, 3]]
+
+    # the greedy solution is a hint satisfying the symmetry breaking, i.e. the kilometers are non-increasing in a group
+    lengths = [trip.length_in_kilometers for trip in trips]
+    hint = greedy_warm_start(trips, vehicles, employee_car, groups, lengths)
+    for group in groups:
+        kilometers = [
+            sum(lengths[j] for j, i in enumerate(hint) if i == vehicle)
+            for vehicle in group
+        ]
+        assert kilometers == sorted(kilometers, reverse=True)
+
+    greedy = RoutingGreedy().optimize_single_day(trips, vehicles, employee_car)
+    for algorithm in (RoutingMip(), RoutingCp()):
+        exact = algorithm.optimize_single_day(
+            trips, vehicles, employee_car, break_symmetry=True
+        )
+        cold = algorithm.optimize_single_day(
+            trips, vehicles, employee_car, warm_start=False
+        )
+        assert exact.total_cost <= greedy.total_cost + 1e-6
+        assert abs(exact.total_cost - cold.total_cost) < 1e-6
@@ -0,0 +1,108 @@
+import os
+import pickle
+from datetime import date, datetime
+from fnmatch import fnmatch
+
+import pandas as pd
+import pytest
+from redis.exceptions import ResponseError
+
+from fleetmanager.api.fleet_simulation.schemas import FleetSimulationOptions
+from fleetmanager.data_access.serialization import codec_version, decode, encode, magic
+from fleetmanager.fleet_simulation import load_fleet_simulation_history
+from fleetmanager.tasks import app
+from fleetmanager.tests.fixtures.fleet_simulation_requests import simulation_request_naive
+from fleetmanager.tests.fixtures.fleet_simulation_results import results
+
+
+def test_result_codec():
+    result = {
+        **results["result"],
+        "simulation_options": FleetSimulationOptions(**simulation_request_naive),
+        "unallocated_pr_day": [
+            {"date": pd.Timestamp("2022-03-01"), "Antal ikke allokeret": 0.0},
+            {"date": pd.Timestamp("2022-03-02"), "Antal ikke allokeret": 1.0},
+        ],
+    }
+    meta = {
+        "status": "SUCCESS",
+        "result": result,
+        "args": [result["simulation_options"], datetime(2022, 3, 1, 8)],
+        "kwargs": {},
+        "date_done": "2022-03-01T08:00:00",
+    }
+    payload = encode(meta)
+    assert payload.startswith(magic + bytes([codec_version]))
+    assert len(payload) < len(pickle.dumps(meta)) / 3
+
+    decoded = decode(payload)
+    assert decoded == meta
+    assert isinstance(decoded["result"]["simulation_options"], FleetSimulationOptions)
+    assert isinstance(decoded["result"]["simulation_options"].start_date, date)
+    assert isinstance(decoded["result"]["unallocated_pr_day"][0]["date"], pd.Timestamp)
+
+    # the result backend decodes the results stored by the codec and the legacy pickled results
+    assert app.backend.decode(app.backend.encode(meta)) == meta
+    assert app.backend.decode(pickle.dumps(meta)) == meta
+
+    with pytest.raises(ValueError):
+        decode(magic + bytes([codec_version + 1]) + payload[len(magic) + 1 :])
+
+
+@pytest.mark.parametrize(
+    "value",
+    [[{}, {}], [{}, {}, {}], {"usage": [{}, {}]}, [{"km": 1}, {"km": 2}], [{"km": 1}, {}]],
+)
+def test_records_codec(value):
+    assert decode(encode(value)) == value
+
+
+class ResultBackend:
+    """The keys of a redis result backend, sets stand in for the sorted sets of the chords"""
+
+    def __init__(self, values: dict):
+        self.values = values
+
+    def scan_iter(self, match="*"):
+        return (key for key in list(self.values) if fnmatch(key, match))
+
+    def keys(self, pattern="*"):
+        return list(self.scan_iter(pattern))
+
+    def get(self, key):
+        value = self.values.get(key)
+        if isinstance(value, set):
+            raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+
+def test_simulation_history(db_session):
+    simulation_options = FleetSimulationOptions(**simulation_request_naive)
+    group_id = "2b1c6f0e-group"
+    # the group as the result backend saves it, see GroupResult.as_tuple
+    car_tests = ((group_id, None), [((f"car-test-{k}", None), None) for k in range(3)])
+    backend = ResultBackend(
+        {
+            "celery-task-meta-simulation": encode(
+                {
+                    "status": "SUCCESS",
+                    "name": "fleetmanager.tasks.celery.run_fleet_simulation",
+                    "queue": os.getenv("CELERY_QUEUE"),
+                    "task_id": "simulation",
+                    "date_done": "2022-03-01T08:00:00",
+                    "result": {"simulation_options": simulation_options},
+                }
+            ),
+            "celery-task-meta-precision-test": encode(
+                {"status": "PROGRESS", "result": {"progress": 0.5, "test_name": "test"}}
+            ),
+            # a precision test running as a chord, the saved group of the car tests and the chord counters
+            f"celery-taskset-meta-{group_id}": encode({"result": car_tests}),
+            f"celery-taskset-meta-{group_id}.s": b"5",
+            f"celery-taskset-meta-{group_id}.j": {b"car-test-0"},
+            "celery-task-meta-unreadable": b"5",
+        }
+    )
+    history = load_fleet_simulation_history(db_session, backend)
+    assert [simulation.id for simulation in history] == ["simulation"]
+    assert history[0].start_date == str(simulation_options.start_date)
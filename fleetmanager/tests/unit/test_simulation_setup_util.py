@@ -1,7 +1,17 @@
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 
-from fleetmanager.configuration.util import move_vehicle
-from fleetmanager.simulation_setup.util import get_location_vehicles
+from sqlalchemy import StaticPool, create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from fleetmanager.configuration.util import move_vehicle, save_simulation_settings
+from fleetmanager.data_access import bump_data_generation
+from fleetmanager.data_access.db_engine import create_defaults
+from fleetmanager.data_access.dbschema import Base, Cars, RoundTrips, SimulationSettings
+from fleetmanager.simulation_setup import util
+from fleetmanager.simulation_setup.util import (
+    get_location_vehicles,
+    get_location_vehicles_loc,
+)
 
 
 def test_get_location_vehicles(db_session):
@@ -103,3 +113,70 @@ def test_get_location_vehicles(db_session):
     assert (
         vehicle_location_2_277.status == "notActive"
     ), 'Vehicle 277 did not have the expected "notActive" status'
+
+
+def test_location_vehicles_memo(db_session):
+    start = date(2022, 3, 1)
+    end = date(2023, 5, 1)
+
+    location_vehicles = get_location_vehicles_loc(db_session, start, end, [2])
+    assert get_location_vehicles_loc(db_session, start, end, [2]) is location_vehicles
+
+    # a vehicle edit starts a new generation
+    vehicle = db_session.get(Cars, 333)
+    vehicle.omkostning_aar = None
+    bump_data_generation(db_session)
+    db_session.commit()
+    edited = get_location_vehicles_loc(db_session, start, end, [2])
+    assert edited is not location_vehicles
+    assert next(
+        vehicle for vehicle in edited.locations[0].vehicles if vehicle.id == 333
+    ).status == "dataMissing"
+
+    # as does a new roundtrip
+    db_session.execute(
+        insert(RoundTrips).values(
+            start_time=datetime(2022, 4, 1, 8),
+            end_time=datetime(2022, 4, 1, 9),
+            distance=10,
+            start_location_id=2,
+            car_id=333,
+        )
+    )
+    db_session.commit()
+    added = get_location_vehicles_loc(db_session, start, end, [2])
+    assert added is not edited
+
+    # and removed roundtrips
+    move_vehicle(db_session, 333, date(2023, 1, 1), delete=True)
+    assert get_location_vehicles_loc(db_session, start, end, [2]) is not added
+
+    # and the name fields of the vehicles
+    removed = get_location_vehicles_loc(db_session, start, end, [2])
+    db_session.add(SimulationSettings(id=None, name="name_fields", value="['plate']", type="list"))
+    db_session.commit()
+    save_simulation_settings(db_session, {"name_fields": "['make']"})
+    renamed = get_location_vehicles_loc(db_session, start, end, [2])
+    assert renamed is not removed
+    vehicle = renamed.locations[0].vehicles[0]
+    assert vehicle.name == (db_session.get(Cars, vehicle.id).make or "")
+
+
+def test_location_vehicles_memo_databases(db_session, monkeypatch):
+    start = date(2022, 3, 1)
+    end = date(2023, 5, 1)
+    # an empty database at the same watermark
+    monkeypatch.setattr(util, "data_watermark", lambda session: (None, 0))
+    engine = create_engine(
+        "sqlite:///file:fleetdb_empty?mode=memory&cache=shared&uri=true",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    create_defaults(engine)
+
+    location_vehicles = get_location_vehicles_loc(db_session, start, end, [2])
+    with sessionmaker(bind=engine)() as session:
+        empty = get_location_vehicles_loc(session, start, end, [2])
+    assert empty is not location_vehicles
+    assert get_location_vehicles_loc(db_session, start, end, [2]) is location_vehicles
@@ -1,6 +1,9 @@
+from io import BytesIO
+
 import pandas as pd
 
 from fleetmanager.extractors.skyhost.parsers import Trackers, DrivingBook
+from fleetmanager.extractors.skyhost.soap_agent import compile_template, render_template
 from fleetmanager.tests.fixtures.skyhost_response import tracker_response, mileage_response
 
 
@@ -19,3 +22,25 @@ def test_driving_book_parser():
     assert type(driving_book.frame) == pd.DataFrame
     assert len(driving_book.frame) == 6
     assert all(map(lambda key: key in driving_book.frame.columns, ["StopPos_sLat", "StartPos_sLon", "ID"]))
+
+
+def test_driving_book_streaming():
+    driving_book = DrivingBook()
+    driving_book.parse(mileage_response)
+    records = DrivingBook().iter_records(BytesIO(mileage_response.encode("utf-8")))
+    first = next(records)
+    assert first == driving_book.frame.iloc[0].dropna().to_dict()
+    assert len(list(records)) == 5
+
+
+def test_render_template():
+    body = render_template(
+        "loginWithApiKey.xml",
+        sequence_id="urn:uuid:sequence",
+        message_id="urn:uuid:message",
+        api_key="key&<",
+    )
+    assert "<apiKey>key&amp;&lt;</apiKey>" in body
+    assert "<r:Identifier>urn:uuid:sequence</r:Identifier>" in body
+    assert compile_template("loginWithApiKey.xml") is compile_template("loginWithApiKey.xml")
+
@@ -1,5 +1,6 @@
 from datetime import date, datetime, time, timedelta
 from io import BytesIO
+from tempfile import SpooledTemporaryFile
 
 import pandas as pd
 
@@ -10,7 +11,9 @@ from fleetmanager.statistics.util import (
     total_driven,
     daily_driving,
     driving_data_to_excel,
+    driving_data_to_frame,
 )
+from fleetmanager.export import frame_to_file, iter_file
 
 start_date = date(2022, 3, 1)
 end_date = date(2022, 3, 31)
@@ -159,8 +162,8 @@ def test_daily_driving_and_export(db_session):
 
     stream = driving_data_to_excel(response, 40)
     assert (
-        type(stream) == BytesIO
-    ), f"Returned stream is not expected type BytesIO, but {type(stream)}"
+        type(stream) == SpooledTemporaryFile
+    ), f"Returned stream is not expected type SpooledTemporaryFile, but {type(stream)}"
     save_file = "excel_export_activity.xlsx"
     with open(save_file, "wb") as f:
         f.write(stream.read())
@@ -169,3 +172,21 @@ def test_daily_driving_and_export(db_session):
     assert saved_file.iloc[3, 1] == 8
     assert saved_file.iloc[2, 0] == 19.4
     assert saved_file.iloc[34, 22] == 37.1
+
+
+def test_daily_driving_csv_export(db_session):
+    response = daily_driving(
+        db_session,
+        start_date=datetime.combine(start_date, time(0, 0, 0)),
+        end_date=datetime.combine(end_date, time(0, 0, 0)) + extra_day,
+        locations=[1, 2, 3],
+    )
+
+    frame = driving_data_to_frame(response)
+    stream = frame_to_file(frame, "csv")
+    content = b"".join(iter_file(stream, chunk_size=1024))
+    assert stream.closed, "Export file was not closed after streaming"
+
+    saved_file = pd.read_csv(BytesIO(content))
+    assert len(saved_file) == len(frame)
+    assert round(saved_file.distance.sum(), 1) == round(frame.distance.sum(), 1)
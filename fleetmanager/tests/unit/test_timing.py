@@ -0,0 +1,38 @@
+from fleetmanager.model.timing import (
+    collect_timings,
+    current_timings,
+    openmetrics,
+    stage,
+    timed_stage,
+)
+
+
+@timed_stage("squares", rows=len)
+def squares(n):
+    return [i * i for i in range(n)]
+
+
+def test_timings():
+    # stages outside a collection are not recorded
+    assert squares(3) == [0, 1, 4]
+    assert current_timings() is None
+
+    with collect_timings() as timings:
+        with stage("outer") as span:
+            squares(10)
+            squares(5)
+            span.rows = 2
+        assert list(current_timings()) == ["squares", "outer"]
+    assert current_timings() is None
+
+    measured = timings.as_dict()
+    assert measured["squares"]["calls"] == 2
+    assert measured["squares"]["rows"] == 15
+    assert measured["outer"]["rows"] == 2
+    assert measured["outer"]["wall_seconds"] >= measured["squares"]["wall_seconds"] >= 0
+    assert measured["outer"]["peak_rss_bytes"] > 0
+
+    text = openmetrics(measured, simulation='a"b')
+    assert text.endswith("# EOF\n")
+    assert "# UNIT fleetmanager_stage_wall_seconds seconds" in text
+    assert 'fleetmanager_stage_rows{simulation="a\\"b",stage="squares"} 15' in text
@@ -0,0 +1,52 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from fleetmanager.model.trip_generator import concurrency_profile
+
+
+def test_concurrency_profile():
+    rng = np.random.default_rng(42)
+    start_times = [
+        datetime(2023, 1, 1) + timedelta(minutes=int(minutes))
+        for minutes in rng.integers(0, 60 * 24 * 4, 200)
+    ]
+    trips = pd.DataFrame(
+        {
+            "start_time": start_times,
+            "end_time": [
+                start + timedelta(minutes=int(duration))
+                for start, duration in zip(start_times, rng.integers(1, 300, 200))
+            ],
+        }
+    )
+    profile = concurrency_profile(trips, sub_time=5)
+
+    # count the trips running at each minute
+    minutes = pd.date_range("2023-01-01", "2023-01-06", freq="1min")
+    starts = trips.start_time.values
+    ends = (trips.end_time + pd.Timedelta(minutes=5)).values
+    running = np.array(
+        [((starts <= minute) & (ends >= minute)).sum() for minute in minutes.values]
+    )
+    assert profile.peak == running.max()
+    assert running[minutes.get_loc(profile.peak_time)] == profile.peak
+    daily = pd.Series(running, index=minutes.date).groupby(level=0).max()
+    assert (daily.reindex(profile.daily.index) == profile.daily).all()
+
+
+def test_concurrency_profile_sub_time():
+    trips = pd.DataFrame(
+        {
+            "start_time": [datetime(2023, 1, 1, 8), datetime(2023, 1, 1, 9, 5)],
+            "end_time": [datetime(2023, 1, 1, 9), datetime(2023, 1, 2, 1)],
+        }
+    )
+    assert concurrency_profile(trips).peak == 1
+    # a vehicle is not available until sub_time after the end of the trip
+    profile = concurrency_profile(trips, sub_time=5)
+    assert profile.peak == 2
+    assert profile.peak_time == datetime(2023, 1, 1, 9, 5)
+    assert profile.daily.to_dict() == {date(2023, 1, 1): 2, date(2023, 1, 2): 1}
+    assert concurrency_profile(trips.iloc[:0]).peak == 0
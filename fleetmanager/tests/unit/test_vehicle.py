@@ -0,0 +1,345 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fleetmanager.model import model
+from fleetmanager.model.model import Simulation, Trips
+from fleetmanager.model.qampo.classes import AlgorithmParameters
+from fleetmanager.model.vehicle import (
+    Bike,
+    ElectricBike,
+    ElectricCar,
+    FleetInventory,
+    FleetPool,
+    SlotBookings,
+    VehicleFactory,
+    VehicleModel,
+)
+
+
+def reference_bike_accepts(trip, bike, speed: float) -> bool:
+    """The static checks of the per trip acceptance of the bikes before the vectorized acceptance"""
+    if (trip.end_time - trip.start_time).total_seconds() / 3600 > bike.max_time_slot:
+        return False
+    elif trip.distance < bike.max_distance_pr_trip and (
+        bike.skip_kmh_check or trip["km/h"] < speed
+    ):
+        for start, end in bike.allowed_driving_time_slots:
+            if all(
+                [
+                    trip.start_time.time() >= start.time(),
+                    trip.start_time.time() <= end.time(),
+                    trip.end_time.time() <= end.time(),
+                    trip.end_time.time() >= start.time(),
+                ]
+            ):
+                return True
+        return False
+    else:
+        return False
+
+
+def test_static_acceptance():
+    rng = np.random.default_rng(42)
+    start_times = [
+        datetime(2023, 1, 1) + timedelta(minutes=int(minutes))
+        for minutes in rng.integers(0, 60 * 24 * 4, 300)
+    ]
+    trips = pd.DataFrame(
+        {
+            "start_time": start_times,
+            "end_time": [
+                start + timedelta(minutes=int(duration))
+                for start, duration in zip(start_times, rng.integers(1, 60 * 20, 300))
+            ],
+            "distance": rng.uniform(0, 20, 300),
+        }
+    )
+    trips["km/h"] = trips.distance / (
+        (trips.end_time - trips.start_time).dt.total_seconds() / 3600
+    )
+
+    settings = {
+        "range": 20,
+        "max_distance_pr_trip": 10,
+        "max_time_slot": 4,
+        "allowed_driving_time_slots": [
+            (datetime(2023, 1, 1, 7), datetime(2023, 1, 1, 12, 30)),
+            (datetime(2023, 1, 1, 13), datetime(2023, 1, 1, 17)),
+        ],
+    }
+    SettingsBike = type("SettingsBike", (Bike,), settings)
+    SettingsElectricBike = type("SettingsElectricBike", (ElectricBike,), settings)
+
+    for skip_kmh_check in (False, True):
+        for bike, speed in (
+            (SettingsBike, "bike_speed"),
+            (SettingsElectricBike, "electrical_bike_speed"),
+        ):
+            bike.skip_kmh_check = skip_kmh_check
+            bike = bike()
+            acceptance = bike.static_acceptance(trips)
+            expected = [
+                reference_bike_accepts(trip, bike, getattr(bike, speed))
+                for _, trip in trips.iterrows()
+            ]
+            assert acceptance.tolist() == expected
+            assert 0 < acceptance.sum() < len(trips)
+
+    class SettingsElectricCar(ElectricCar):
+        range = None
+        km_aar = None
+
+    electric_car = SettingsElectricCar()
+    # an empty electric car must be idle for sleep hours of the 24 hours from the start of the trip
+    expected = [
+        (24 * 3600 - (trip.end_time - trip.start_time).total_seconds()) / 3600
+        > electric_car.sleep
+        for _, trip in trips.iterrows()
+    ]
+    assert electric_car.static_acceptance(trips).tolist() == expected
+
+
+class RangeElectricCar(ElectricCar):
+    range = 150
+    capacity_decrease = None
+    km_aar = None
+
+
+class ReferenceElectricCar(RangeElectricCar):
+    """The acceptance of the electric car on the timestamps, recomputing the idle time of the period per trip"""
+
+    def accept_trip(self, trip, eligible=None):
+        segment_trip_check = False
+        time_good = True
+        if len(self.trips):
+            start_of_period = self.trips[0]
+            if (trip.start_time - start_of_period[0]).days >= 1:
+                self.milage_left = self.max_distance_per_day
+                self.trips = []
+
+        if len(self.trips):
+            idles = [
+                (forward[0] - current[1]).total_seconds() / 3600
+                for forward, current in zip(
+                    self.trips[1:] + [(trip.start_time, None)], self.trips
+                )
+            ]
+            if any([time < 0 for time in idles]):
+                time_good = False
+            in_between_wait = sum(idles)
+            start = self.trips[0][0]
+            timeleft = ((24 * 3600) - (trip.end_time - start).total_seconds()) / 3600
+            if in_between_wait + timeleft < self.sleep:
+                time_good = False
+        elif eligible is None:
+            timeleft = ((24 * 3600) - (trip.end_time - trip.start_time).total_seconds()) / 3600
+            time_good = timeleft > self.sleep
+        else:
+            time_good = bool(eligible)
+
+        if hasattr(trip, "trip_segments") and trip.distance > self.milage_left or time_good is False:
+            segment_trip_check = True
+            temporary_km_left = self.milage_left
+            for k, segment in enumerate(trip.trip_segments):
+                if temporary_km_left - segment.get("distance") < 0:
+                    return False
+                temporary_km_left -= segment.get("distance")
+                if (
+                    k != len(trip.trip_segments) - 1
+                    and (trip.trip_segments[k + 1].get("start_time") - segment.get("end_time")).total_seconds()
+                    / 3600
+                    > self.sleep
+                ):
+                    temporary_km_left = self.max_distance_per_day
+            self.milage_left = temporary_km_left
+
+        if (self.milage_left - trip.distance > 0 and time_good) or segment_trip_check:
+            if segment_trip_check is False:
+                self.milage_left = self.milage_left - trip.distance
+            self.trips.append((trip.start_time, trip.end_time))
+            self.counter += trip.distance
+            return True
+        return False
+
+    release_trip = VehicleModel.release_trip
+
+
+def random_trips(rng, n):
+    records = []
+    for seconds in np.sort(rng.integers(0, 3600 * 24 * 5, n)):
+        start = datetime(2023, 1, 2) + timedelta(seconds=int(seconds))
+        end = start + timedelta(seconds=int(rng.integers(60, 3600 * 20)))
+        distance = float(rng.uniform(1, 200))
+        # the segments split the trip at sorted points, leaving idle time between the segments
+        points = np.sort(rng.integers(0, int((end - start).total_seconds()), 2 * rng.integers(0, 4)))
+        times = [start + timedelta(seconds=int(point)) for point in points]
+        shares = rng.dirichlet(np.ones(len(times) // 2)) if times else []
+        records.append(
+            {
+                "id": len(records),
+                "car_id": 1,
+                "start_time": start,
+                "end_time": end,
+                "distance": distance,
+                "trip_segments": [
+                    {"start_time": times[2 * k], "end_time": times[2 * k + 1], "distance": distance * share}
+                    for k, share in enumerate(shares)
+                ],
+            }
+        )
+    return pd.DataFrame(records)
+
+
+def test_electric_car_incremental_acceptance(db_session):
+    for seed in range(40):
+        rng = np.random.default_rng(seed)
+        trips = Trips(
+            dataset=random_trips(rng, 120), kilometer_pr_hour=False, engine=db_session.get_bind()
+        )
+        sleep = [7, 4, 9.5][seed % 3]
+        cars = []
+        for car_class in (RangeElectricCar, ReferenceElectricCar):
+            car = car_class()
+            car.sleep = sleep
+            cars.append(car)
+        acceptance = cars[0].static_acceptance(trips.trips)
+
+        decisions = []
+        for position, trip in enumerate(trips):
+            eligible = None if position % 2 else acceptance[position]
+            # an accepted trip is released half of the time, as when the car is booked in the time slots
+            release = rng.random() < 0.5
+            decision = []
+            for car in cars:
+                accepted = car.accept_trip(trip, eligible)
+                if accepted and release:
+                    car.release_trip(trip)
+                    car.counter -= trip.distance
+                decision.append((accepted, car.milage_left, car.counter, len(car.trips)))
+            assert decision[0] == decision[1]
+            decisions.append(decision[0][0])
+        assert 0 < sum(decisions) < len(decisions)
+
+
+def test_slot_bookings():
+    rng = np.random.default_rng(3)
+    slots = 500
+    bookings = SlotBookings(slots)
+    # the array of a trip id per slot that the bookings replace
+    timeslots = np.zeros(slots, dtype=int)
+    for _ in range(400):
+        start = int(rng.integers(0, slots))
+        end = start + int(rng.integers(-1, 40))
+        assert bookings.booked(start, end) == any(timeslots[start : end + 1] > 0)
+        trip_id = int(rng.choice([0, rng.integers(1, 1000)], p=[0.1, 0.9]))
+        bookings.book(start, end, trip_id)
+        timeslots[start : end + 1] = trip_id
+        assert [bookings[slot] for slot in range(slots)] == timeslots.tolist()
+    assert len(bookings) == slots
+    assert len(bookings.starts) < slots
+
+
+def random_vehicle_factory(rng, n: int = 8) -> VehicleFactory:
+    """A factory of n fossil and electric cars"""
+    return VehicleFactory(
+        load_self=False,
+        unique_vehicles=pd.DataFrame(
+            {
+                "id": np.arange(n),
+                "make": "Toyota",
+                "model": "Yaris",
+                "type": ["fossilbil", "elbil"] * (n // 2),
+                "type_id": 0,
+                "fuel": ["benzin", "el"] * (n // 2),
+                "wltp_fossil": rng.choice([20.4, 18.2], n),
+                "wltp_el": 143.0,
+                "capacity_decrease": 0.0,
+                "co2_pr_km": 0.0,
+                "range": 60.0,
+                "sleep": 7.0,
+                "km_aar": np.nan,
+                "omkostning_aar": rng.choice([30000.0, 35000.0], n),
+            }
+        ).to_dict("records"),
+    )
+
+
+@pytest.mark.parametrize("intelligent_simulation", [False, True])
+def test_fleet_reset(db_session, intelligent_simulation):
+    rng = np.random.default_rng(5)
+    vehicle_factory = random_vehicle_factory(rng)
+    # the exact assignment of the intelligent simulation is kept small
+    trips = random_trips(rng, 40 if intelligent_simulation else 200)
+    trips["tripid"] = trips.id
+    trips["trip_segments"] = [[] for _ in range(len(trips))]
+
+    def build():
+        fleet = FleetInventory(vehicle_factory)
+        for vehicle_name in vehicle_factory.vmapper:
+            setattr(fleet, vehicle_name, 2)
+        fleet.initialise_fleet(days=5)
+        return fleet
+
+    fleets = FleetPool()
+    order = [vehicle.vehicle_id for vehicle in fleets.get((2,), build)]
+    assignments = []
+    for run in range(2):
+        # the second evaluation of the counts simulates the reset inventory of the first again
+        fleet = fleets.get((2,), build)
+        assert [vehicle.vehicle_id for vehicle in fleet] == order
+        if run:
+            assert all(vehicle.counter == 0 and len(vehicle.timeslots.starts) == 0 for vehicle in fleet)
+        simulation = Simulation(
+            Trips(dataset=trips.copy(), kilometer_pr_hour=False, engine=db_session.get_bind()),
+            fleet,
+            None,
+            tabu=True,
+            intelligent_simulation=intelligent_simulation,
+        )
+        simulation.run()
+        assignments.append(simulation.trips.trips.fleetinventory.tolist())
+    assert fleets.get((2,), build) is fleet
+    assert assignments[0] == assignments[1]
+    assert len(set(assignments[0])) > 2
+
+
+def test_qampo_parameters(db_session, monkeypatch):
+    rng = np.random.default_rng(3)
+    vehicle_factory = random_vehicle_factory(rng, 2)
+    trips = random_trips(rng, 12)
+    trips["tripid"] = trips.id
+    parameters = []
+    engine = model.get_engine("qampo")
+
+    def recording_engine(fleet, trips, algorithm_type, algorithm_parameters):
+        parameters.append(algorithm_parameters)
+        return engine(fleet, trips, algorithm_type, algorithm_parameters)
+
+    monkeypatch.setattr(model, "get_engine", lambda name: recording_engine)
+    for qampo_parameters in (None, AlgorithmParameters(time_limit_in_seconds=5, relative_gap=0.05)):
+        fleet = FleetInventory(vehicle_factory)
+        for vehicle_name in vehicle_factory.vmapper:
+            setattr(fleet, vehicle_name, 1)
+        fleet.initialise_fleet(days=5)
+        Simulation(
+            Trips(dataset=trips.copy(), kilometer_pr_hour=False, engine=db_session.get_bind()),
+            fleet,
+            None,
+            tabu=True,
+            intelligent_simulation=True,
+            qampo_parameters=qampo_parameters,
+        ).run()
+    days = len(parameters) // 2
+    assert days > 0
+    # the intelligent allocation is optimal by default
+    assert all(
+        parameter.time_limit_in_seconds == 60 and parameter.relative_gap is None
+        for parameter in parameters[:days]
+    )
+    assert all(
+        parameter.time_limit_in_seconds == 5 and parameter.relative_gap == 0.05
+        for parameter in parameters[days:]
+    )
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from fleetmanager.model.vehicle_optimisation import (
+    equivalence_classes,
+    equivalence_columns,
+)
+
+
+def test_equivalence_classes():
+    rng = np.random.default_rng(7)
+    n = 500
+    vehicles = pd.DataFrame(
+        {
+            "make": rng.choice(["Toyota", "Hyundai", "Renault"], n),
+            "model": rng.choice(["Yaris", "Kona", 0], n),
+            "type": rng.choice(["fossilbil", "elbil"], n),
+            "fuel": "benzin",
+            "wltp_fossil": rng.choice([0, 20.4, 18.2], n),
+            "wltp_el": rng.choice([0, 143.0], n),
+            "capacity_decrease": 0,
+            "co2_pr_km": 0,
+            "range": rng.choice([9999, 305.0], n),
+            "sleep": rng.choice([0, 5], n),
+            "omkostning_aar": rng.choice([30000.0, 32000.0, 35000.0], n),
+        },
+        index=rng.permutation(np.arange(1000, 1000 + n)),
+    )
+    translation, classes = equivalence_classes(vehicles)
+
+    # the cheapest vehicles of each group translate to the first of them
+    expected_translation = {}
+    expected_classes = []
+    for _, group in vehicles.groupby(equivalence_columns, sort=False):
+        cheapest = group[group.omkostning_aar == group.omkostning_aar.min()]
+        class_id = str(cheapest.index[0])
+        expected_classes.append(class_id)
+        expected_translation.update({str(index): class_id for index in cheapest.index})
+    assert translation == expected_translation
+    assert classes == expected_classes
+    assert len(classes) < len(translation) < n
+
+    cached = equivalence_classes(vehicles, generation="test")
+    assert equivalence_classes(vehicles.iloc[:10], generation="test") is cached
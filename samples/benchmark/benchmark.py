@@ -0,0 +1,238 @@
+"""
+Benchmark of the main pipelines on a synthetic municipality. The municipality is generated next to the dummy data in
+the in memory database, and the fleet simulation, goal simulation, roundtrip aggregation and every statistics endpoint
+are timed on it. The timings are written to a json report, which can be compared against a stored baseline report.
+
+    python samples/benchmark/benchmark.py --scale small --output benchmark.json
+    python samples/benchmark/benchmark.py --scale small --baseline benchmark.json --tolerance 0.25
+
+The comparison exits with status 1 if the median of a pipeline is more than the tolerance slower than the baseline.
+Baselines are only comparable when they are recorded on the same kind of machine.
+"""
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import click
+import pandas as pd
+from sqlalchemy import make_url, select
+from sqlalchemy.orm import sessionmaker
+
+from synthetic_municipality import generate_municipality, scales
+
+# query parameters of the statistics endpoints, every get route of the statistics router must be listed
+statistics_requests = {
+    "/statistics/sum": [{}],
+    "/statistics/overview": [{"view": "emission"}, {"view": "driven"}, {"view": "share"}],
+    "/statistics/grouped-driving-data": [{}],
+    "/statistics/driving-data": [{}],
+    "/statistics/availability": [{}],
+}
+
+
+def timed(pipeline, repeat: int) -> dict:
+    """
+    Runs the pipeline repeat times with its output suppressed and returns the timings in seconds
+    """
+    runs = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            pipeline()
+            runs.append(time.perf_counter() - start)
+    return {"median": statistics.median(runs), "min": min(runs), "runs": runs}
+
+
+def simulation_settings(session):
+    from fleetmanager.configuration.util import (
+        get_all_configurations_from_db,
+        validate_settings,
+    )
+
+    settings = validate_settings(get_all_configurations_from_db(session))
+    settings.shift_settings = []
+    return settings
+
+
+def fleet_simulation_pipeline(municipality, settings, intelligent_allocation=False):
+    from fleetmanager.api.fleet_simulation.schemas import FleetSimulationOptions
+    from fleetmanager.fleet_simulation.util import fleet_simulator
+
+    location_id = municipality["locations"][0]
+    vehicles = municipality["vehicles"][location_id]
+    end_date = municipality["end_date"]
+    if intelligent_allocation:
+        # the intelligent allocation solves a routing problem per day, one week is representative
+        end_date = municipality["start_date"] + timedelta(days=7)
+    options = FleetSimulationOptions(
+        location_id=location_id,
+        start_date=municipality["start_date"],
+        end_date=end_date,
+        intelligent_allocation=intelligent_allocation,
+        current_vehicles=vehicles,
+        simulation_vehicles=[{"id": vehicle_id, "simulation_count": 1} for vehicle_id in vehicles[:4]],
+        settings=settings,
+    )
+    return lambda: fleet_simulator(options)
+
+
+def goal_simulation_pipeline(municipality, settings):
+    from fleetmanager.api.goal_simulation.schemas import GoalSimulationOptions
+    from fleetmanager.goal_simulation.util import goal_simulator
+
+    location_id = municipality["locations"][0]
+    vehicles = municipality["vehicles"][location_id]
+    options = GoalSimulationOptions(
+        location_id=location_id,
+        start_date=municipality["start_date"],
+        end_date=municipality["end_date"],
+        current_vehicles=vehicles,
+        test_vehicles=vehicles[:4],
+        settings=settings,
+    )
+    return lambda: goal_simulator(options)
+
+
+def aggregation_pipeline(municipality, session):
+    from fleetmanager.data_access.dbschema import Cars, Trips
+    from fleetmanager.extractors.util import get_allowed_starts_with_additions
+    from fleetmanager.model.roundtripaggregator import (
+        aggregating_score,
+        aggregator,
+        process_car_roundtrips,
+    )
+
+    location_id = municipality["locations"][0]
+    cars = session.scalars(select(Cars).where(Cars.id.in_(municipality["vehicles"][location_id]))).all()
+    trips = pd.read_sql(
+        select(Trips).where(Trips.car_id.in_([car.id for car in cars])), session.bind
+    )
+    allowed_starts = get_allowed_starts_with_additions(session)
+
+    def aggregate():
+        for car in cars:
+            process_car_roundtrips(
+                car,
+                trips[trips.car_id == car.id].copy(),
+                allowed_starts,
+                aggregator,
+                aggregating_score,
+                session,
+                is_session_maker=False,
+                save=False,
+            )
+
+    return aggregate
+
+
+def statistics_pipelines(municipality, client):
+    from fleetmanager.api.statistics.routes import router
+
+    missing = {route.path for route in router.routes if "GET" in route.methods} - set(statistics_requests)
+    if missing:
+        raise click.ClickException(f"No benchmark request for the statistics endpoints {', '.join(missing)}")
+
+    dates = {
+        "start_date": municipality["start_date"].date().isoformat(),
+        "end_date": municipality["end_date"].date().isoformat(),
+        "locations": municipality["locations"],
+    }
+
+    def request(path, params):
+        def get():
+            response = client.get(path, params={**dates, **params})
+            response.raise_for_status()
+
+        return get
+
+    return {
+        f"statistics {path}{''.join(f' {value}' for value in params.values())}": request(path, params)
+        for path, requests in statistics_requests.items()
+        for params in requests
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Prints the median of each pipeline against the baseline, returns whether any pipeline regressed
+    """
+    if report["scale"] != baseline.get("scale"):
+        raise click.ClickException(f"Baseline is of scale {baseline.get('scale')}, not {report['scale']}")
+    regressed = False
+    click.echo(f"{'pipeline':55} {'baseline s':>11} {'median s':>11} {'ratio':>7}")
+    for name, timing in report["timings"].items():
+        if name not in baseline["timings"]:
+            click.echo(f"{name:55} {'-':>11} {timing['median']:11.3f} {'-':>7}")
+            continue
+        ratio = timing["median"] / max(baseline["timings"][name]["median"], 1e-9)
+        slower = ratio > 1 + tolerance
+        regressed |= slower
+        click.echo(
+            f"{name:55} {baseline['timings'][name]['median']:11.3f} {timing['median']:11.3f} {ratio:7.2f}"
+            f"{'  slower' if slower else ''}"
+        )
+    return regressed
+
+
+@click.command()
+@click.option("--scale", type=click.Choice(list(scales)), default="small")
+@click.option("--repeat", default=3, help="number of runs of each pipeline, the median is reported")
+@click.option("--seed", default=42, help="seed of the synthetic municipality")
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="path of the json report")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), default=None, help="report to compare with")
+@click.option("--tolerance", default=0.25, help="allowed relative slowdown of the median against the baseline")
+def cli(scale, repeat, seed, output, baseline, tolerance):
+    from fastapi.testclient import TestClient
+
+    from fleetmanager.api import app
+    from fleetmanager.data_access.db_engine import engine_creator, sqlite_dsn
+
+    engine = engine_creator()
+    if engine.url != make_url(sqlite_dsn):
+        raise click.ClickException("The benchmark writes its municipality to the database, unset the database variables")
+
+    start = time.perf_counter()
+    municipality = generate_municipality(engine, **scales[scale], seed=seed)
+    generation = time.perf_counter() - start
+    click.echo(f"Generated the {scale} municipality in {generation:.1f} sec: {municipality['rows']}")
+
+    with sessionmaker(bind=engine)() as session, TestClient(app) as client:
+        settings = simulation_settings(session)
+        pipelines = {
+            "fleet simulation": fleet_simulation_pipeline(municipality, settings),
+            "fleet simulation intelligent": fleet_simulation_pipeline(municipality, settings, True),
+            "goal simulation": goal_simulation_pipeline(municipality, settings),
+            "aggregation": aggregation_pipeline(municipality, session),
+            **statistics_pipelines(municipality, client),
+        }
+        timings = {}
+        for name, pipeline in pipelines.items():
+            timings[name] = timed(pipeline, repeat)
+            click.echo(f"{name:55} {timings[name]['median']:8.3f} sec")
+
+    report = {
+        "scale": scale,
+        "seed": seed,
+        "repeat": repeat,
+        "rows": municipality["rows"],
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "generation": generation,
+        "timings": timings,
+    }
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    if baseline:
+        with open(baseline) as file:
+            if compare(report, json.load(file), tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,209 @@
+"""
+Deterministic synthetic municipality for the benchmarks. Every location gets a trip profile from the qampo instance
+generator, the days of the period are sampled from the profile with the average day simulation of the trip
+generator and the trips are booked on the vehicles of the location. Each booked trip is written as a roundtrip with
+an outbound and a return segment, and as the two raw trips the roundtrip aggregator would have built it from.
+
+The same seed and scale always give the same rows. The ids are allocated after the existing rows of the database,
+such that the municipality can be generated next to the dummy data of the in memory database.
+"""
+import math
+import random
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from fleetmanager.data_access.dbschema import (
+    AllowedStarts,
+    Cars,
+    RoundTrips,
+    RoundTripSegments,
+    Trips,
+)
+from fleetmanager.model import trip_generator
+from fleetmanager.model.qampo.instance_generator import generate_trips
+
+scales = {
+    "small": {"locations": 2, "vehicles_per_location": 5, "days": 14},
+    "medium": {"locations": 5, "vehicles_per_location": 10, "days": 60},
+    "large": {"locations": 10, "vehicles_per_location": 20, "days": 180},
+}
+
+# the vehicles of the locations are taken round robin from the catalogue
+vehicle_catalogue = [
+    {"make": "Toyota", "model": "Yaris", "type": 4, "fuel": 1, "wltp_fossil": 20.4, "omkostning_aar": 31200.0},
+    {"make": "Hyundai", "model": "Kona", "type": 3, "fuel": 3, "wltp_el": 143.0, "range": 305.0,
+     "omkostning_aar": 38480.0, "sleep": 5},
+    {"make": "Peugeot", "model": "Partner", "type": 4, "fuel": 2, "wltp_fossil": 18.2, "omkostning_aar": 35600.0},
+    {"make": "Renault", "model": "Zoe", "type": 3, "fuel": 3, "wltp_el": 165.4, "range": 311.0,
+     "omkostning_aar": 33900.0, "sleep": 6},
+]
+
+# trips of the profile per vehicle, the simulated days are sampled from the profile
+trips_per_vehicle = 3
+
+
+def next_id(session, table) -> int:
+    return (session.scalar(select(func.max(table.id))) or 0) + 1
+
+
+def location_profile(vehicles: int) -> pd.DataFrame:
+    """
+    Trip profile of a location, a working day of trips from the qampo instance generator
+    """
+    profile = generate_trips(6, 15, vehicles * trips_per_vehicle, 2, 40)
+    return pd.DataFrame(
+        [
+            {
+                "start_time": trip.start_time,
+                "end_time": trip.end_time,
+                "distance": trip.length_in_kilometers,
+            }
+            for trip in profile.trips
+        ]
+    )
+
+
+def destination(latitude: float, longitude: float, distance: float) -> tuple[float, float]:
+    """
+    A point the given distance in km from the coordinate in a random direction
+    """
+    bearing = random.uniform(0, 2 * math.pi)
+    return (
+        latitude + distance / 111.32 * math.cos(bearing),
+        longitude + distance / (111.32 * math.cos(math.radians(latitude))) * math.sin(bearing),
+    )
+
+
+def generate_municipality(
+    engine: Engine,
+    locations: int,
+    vehicles_per_location: int,
+    days: int,
+    start_date: date = date(2023, 1, 2),
+    seed: int = 42,
+) -> dict:
+    """
+    Generates the locations, vehicles, raw trips, roundtrips and roundtrip segments of a synthetic municipality and
+    writes them to the database of the engine.
+
+    Parameters
+    ----------
+    engine : the engine of the database to populate
+    locations : number of locations
+    vehicles_per_location : number of vehicles on each location
+    days : number of days in the period, the trips are generated on the working days
+    start_date : the first day of the period
+    seed : seed of the generator, the qampo generator draws from random and the day simulation from numpy
+
+    Returns
+    -------
+    dict with the location ids, the vehicle ids per location id, the start and end date of the period and the row
+    count of each table
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    simulate_day = getattr(trip_generator, "__simulate_avg_day")
+
+    rows = {table: [] for table in (AllowedStarts, Cars, Trips, RoundTrips, RoundTripSegments)}
+    with sessionmaker(bind=engine).begin() as session:
+        ids = {table: next_id(session, table) for table in rows}
+
+        def add(table, **row):
+            row["id"] = ids[table]
+            ids[table] += 1
+            rows[table].append(row)
+            return row["id"]
+
+        vehicles = {}
+        for location_index in range(locations):
+            latitude, longitude = random.uniform(55.2, 57.2), random.uniform(8.5, 12.2)
+            location_id = add(
+                AllowedStarts,
+                address=f"Syntetisk lokation {location_index + 1}",
+                latitude=latitude,
+                longitude=longitude,
+                addition_date=datetime.combine(start_date, time()),
+            )
+            vehicles[location_id] = [
+                add(
+                    Cars,
+                    plate=f"SY{location_index:02d}{k:03d}",
+                    location=location_id,
+                    department=f"Afdeling {k % 3 + 1}",
+                    forvaltning=f"Forvaltning {location_index % 2 + 1}",
+                    **vehicle_catalogue[(location_index + k) % len(vehicle_catalogue)],
+                )
+                for k in range(vehicles_per_location)
+            ]
+
+            profile = location_profile(vehicles_per_location)
+            for day in range(days):
+                day_start = datetime.combine(start_date + timedelta(days=day), time())
+                if day_start.weekday() >= 5:
+                    continue
+                simulated = simulate_day(profile, seed=seed + location_index * days + day, padding=1, day_start=day_start)
+                available = {vehicle_id: day_start for vehicle_id in vehicles[location_id]}
+                for trip in sorted(simulated, key=lambda trip: trip["start_time"]):
+                    vehicle_id = next(
+                        (vehicle_id for vehicle_id, free in available.items() if free <= trip["start_time"]),
+                        None,
+                    )
+                    if vehicle_id is None:
+                        continue
+                    start, end = trip["start_time"].replace(microsecond=0), trip["end_time"].replace(microsecond=0)
+                    available[vehicle_id] = end + timedelta(minutes=15)
+                    distance = round(float(trip["length_in_kilometers"]), 2)
+                    turn = start + (end - start) / 2
+                    away = destination(latitude, longitude, distance / 2)
+                    roundtrip_id = add(
+                        RoundTrips,
+                        start_time=start,
+                        end_time=end,
+                        start_latitude=latitude,
+                        start_longitude=longitude,
+                        end_latitude=latitude,
+                        end_longitude=longitude,
+                        distance=distance,
+                        aggregation_type="complete",
+                        start_location_id=location_id,
+                        car_id=vehicle_id,
+                    )
+                    for (segment_start, segment_end), (origin, target) in zip(
+                        ((start, turn), (turn, end)),
+                        (((latitude, longitude), away), (away, (latitude, longitude))),
+                    ):
+                        add(
+                            RoundTripSegments,
+                            distance=distance / 2,
+                            start_time=segment_start,
+                            end_time=segment_end,
+                            round_trip_id=roundtrip_id,
+                        )
+                        add(
+                            Trips,
+                            car_id=vehicle_id,
+                            distance=distance / 2,
+                            start_time=segment_start,
+                            end_time=segment_end,
+                            start_latitude=origin[0],
+                            start_longitude=origin[1],
+                            end_latitude=target[0],
+                            end_longitude=target[1],
+                            start_location=location_id,
+                        )
+
+        for table, table_rows in rows.items():
+            if table_rows:
+                session.execute(insert(table), table_rows)
+
+    return {
+        "locations": list(vehicles),
+        "vehicles": vehicles,
+        "start_date": datetime.combine(start_date, time()),
+        "end_date": datetime.combine(start_date + timedelta(days=days), time()),
+        "rows": {table.__tablename__: len(table_rows) for table, table_rows in rows.items()},
+    }
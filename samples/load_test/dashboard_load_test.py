@@ -0,0 +1,116 @@
+"""
+Load test of the dashboard endpoints. Sends the requests the dashboards make concurrently and reports the latency
+percentiles per endpoint. The probe endpoint is a cheap request that is sent while the heavy requests are running,
+its latency shows whether slow requests block the worker.
+
+Against a running api:
+    python samples/load_test/dashboard_load_test.py --url http://localhost:3001 --concurrency 20 --rounds 5
+
+In process against the database configured in the environment, or the in memory dummy database if none is set:
+    python samples/load_test/dashboard_load_test.py --concurrency 20 --rounds 5
+
+The default period matches the trips of the dummy database.
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+import click
+import httpx
+import numpy as np
+
+dashboard_requests = [
+    ("/statistics/sum", {}),
+    ("/statistics/overview", {"view": "driven"}),
+    ("/statistics/driving-data", {}),
+    ("/statistics/grouped-driving-data", {}),
+    ("/statistics/availability", {}),
+    ("/simulation-setup/locations-vehicles", {}),
+]
+probe_request = ("/simulation-setup/locations", {})
+
+
+async def timed_request(client, path, params, latencies, errors):
+    start = time.perf_counter()
+    try:
+        response = await client.get(path, params=params)
+    except httpx.HTTPError as e:
+        errors[path].append(repr(e))
+        return
+    latencies[path].append(time.perf_counter() - start)
+    if response.status_code != 200:
+        errors[path].append(response.status_code)
+
+
+async def load_test(client, concurrency, rounds, start_date, end_date):
+    latencies = defaultdict(list)
+    errors = defaultdict(list)
+    dates = {"start_date": start_date, "end_date": end_date}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(path, params):
+        async with semaphore:
+            await timed_request(client, path, {**dates, **params}, latencies, errors)
+
+    async def probe(stop):
+        while not stop.is_set():
+            await timed_request(client, *probe_request, latencies, errors)
+            await asyncio.sleep(0.05)
+
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(stop))
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            bounded(path, params)
+            for _ in range(rounds)
+            for _ in range(concurrency)
+            for path, params in dashboard_requests
+        )
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+    return latencies, errors, elapsed
+
+
+def report(latencies, errors, elapsed):
+    click.echo(f"{'endpoint':45} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7}")
+    for path, values in latencies.items():
+        values = np.array(values) * 1000
+        click.echo(
+            f"{path:45} {len(values):5d} {np.percentile(values, 50):9.1f} {np.percentile(values, 95):9.1f} "
+            f"{values.max():9.1f} {len(errors[path]):7d}"
+        )
+    total = sum(map(len, latencies.values()))
+    click.echo(f"{total} requests in {elapsed:.1f} sec, {total / elapsed:.1f} requests / sec")
+
+
+@click.command()
+@click.option("--url", default=None, help="url of the api, runs the api in process if not given")
+@click.option("--concurrency", default=10, help="number of concurrent dashboard requests")
+@click.option("--rounds", default=3, help="number of times each dashboard request is sent per concurrent user")
+@click.option("--start-date", default="2022-03-01")
+@click.option("--end-date", default="2022-03-03")
+def cli(url, concurrency, rounds, start_date, end_date):
+    async def run():
+        if url is None:
+            from fleetmanager.api import app
+            from fleetmanager.api.dependencies import limit_threadpool
+
+            limit_threadpool()
+            transport = httpx.ASGITransport(app=app)
+            base_url = "http://testserver"
+        else:
+            transport = None
+            base_url = url
+        async with httpx.AsyncClient(
+            transport=transport, base_url=base_url, timeout=300
+        ) as client:
+            return await load_test(client, concurrency, rounds, start_date, end_date)
+
+    report(*asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    cli()